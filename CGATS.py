@@ -7,6 +7,8 @@ Copyright (C) 2008 Florian Hoech
 """
 
 
+import functools
+import itertools
 import math
 import os
 import re
@@ -82,6 +84,10 @@ def sort_RGB_to_top_factory(i1, i2, i3, i4):
         else:
             return 0
 
+    def key_RGB_to_top(values):
+        return not (values[i1] == values[i2] and 0 <= values[i3] < values[i4])
+
+    sort_RGB_to_top.key = key_RGB_to_top
     return sort_RGB_to_top
 
 
@@ -192,12 +198,104 @@ def sort_by_luma_factory(RY, GY, BY, gamma=1):
         else:
             return 0
 
+    def key_by_luma(values):
+        return RY * values[0] ** gamma + GY * values[1] ** gamma + BY * values[2] ** gamma
+
+    sort_by_luma.key = key_by_luma
     return sort_by_luma
 
 
 sort_by_rec709_luma = sort_by_luma_factory(0.2126, 0.7152, 0.0722)
 
 
+# Key functions equivalent to the comparison functions above. Sorting by key
+# computes each key once per patch instead of twice per comparison.
+
+
+def key_RGB_gray_to_top(values):
+    return not values[0] == values[1] == values[2]
+
+
+def key_RGB_white_to_top(values):
+    return sum(values[:3]) != 300
+
+
+def _key_by_hue_factory(RGB2HXX):
+    def key_by_hue(values):
+        values = list(RGB2HXX(*values[:3]))
+        values[0] = round(math.degrees(values[0]))
+        return values
+
+    return key_by_hue
+
+
+key_by_HSI = _key_by_hue_factory(colormath.RGB2HSI)
+key_by_HSL = _key_by_hue_factory(colormath.RGB2HSL)
+key_by_HSV = _key_by_hue_factory(colormath.RGB2HSV)
+
+
+def key_by_RGB(values):
+    return values[:3]
+
+
+def key_by_BGR(values):
+    return values[:3][::-1]
+
+
+def key_by_RGB_sum(values):
+    return sum(values[:3])
+
+
+def key_by_RGB_pow_sum(values):
+    return sum(v**2.2 for v in values[:3])
+
+
+def key_by_L(values):
+    # L* is strictly monotonic in Y, so sorting by Y gives the same order
+    # without the Lab conversion
+    return values[4]
+
+
+sort_RGB_gray_to_top.key = key_RGB_gray_to_top
+sort_RGB_white_to_top.key = key_RGB_white_to_top
+sort_by_HSI.key = key_by_HSI
+sort_by_HSL.key = key_by_HSL
+sort_by_HSV.key = key_by_HSV
+sort_by_RGB.key = key_by_RGB
+sort_by_BGR.key = key_by_BGR
+sort_by_RGB_sum.key = key_by_RGB_sum
+sort_by_RGB_pow_sum.key = key_by_RGB_pow_sum
+sort_by_L.key = key_by_L
+
+
+def get_sort_key(func):
+    """
+    Return key function for sort function 'func'
+
+    'func' may be one of the comparison functions in this module (which
+    have an equivalent key function attached), or an arbitrary comparison
+    function, which is wrapped with functools.cmp_to_key.
+
+    """
+    return getattr(func, "key", None) or functools.cmp_to_key(func)
+
+
+def interleave(*valueslists):
+    """
+    Interleave lists.
+
+    1 2 3 4, 5 6 7 8 -> 1 5 2 6 3 7 4 8
+
+    """
+    sentinel = object()
+    return [
+        values
+        for values_tuple in itertools.zip_longest(*valueslists, fillvalue=sentinel)
+        for values in values_tuple
+        if values is not sentinel
+    ]
+
+
 class CGATSError(Exception):
     pass
 
@@ -738,10 +836,9 @@ class CGATS(dict):
         if not valueslist:
             return False
         numvalues = len(valueslist)
-        if sort1:
-            valueslist.sort(sort1)
-        if sort2:
-            valueslist.sort(sort2)
+        sort_key = self._get_checkerboard_sort_key(sort1, sort2)
+        if sort_key:
+            valueslist.sort(key=sort_key)
         gray = []
         if split_grays:
             # Split values into gray and color. First gray in a consecutive
@@ -834,10 +931,8 @@ class CGATS(dict):
                     )
                 gray.extend(color)
                 color = []
-                if sort1:
-                    gray.sort(sort1)
-                if sort2:
-                    gray.sort(sort2)
+                if sort_key:
+                    gray.sort(key=sort_key)
             if debug:
                 for i, values in enumerate(gray):
                     safe_print(
@@ -880,11 +975,7 @@ class CGATS(dict):
                     valueslist2.extend(valueslist1_orig[1:2])
             # Interleave.
             # 1 2 3 4 5 6 7 8 -> 1 5 2 6 3 7 4 8
-            while valueslist1 or valueslist2:
-                for valueslist in (valueslist1, valueslist2):
-                    if valueslist:
-                        values = valueslist.pop(0)
-                        checkerboard.append(values)
+            checkerboard.extend(interleave(valueslist1, valueslist2))
         if shift and checkerboard[-1][:3] == [100, 100, 100]:
             # Move white patch to front
             if debug:
@@ -899,6 +990,43 @@ class CGATS(dict):
             return False
         return data.set_RGB_XYZ_values(checkerboard)
 
+    @staticmethod
+    def _get_checkerboard_sort_key(sort1=None, sort2=None):
+        """
+        Combine sort functions into a single key function.
+
+        Equivalent to two consecutive stable sorts (first by sort1, then by
+        sort2), but needs only one pass.
+
+        """
+        key1 = sort1 and get_sort_key(sort1)
+        key2 = sort2 and get_sort_key(sort2)
+        if key1 and key2:
+            return lambda values: (key2(values), key1(values))
+        return key1 or key2
+
+    def sort_by_settle_time(self, model=None):
+        """
+        Re-order patches to minimize total display settle time.
+
+        Uses a display response model (see displayresponse module) to
+        estimate the settle time of each patch transition.
+        Return a tuple of the estimated total settle time in seconds before
+        and after re-ordering, or False if there is no RGB/XYZ data.
+
+        """
+        data, valueslist = self.get_RGB_XYZ_values()
+        if not valueslist:
+            return False
+        if not model:
+            from .displayresponse import DisplayResponseModel
+
+            model = DisplayResponseModel()
+        before = model.sequence_time(valueslist)
+        valueslist, after = model.order(valueslist)
+        data.set_RGB_XYZ_values(valueslist)
+        return before, after
+
     def sort_RGB_gray_to_top(self):
         return self.sort_data_RGB_XYZ(sort_RGB_gray_to_top)
 
@@ -961,7 +1089,9 @@ class CGATS(dict):
         data, valueslist = self.get_RGB_XYZ_values()
         if not valueslist:
             return False
-        valueslist.sort(cmp, key, reverse)
+        if cmp:
+            key = get_sort_key(cmp)
+        valueslist.sort(key=key, reverse=reverse)
         return data.set_RGB_XYZ_values(valueslist)
 
     @property
@@ -66,7 +66,7 @@ from . import CGATS
 from . import ICCProfile as ICCP
 from . import audio, ccmx, colord, colormath, config
 from . import localization as lang
-from . import madvr, pyi_md5pickuphelper, report
+from . import pyi_md5pickuphelper
 from .config import (
     appbasename,
     autostart,
@@ -121,7 +121,8 @@ from .argyll_instruments import get_canonical_instrument_name, instruments
 from .argyll_names import viewconds
 from .colormath import XYZ2CCT, CIEDCCT2xyY, XYZ2Lab, XYZ2xyY, planckianCT2xyY, xyY2CCT
 from .debughelpers import ResourceError, getevtobjname, getevttype, handle_error
-from .edid import get_manufacturer_name, pnpidcache
+from .edid import display_cache, get_manufacturer_name, pnpidcache
+from .lazyimport import lazy_import
 from .log import log, logbuffer, safe_print
 from .meta import VERSION, VERSION_BASE, author, domain, get_latest_chglog_entry
 from .meta import name as appname
@@ -136,11 +137,10 @@ from .options import (
 from .ordereddict import OrderedDict
 from .patterngenerators import WebWinHTTPPatternGeneratorServer
 
-try:
-    from .chromecast_patterngenerator import ChromeCastPatternGenerator as CCPG
-except ImportError:
-    CCPG = None.__class__
 import util_x
+
+# Needed at class definition time of MainFrame (shared 3D LUT methods),
+# can't be deferred
 from wxLUT3DFrame import LUT3DFrame
 
 from utils.util_decimal import float2dec, stripzeros
@@ -201,6 +201,9 @@ from .worker import (
     show_result_dialog,
 )
 
+# Availability of the optional LUT viewer, CCXX plot and profile info
+# windows (which need additional dependencies) is checked at startup, and the
+# measurement window is created at startup, so these are imported eagerly
 try:
     from wxLUTViewer import LUTFrame
 except ImportError:
@@ -211,6 +214,7 @@ try:
     from wxCCXXPlot import CCXXPlot
 except ImportError:
     CCXXPlot = None
+# Already imported by the worker
 from wxDisplayUniformityFrame import DisplayUniformityFrame
 from wxMeasureFrame import get_default_size
 
@@ -237,10 +241,11 @@ from wxfixes import (
     set_maxsize,
     wx_Panel,
 )
+# Base class of MainFrame, can't be deferred
 from wxReportFrame import ReportFrame
-from wxSynthICCFrame import SynthICCFrame
+
+# Already imported by the report frame
 from wxTestchartEditor import TestchartEditor
-from wxVisualWhitepointEditor import VisualWhitepointEditor
 from wxwindows import (
     AboutDialog,
     AuiBetterTabArt,
@@ -293,6 +298,39 @@ from wx.lib import delayedresult, platebtn
 from wx.lib.art import flagart
 from wx.lib.scrolledpanel import ScrolledPanel
 
+# Only needed when creating measurement reports, import on first use
+report = lazy_import(".report", __package__)
+# Only needed when the respective tool window is opened, import on first use
+wxSynthICCFrame = lazy_import("wxSynthICCFrame")
+wxVisualWhitepointEditor = lazy_import("wxVisualWhitepointEditor")
+
+
+def is_instance_of_loaded(obj, modulename, classname):
+    """
+    Return whether obj is an instance of class classname of module modulename
+
+    The module is not imported if it has not been imported yet (no instances
+    can exist in that case).
+
+    """
+    module = sys.modules.get(modulename)
+    return module is not None and isinstance(obj, getattr(module, classname))
+
+
+def is_chromecast_patterngenerator(patterngenerator):
+    """
+    Return whether patterngenerator is a Chromecast pattern generator
+
+    The Chromecast module is only imported by the worker when a Chromecast
+    is used as pattern generator.
+
+    """
+    return is_instance_of_loaded(
+        patterngenerator,
+        "%s.chromecast_patterngenerator" % __package__,
+        "ChromeCastPatternGenerator",
+    )
+
 
 def show_ccxx_error_dialog(exception, path, parent):
     msg = safe_unicode(exception)
@@ -2405,6 +2443,7 @@ class MainFrame(ReportFrame, BaseFrame):
         """
         # Avoid messing with main configuration (e.g. when not running standalone)
         # because we share HDR settings with 3D LUT HDR settings
+        SynthICCFrame = wxSynthICCFrame.SynthICCFrame
         SynthICCFrame.cfg = config.ConfigParser.RawConfigParser()
         config.initcfg("synthprofile", SynthICCFrame.cfg)
         self.synthiccframe = SynthICCFrame()
@@ -6645,7 +6684,7 @@ class MainFrame(ReportFrame, BaseFrame):
                     geometry = display.Geometry.Get()  # Has to be tuple!
         display_name = display_name.replace("[PRIMARY]", lang.getstr("display.primary"))
         title = display_name + " ‒ " + lang.getstr("whitepoint.visual_editor")
-        self.wpeditor = VisualWhitepointEditor(
+        self.wpeditor = wxVisualWhitepointEditor.VisualWhitepointEditor(
             self,
             pos=pos,
             title=title,
@@ -6653,7 +6692,7 @@ class MainFrame(ReportFrame, BaseFrame):
             geometry=geometry,
             profile=profile,
         )
-        if patterngenerator and CCPG and isinstance(patterngenerator, CCPG):
+        if patterngenerator and is_chromecast_patterngenerator(patterngenerator):
             self.wpeditor.Bind(wx.EVT_CLOSE, self.patterngenerator_disconnect)
         self.wpeditor.RealCenterOnScreen()
         self.wpeditor.Show()
@@ -6713,10 +6752,8 @@ class MainFrame(ReportFrame, BaseFrame):
         frame.Sizer.Add(panel, 1, flag=wx.EXPAND)
         frame.Sizer.SetSizeHints(frame)
         frame.Sizer.Layout()
-        if (
+        if self.worker.patterngenerator and is_chromecast_patterngenerator(
             self.worker.patterngenerator
-            and CCPG
-            and isinstance(self.worker.patterngenerator, CCPG)
         ):
             frame.Bind(wx.EVT_CLOSE, self.patterngenerator_disconnect)
         frame.Show()
@@ -6736,7 +6773,9 @@ class MainFrame(ReportFrame, BaseFrame):
         lstr = "measure"
         if evtobjname == "visual_whitepoint_editor_measure_btn":
             interactive_frame = event.GetEventObject().TopLevelParent
-            while not isinstance(interactive_frame, VisualWhitepointEditor):
+            while not isinstance(
+                interactive_frame, wxVisualWhitepointEditor.VisualWhitepointEditor
+            ):
                 # Floated panel
                 interactive_frame = interactive_frame.Parent
         elif evtobjname in ("luminance_measure_btn", "black_luminance_measure_btn"):
@@ -9950,8 +9989,8 @@ class MainFrame(ReportFrame, BaseFrame):
         if display_name == "Web @ localhost" or display_name.startswith("Chromecast "):
             for name, patterngenerator in list(self.worker.patterngenerators.items()):
                 if isinstance(
-                    patterngenerator, (WebWinHTTPPatternGeneratorServer, CCPG)
-                ):
+                    patterngenerator, WebWinHTTPPatternGeneratorServer
+                ) or is_chromecast_patterngenerator(patterngenerator):
                     # Need to free connection for dispwin
                     patterngenerator.disconnect_client()
                     if isinstance(patterngenerator, WebWinHTTPPatternGeneratorServer):
@@ -13917,8 +13956,9 @@ class MainFrame(ReportFrame, BaseFrame):
                 grid.BeginBatch()
                 ref_data = reference_ti3.queryv1("DATA")
                 tgt_data = colorimeter_ti3.queryv1("DATA")
-                deltaE_94 = []
-                deltaE_00 = []
+                Labs_ref = []
+                Labs_tgt = []
+                xyYs = []
                 safe_print("")
                 safe_print(
                     "      Reference xyY         |"
@@ -13974,32 +14014,28 @@ class MainFrame(ReportFrame, BaseFrame):
                             "ref Lab %.6f %.6f %.6f, " % Lab_ref,
                             "col Lab %.6f %.6f %.6f" % Lab_tgt,
                         )
-                    # For comparison to Argyll DE94 values
-                    deltaE = colormath.delta(*Lab_ref + Lab_tgt + ("94",))["E"]
-                    deltaE_94.append(deltaE)
-                    deltaE = colormath.delta(*Lab_ref + Lab_tgt + ("00",))["E"]
-                    deltaE_00.append(deltaE)
+                    Labs_ref.append(Lab_ref)
+                    Labs_tgt.append(Lab_tgt)
+                    xyYs.append(tuple(xyYabs[0]) + tuple(xyYabs[1]))
+                # For comparison to Argyll DE94 values
+                deltas = colormath.delta_batch(Labs_ref, Labs_tgt, ("94", "00"))
+                deltaE_94 = deltas["94"]["E"]
+                deltaE_00 = deltas["00"]["E"]
+                for row, xyY in enumerate(xyYs):
                     safe_print(
                         " %.6f %.6f %8.4f |"
                         " %.6f %.6f %8.4f | %.6f | %.6f "
-                        % (
-                            tuple(xyYabs[0])
-                            + tuple(xyYabs[1])
-                            + (deltaE_94[-1], deltaE_00[-1])
-                        )
+                        % (xyY + (deltaE_94[row], deltaE_00[row]))
                     )
-                    grid.SetCellValue(row, 8, "%.4f" % deltaE)
+                    grid.SetCellValue(row, 8, "%.4f" % deltaE_00[row])
                 safe_print("")
-                safe_print(
-                    appname
-                    + ": Fit error is max %.6f, avg %.6f DE94"
-                    % (max(deltaE_94), sum(deltaE_94) / len(deltaE_94))
-                )
-                safe_print(
-                    appname
-                    + ": Fit error is max %.6f, avg %.6f DE00"
-                    % (max(deltaE_00), sum(deltaE_00) / len(deltaE_00))
-                )
+                for method, deltaE in (("94", deltaE_94), ("00", deltaE_00)):
+                    stats = colormath.delta_stats(deltaE)
+                    safe_print(
+                        appname
+                        + ": Fit error is max %.6f, avg %.6f DE%s"
+                        % (stats["max"], stats["avg"], method)
+                    )
                 grid.DefaultCellBackgroundColour = grid.LabelBackgroundColour
                 grid.EndBatch()
                 dlg.sizer0.SetSizeHints(dlg)
@@ -17375,6 +17411,9 @@ class MainFrame(ReportFrame, BaseFrame):
         Return True if update was needed and carried out, False otherwise.
 
         """
+        if isinstance(event, wx.DisplayChangedEvent):
+            # Don't use cached EDID/display enumeration results
+            display_cache.invalidate()
         if (
             self.worker.is_working()
             or not self.Shown
@@ -19054,7 +19093,9 @@ class MainFrame(ReportFrame, BaseFrame):
                 return
             for win in wx.GetTopLevelWindows():
                 if win and not win.IsBeingDeleted():
-                    if isinstance(win, VisualWhitepointEditor):
+                    if is_instance_of_loaded(
+                        win, "wxVisualWhitepointEditor", "VisualWhitepointEditor"
+                    ):
                         win.Close(force=True)
             writecfg()
             if getattr(self, "thread", None) and self.thread.isAlive():
@@ -3,12 +3,14 @@
 
 import atexit
 import binascii
+import collections
 import ctypes
 import datetime
 import locale
 import math
 import os
 import re
+import sqlite3
 import struct
 import sys
 import warnings
@@ -50,10 +52,12 @@ except ImportError:
     colord = Colord()
 from . import colormath, edid, imfile
 from .colormath import NumberTuple
-from .defaultpaths import iccprofiles, iccprofiles_home
+from .defaultpaths import cache, iccprofiles, iccprofiles_home
 from .encoding import get_encodings
+from .meta import name as appname
 from .options import test_input_curve_clipping
 from .ordereddict import OrderedDict
+from .profileindex import profile_index
 
 try:
     from .log import safe_print
@@ -2951,6 +2955,33 @@ class CRInterpolation(object):
             + (-p[0] + (3 * p[1]) - (3 * p[2]) + p[3]) * (t2 * t)
         )
 
+    def interp(self, positions):
+        """Interpolate at all positions at once. Return numpy array."""
+        import numpy
+
+        points = numpy.array(self.points, dtype=numpy.float64)
+        # Extend linearly to the left and right
+        padded = numpy.concatenate(
+            (
+                [points[0] - (points[1] - points[0])],
+                points,
+                [points[-1] - (points[-2] - points[-1])],
+            )
+        )
+        positions = numpy.asarray(positions, dtype=numpy.float64)
+        lbound = numpy.floor(positions).astype(int)
+        t = positions % 1.0
+        p = [padded[numpy.minimum(lbound + k, len(padded) - 1)] for k in range(4)]
+        t2 = t * t
+        values = 0.5 * (
+            (2 * p[1])
+            + (-p[0] + p[2]) * t
+            + ((2 * p[0]) - (5 * p[1]) + (4 * p[2]) - p[3]) * t2
+            + (-p[0] + (3 * p[1]) - (3 * p[2]) + p[3]) * (t2 * t)
+        )
+        # Sitting on a datapoint, so just return that
+        return numpy.where(numpy.abs(lbound - positions) < 0.0001, p[1], values)
+
 
 class ADict(dict):
 
@@ -2961,6 +2992,9 @@ class ADict(dict):
 
     """
 
+    # Attributes are stored as items, instances don't need a __dict__
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         dict.__init__(self, *args, **kwargs)
 
@@ -3080,6 +3114,9 @@ class Text(ICCProfileTag, UserString, str):
 
 
 class Colorant(object):
+
+    __slots__ = ("_channels", "_type")
+
     def __init__(self, binaryString="\0" * 4):
         self._type = uInt32Number(binaryString)
         self._channels = []
@@ -3327,6 +3364,13 @@ class LUT16Type(ICCProfileTag):
     def clut():
         def fget(self):
             if self._clut is None:
+                clut = profile_cache.load_clut(self)
+                if clut is not None:
+                    self._clut = clut
+                    profile_cache.add_nbytes(
+                        self.profile, self._g**self._i * self._o * CLUT_VALUE_NBYTES
+                    )
+                    return clut
                 i, o, g, n = self._i, self._o, self._g, self._n
                 tagData = self._tagData
                 self._clut = [
@@ -3347,8 +3391,12 @@ class LUT16Type(ICCProfileTag):
                         ]
                         for y in range(g)
                     ]
-                    for x in range(g**i / g)
+                    for x in range(g**i // g)
                 ]
+                profile_cache.store_clut(self, self._clut)
+                profile_cache.add_nbytes(
+                    self.profile, self._g**self._i * self._o * CLUT_VALUE_NBYTES
+                )
             return self._clut
 
         def fset(self, value):
@@ -3551,6 +3599,71 @@ BEGIN_DATA
                     clut[-1].append(self.clut[z * steps + y][x])
         self.clut = clut
 
+    def clut_array(self):
+        """
+        Return the cLUT as numpy array of shape (g, g, g, o) (range 0..65535)
+
+        """
+        import numpy
+
+        if len(self.input) != 3:
+            raise NotImplementedError("input channels != 3")
+        steps = len(self.clut[0])
+        return numpy.array(self.clut, dtype=numpy.float64).reshape(
+            (steps, steps, steps, len(self.output))
+        )
+
+    def lookup(self, values, method="tetrahedral"):
+        """
+        Look up normalized (0..1) input values in-process
+
+        Values are passed through the matrix (B2A with XYZ PCS only), input
+        curves, cLUT (trilinear or tetrahedral interpolation) and output
+        curves. Return output values as numpy array (N x output channels)
+        normalized to 0..1.
+
+        """
+        import numpy
+
+        from . import clutinterp
+
+        values = numpy.array(values, dtype=numpy.float64).reshape(-1, 3)
+        if (
+            self.tagSignature
+            and self.tagSignature.startswith("B2A")
+            and (not self.profile or self.profile.connectionColorSpace == "XYZ")
+        ):
+            values = values.dot(numpy.array(self.matrix, dtype=numpy.float64).T)
+        for i, entries in enumerate(self.input):
+            values[:, i] = numpy.interp(
+                values[:, i],
+                numpy.linspace(0.0, 1.0, len(entries)),
+                numpy.array(entries, dtype=numpy.float64) / 65535.0,
+            )
+        values = clutinterp.interp(self.clut_array() / 65535.0, values, method)
+        for i, entries in enumerate(self.output):
+            values[:, i] = numpy.interp(
+                values[:, i],
+                numpy.linspace(0.0, 1.0, len(entries)),
+                numpy.array(entries, dtype=numpy.float64) / 65535.0,
+            )
+        return values
+
+    def resize_clut(self, clutres, method="tetrahedral"):
+        """
+        Resample the cLUT to clutres grid points per dimension in-process
+
+        Input and output curves are left unchanged.
+
+        """
+        import numpy
+
+        from . import clutinterp
+
+        clut = clutinterp.resize(self.clut_array(), clutres, method)
+        clut = numpy.clip(numpy.round(clut), 0, 65535).astype(int)
+        self.clut = clut.reshape((clutres * clutres, clutres, -1)).tolist()
+
     @Property
     def matrix():
         def fget(self):
@@ -3750,6 +3863,89 @@ BEGIN_DATA
         if diagpng and filename:
             self.clut_writepng(fname + ".%s.post.CLUT.smooth.png" % sig)
 
+    # Column orders and resulting channel orders of the smoothing passes
+    # in smooth2. After the last shift, the original order is restored.
+    _smooth2_orders = [
+        (None, "BGR"),
+        ((1, 2, 0), "RBG"),
+        ((0, 2, 1), "BRG"),
+        ((2, 1, 0), "GRB"),
+        ((0, 2, 1), "RGB"),
+        ((2, 0, 1), "GBR"),
+        ((0, 2, 1), "BGR"),
+    ]
+
+    @staticmethod
+    def _get_smooth2_protection(pcs, clutres, channels):
+        """Return cLUT points to exclude and whether to protect the gray axis"""
+        exclude = None
+        protect_gray_axis = True
+        if pcs == "Lab":
+            if clutres // 2 != clutres / 2.0:
+                # For CIELab cLUT, gray will only
+                # fall on a cLUT point if uneven cLUT res
+                if channels in ("RBG", "RGB"):
+                    exclude = [
+                        ((clutres // 2 + 1) * (clutres - 1), col)
+                        for col in range(clutres)
+                    ]
+                    protect_gray_axis = False
+                elif channels in ("BRG", "GRB"):
+                    exclude = [
+                        ((clutres // 2) * clutres + y, clutres // 2)
+                        for y in range(clutres)
+                    ]
+                    protect_gray_axis = False
+            else:
+                protect_gray_axis = False
+        return exclude, protect_gray_axis
+
+    def _smooth2_array(self, pcs, window):
+        """
+        Smooth the cLUT like the smoothing passes of smooth2, using numpy
+
+        Each pass is a moving average along the fastest changing axis with
+        the edge handling of colormath.smooth_avg (window shrunk towards
+        the edges). Instead of shifting columns, the array is transposed.
+
+        """
+        import numpy
+
+        clutres = len(self.clut[0])
+        clut = self.clut_array()
+        window = [float(weight) for weight in window]
+        center = len(window) // 2
+        z, y, x = numpy.meshgrid(*[numpy.arange(clutres)] * 3, indexing="ij")
+        for j, (order, channels) in enumerate(self._smooth2_orders):
+            if order:
+                clut = clut.transpose(order + (3,))
+            if j == 6:
+                break
+            exclude, protect_gray_axis = self._get_smooth2_protection(
+                pcs, clutres, channels
+            )
+            # Protect black
+            protect = (clut == 0).all(axis=3)
+            if protect_gray_axis:
+                if pcs == "XYZ":
+                    protect |= (x == z) & (y == z)
+                else:
+                    protect |= (x == clutres // 2) & (y == clutres // 2)
+            if exclude:
+                for i, col in exclude:
+                    protect[i // clutres, i % clutres, col] = True
+            smoothed = clut.copy()
+            for tl in range(1, center + 1):
+                if clutres <= 2 * tl:
+                    break
+                weights = window[center - tl : center + tl + 1]
+                total = 0
+                for k, weight in enumerate(weights):
+                    total = total + weight * clut[:, :, k : clutres - 2 * tl + k]
+                smoothed[:, :, tl : clutres - tl] = total / sum(weights)
+            clut = numpy.where(protect[..., numpy.newaxis], clut, smoothed)
+        self.clut = clut.reshape((clutres * clutres, clutres, -1)).tolist()
+
     def smooth2(
         self,
         diagpng=2,
@@ -3757,8 +3953,16 @@ BEGIN_DATA
         filename=None,
         logfile=None,
         window=(1 / 16.0, 1, 1 / 16.0),
+        use_numpy=False,
     ):
-        """Apply extra smoothing to the cLUT"""
+        """
+        Apply extra smoothing to the cLUT
+
+        If use_numpy is True, the smoothing passes are done on an array in
+        one go (not possible when writing diagnostic PNGs of all
+        intermediate states, i.e. diagpng == 3).
+
+        """
         if not pcs:
             if self.profile:
                 pcs = self.profile.connectionColorSpace
@@ -3784,21 +3988,17 @@ BEGIN_DATA
         if logfile:
             logfile.write("Smoothing %s...\n" % sig)
 
+        if use_numpy and diagpng != 3:
+            self._smooth2_array(pcs, window)
+            if diagpng and filename:
+                self.clut_writepng(fname + ".%s.post.CLUT.smooth.png" % sig)
+            return
+
         for i in range(3):
             state = ("original", "pass", "final")[i]
             if diagpng != 3 and i != 1:
                 continue
-            for j, (order, channels) in enumerate(
-                [
-                    (None, "BGR"),
-                    ((1, 2, 0), "RBG"),
-                    ((0, 2, 1), "BRG"),
-                    ((2, 1, 0), "GRB"),
-                    ((0, 2, 1), "RGB"),
-                    ((2, 0, 1), "GBR"),
-                    ((0, 2, 1), "BGR"),
-                ]
-            ):
+            for j, (order, channels) in enumerate(self._smooth2_orders):
                 if order:
                     if debug:
                         safe_print("Shifting order to", channels)
@@ -3806,26 +4006,9 @@ BEGIN_DATA
                 if i == 1 and j != 6:
                     if debug:
                         safe_print("Smoothing")
-                    exclude = None
-                    protect_gray_axis = True
-                    if pcs == "Lab":
-                        if clutres // 2 != clutres / 2.0:
-                            # For CIELab cLUT, gray will only
-                            # fall on a cLUT point if uneven cLUT res
-                            if channels in ("RBG", "RGB"):
-                                exclude = [
-                                    ((clutres // 2 + 1) * (clutres - 1), col)
-                                    for col in range(clutres)
-                                ]
-                                protect_gray_axis = False
-                            elif channels in ("BRG", "GRB"):
-                                exclude = [
-                                    ((clutres // 2) * clutres + y, clutres // 2)
-                                    for y in range(clutres)
-                                ]
-                                protect_gray_axis = False
-                        else:
-                            protect_gray_axis = False
+                    exclude, protect_gray_axis = self._get_smooth2_protection(
+                        pcs, clutres, channels
+                    )
                     self.clut_row_apply_per_channel(
                         (0, 1, 2),
                         colormath.smooth_avg,
@@ -3991,6 +4174,8 @@ class CurveType(ICCProfileTag, list):
         else:
             # Identity
             self.append(1.0)
+        # Unmodified, can be written using the original tag data
+        self._tagData = tagData
 
     def __delitem__(self, y):
         list.__delitem__(self, y)
@@ -4019,6 +4204,7 @@ class CurveType(ICCProfileTag, list):
     def _reset(self):
         self._transfer_function = {}
         self._bt1886 = {}
+        self._tagData = None
 
     def append(self, object):
         list.append(self, object)
@@ -4027,6 +4213,22 @@ class CurveType(ICCProfileTag, list):
     def apply_bpc(self, black_Y_out=0, weight=False):
         if len(self) < 2:
             return
+        if not weight:
+            import numpy
+
+            # Unweighted black point compensation of neutrals is a linear
+            # mapping of Y. Same operation order as colormath.apply_bpc, so
+            # results are identical to the per-entry computation (e.g. white
+            # stays exactly at 65535)
+            bp_in = self[0] / 65535.0
+            wp_out = self[-1] / 65535.0
+            Y = numpy.array(self, dtype=numpy.float64) / 65535.0
+            self[:] = (
+                ((wp_out - black_Y_out) * Y - wp_out * (bp_in - black_Y_out))
+                / (wp_out - bp_in)
+                * 65535.0
+            ).tolist()
+            return
         D50_xyY = colormath.XYZ2xyY(*colormath.get_whitepoint("D50"))
         bp_in = colormath.xyY2XYZ(D50_xyY[0], D50_xyY[1], self[0] / 65535.0)
         bp_out = colormath.xyY2XYZ(D50_xyY[0], D50_xyY[1], black_Y_out)
@@ -4060,13 +4262,23 @@ class CurveType(ICCProfileTag, list):
                 return values[0]
             return [values[0]]
         if lstar_slice:
+            import numpy
+
             start = slice[0] * 100
             end = slice[1] * 100
-            values = []
-            for i, y in enumerate(self):
-                n = colormath.XYZ2Lab(0, y / 65535.0 * 100, 0)[0]
-                if n >= start and n <= end:
-                    values.append((i / (len(self) - 1.0) * 65535.0, y))
+            y = numpy.array(self, dtype=numpy.float64)
+            # L* (D50), see colormath.XYZ2Lab
+            Yr = y / 65535.0
+            fy = numpy.where(
+                Yr > colormath.LSTAR_E,
+                numpy.cbrt(Yr),
+                (colormath.LSTAR_K * Yr + 16) / 116.0,
+            )
+            L = 116 * fy - 16
+            i = numpy.flatnonzero((L >= start) & (L <= end))
+            values = list(
+                zip((i / (len(self) - 1.0) * 65535.0).tolist(), y[i].tolist())
+            )
         else:
             maxv = len(self) - 1.0
             maxi = int(maxv)
@@ -4101,8 +4313,11 @@ class CurveType(ICCProfileTag, list):
         transfer_function = self._transfer_function.get((best, slice))
         if transfer_function:
             return transfer_function
+        import numpy
+
         trc = CurveType()
         match = {}
+        candidates = []
         otrc = CurveType()
         otrc[:] = self
         if otrc[0]:
@@ -4162,41 +4377,37 @@ class CurveType(ICCProfileTag, list):
                 trc.set_trc(exp, len(self), vmin, vmax)
             if trc[0] and trc[-1] - trc[0]:
                 trc.apply_bpc()
-            if otrc == trc:
-                match[(name, exp, outoffset)] = 1.0
+            candidates.append(((name, exp, outoffset), list(trc)))
+        # Compare the gamma of each entry in the slice with all candidates
+        # in one pass
+        size = len(self)
+        indexes = numpy.arange(size)
+        indexes = indexes[(indexes >= slice[0] * size) & (indexes <= slice[1] * size)]
+        x = indexes / (size - 1.0) * 65535.0
+        n = colormath.get_gamma_array(
+            x, numpy.array(otrc, dtype=numpy.float64)[indexes], 65535.0, vmin, vmax
+        )
+        n2 = colormath.get_gamma_array(
+            x,
+            numpy.array([values for key, values in candidates], dtype=numpy.float64)[
+                :, indexes
+            ],
+            65535.0,
+            vmin,
+            vmax,
+        )
+        valid = ~numpy.isnan(n) & ~numpy.isnan(n2) & (n2 != 0)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            similarity = numpy.where(
+                valid, 1 - numpy.abs(n - n2) / ((n + n2) / 2.0), 0
+            )
+        count = valid.sum(axis=1)
+        similarity = similarity.sum(axis=1) / numpy.maximum(count, 1)
+        for (key, values), value in zip(candidates, similarity.tolist()):
+            if otrc == values:
+                match[key] = 1.0
             else:
-                match[(name, exp, outoffset)] = 0.0
-                count = 0
-                start = slice[0] * len(self)
-                end = slice[1] * len(self)
-                for i, n in enumerate(otrc):
-                    ##n = colormath.XYZ2Lab(0, n / 65535.0 * 100, 0)[0]
-                    if i >= start and i <= end:
-                        n = colormath.get_gamma(
-                            [(i / (len(self) - 1.0) * 65535.0, n)],
-                            65535.0,
-                            vmin,
-                            vmax,
-                            False,
-                        )
-                        if n:
-                            n = n[0]
-                            ##n2 = colormath.XYZ2Lab(0, trc[i] / 65535.0 * 100, 0)[0]
-                            n2 = colormath.get_gamma(
-                                [(i / (len(self) - 1.0) * 65535.0, trc[i])],
-                                65535.0,
-                                vmin,
-                                vmax,
-                                False,
-                            )
-                            if n2 and n2[0]:
-                                n2 = n2[0]
-                                match[(name, exp, outoffset)] += 1 - (
-                                    max(n, n2) - min(n, n2)
-                                ) / ((n + n2) / 2.0)
-                                count += 1
-                if count:
-                    match[(name, exp, outoffset)] /= count
+                match[key] = value
         if not best:
             self._transfer_function[(best, slice)] = match
             return match
@@ -4254,9 +4465,11 @@ class CurveType(ICCProfileTag, list):
         bt1886 = colormath.BT1886(mtx, XYZbp, outoffset, gamma)
         self._bt1886[(gamma, black_Y, outoffset)] = bt1886
         self.set_trc(-709, size)
-        for i, v in enumerate(self):
-            X, Y, Z = colormath.xyY2XYZ(x, y, v / 65535.0)
-            self[i] = bt1886.apply(X, Y, Z)[1] * 65535.0
+        import numpy
+
+        Y = numpy.array(self, dtype=numpy.float64) / 65535.0
+        XYZ = numpy.column_stack((x * Y / y, Y, (1 - x - y) * Y / y))
+        self[:] = (bt1886.apply_array(XYZ)[:, 1] * 65535.0).tolist()
 
     def set_dicom_trc(self, black_cdm2=0.05, white_cdm2=100, size=None):
         """
@@ -4476,6 +4689,8 @@ class CurveType(ICCProfileTag, list):
 		"""
 
         def fget(self):
+            if self._tagData:
+                return self._tagData
             if len(self) == 1 and self[0] == 1.0:
                 # Identity
                 curveEntriesCount = 0
@@ -5318,6 +5533,21 @@ def TextType(tagData, tagSignature):
     return tag
 
 
+def _get_array_quantizer(quantizer):
+    """Return the numpy equivalent of a quantizer function (e.g. round)"""
+    import numpy
+
+    quantizers = {
+        round: numpy.round,
+        math.floor: numpy.floor,
+        math.ceil: numpy.ceil,
+        int: numpy.trunc,
+    }
+    if quantizer in quantizers:
+        return quantizers[quantizer]
+    return numpy.vectorize(quantizer, otypes=[numpy.float64])
+
+
 class VideoCardGammaType(ICCProfileTag, ADict):
 
     # Private tag
@@ -5459,16 +5689,21 @@ class VideoCardGammaFormulaType(VideoCardGammaType):
     def getNormalizedValues(self, amount=None):
         if amount is None:
             amount = 256  # common value
-        step = 1.0 / float(amount - 1)
-        rgb = AODict([("red", []), ("green", []), ("blue", [])])
-        for i in range(0, amount):
-            for key in rgb:
-                rgb[key].append(
-                    float(self[key + "Min"])
-                    + math.pow(step * i / 1.0, float(self[key + "Gamma"]))
-                    * float(self[key + "Max"] - self[key + "Min"])
-                )
-        return list(zip(*list(rgb.values())))
+        return list(zip(*self._get_array(amount).tolist()))
+
+    def _get_array(self, entryCount):
+        """Return normalized values as numpy array (channels x entries)"""
+        import numpy
+
+        x = numpy.arange(entryCount) * (1.0 / (entryCount - 1))
+        return numpy.array(
+            [
+                float(self[key + "Min"])
+                + x ** float(self[key + "Gamma"])
+                * float(self[key + "Max"] - self[key + "Min"])
+                for key in ("red", "green", "blue")
+            ]
+        )
 
     def getTableType(self, entryCount=256, entrySize=2, quantizer=round):
         """
@@ -5488,15 +5723,11 @@ class VideoCardGammaFormulaType(VideoCardGammaType):
             4: uInt32Number_tohex,
             8: uInt64Number_tohex,
         }
-        for key in ("red", "green", "blue"):
-            for i in range(0, entryCount):
-                vmin = float(self[key + "Min"])
-                vmax = float(self[key + "Max"])
-                gamma = float(self[key + "Gamma"])
-                v = vmin + math.pow(1.0 / (entryCount - 1) * i, gamma) * float(
-                    vmax - vmin
-                )
-                tagData.append(int2hex[entrySize](quantizer(v * maxValue)))
+        quantize = _get_array_quantizer(quantizer)
+        values = quantize(self._get_array(entryCount) * maxValue)
+        for channel in values.tolist():
+            for v in channel:
+                tagData.append(int2hex[entrySize](v))
         return VideoCardGammaTableType("".join(tagData), self.tagSignature)
 
 
@@ -5533,21 +5764,28 @@ class VideoCardGammaTableType(VideoCardGammaType):
                 j = j + 1
             i = i + 1
 
+    def _get_array(self):
+        """Return table data as numpy array (channels x entries)"""
+        import numpy
+
+        if not self.data:
+            return numpy.zeros((0, 0))
+        return numpy.array(self.data, dtype=numpy.float64)
+
     def getNormalizedValues(self, amount=None):
+        import numpy
+
         if amount is None:
             amount = self.entryCount
         maxValue = math.pow(256, self.entrySize) - 1
-        values = list(
-            zip(*[[entry / maxValue for entry in channel] for channel in self.data])
-        )
+        values = self._get_array() / maxValue
         if amount <= self.entryCount:
             step = self.entryCount / float(amount - 1)
-            all = values
-            values = []
-            for i, value in enumerate(all):
-                if i == 0 or (i + 1) % step < 1 or i + 1 == self.entryCount:
-                    values.append(value)
-        return values
+            i = numpy.arange(values.shape[1])
+            values = values[
+                :, (i == 0) | ((i + 1) % step < 1) | (i + 1 == self.entryCount)
+            ]
+        return list(zip(*values.tolist()))
 
     def getFormulaType(self):
         """
@@ -5582,32 +5820,40 @@ class VideoCardGammaTableType(VideoCardGammaType):
         table precision bits.
 
         """
+        import numpy
+
         oldmax = math.pow(256, self.entrySize) - 1
         if bits in (8, 16, 32, 64):
-            self.entrySize = bits / 8
+            self.entrySize = bits // 8
         bitv = 2.0**bits
         newmax = math.pow(256, self.entrySize) - 1
-        for i, channel in enumerate(self.data):
-            for j, value in enumerate(channel):
-                channel[j] = int(quantizer(value / oldmax * bitv) / bitv * newmax)
+        values = (
+            _get_array_quantizer(quantizer)(self._get_array() / oldmax * bitv)
+            / bitv
+            * newmax
+        )
+        if self.entrySize < 8:
+            values = values.astype(numpy.int64).tolist()
+        else:
+            # Exceeds int64 range
+            values = [[int(value) for value in channel] for channel in values.tolist()]
+        for channel, quantized in zip(self.data, values):
+            channel[:] = quantized
 
     def resize(self, length=128):
-        data = [[], [], []]
-        for i, channel in enumerate(self.data):
-            for j in range(0, length):
-                j *= (len(channel) - 1) / float(length - 1)
-                if int(j) != j:
-                    floor = channel[int(math.floor(j))]
-                    ceil = channel[min(int(math.ceil(j)), len(channel) - 1)]
-                    interpolated = range(floor, ceil + 1)
-                    fraction = j - int(j)
-                    index = int(round(fraction * (ceil - floor)))
-                    v = interpolated[index]
-                else:
-                    v = channel[int(j)]
-                data[i].append(v)
+        import numpy
+
+        data = []
+        for channel in self.data:
+            channel = numpy.array(channel)
+            j = numpy.arange(length) * ((len(channel) - 1) / float(length - 1))
+            floor = channel[numpy.floor(j).astype(int)]
+            ceil = channel[numpy.minimum(numpy.ceil(j).astype(int), len(channel) - 1)]
+            fraction = j - numpy.floor(j)
+            v = floor + numpy.round(fraction * (ceil - floor))
+            data.append(v.astype(channel.dtype).tolist())
         self.data = data
-        self.entryCount = len(data[0])
+        self.entryCount = length
 
     def resized(self, length=128):
         resized = self.__class__(self.tagData, self.tagSignature)
@@ -5618,12 +5864,15 @@ class VideoCardGammaTableType(VideoCardGammaType):
         """
         Smooth video LUT curves (Catmull-Rom).
         """
+        import numpy
+
         resized = self.resized(length)
-        for i in range(0, len(self.data)):
-            step = float(length - 1) / (len(self.data[i]) - 1)
+        for i, channel in enumerate(self.data):
+            step = float(length - 1) / (len(channel) - 1)
             interpolation = CRInterpolation(resized.data[i])
-            for j in range(0, len(self.data[i])):
-                self.data[i][j] = interpolation(j * step)
+            channel[:] = interpolation.interp(
+                numpy.arange(len(channel)) * step
+            ).tolist()
 
     def smooth_avg(self, passes=1, window=None):
         """
@@ -5830,15 +6079,21 @@ class XYZType(ICCProfileTag, XYZNumber):
         ICCProfileTag.__init__(self, tagData, tagSignature)
         XYZNumber.__init__(self, tagData[8:20])
         self.profile = profile
+        # Unmodified, can be written using the original tag data
+        self._tagData = tagData
 
     __repr__ = XYZNumber.__repr__
 
     def __setattr__(self, name, value):
-        if name in ("_keys", "profile", "tagData", "tagSignature"):
+        if name in ("_keys", "_tagData", "profile", "tagData", "tagSignature"):
             object.__setattr__(self, name, value)
         else:
             self[name] = value
 
+    def __setitem__(self, key, value):
+        XYZNumber.__setitem__(self, key, value)
+        self._tagData = None
+
     def adapt(self, whitepoint_source=None, whitepoint_destination=None, cat=None):
         if cat is None:
             if self.profile and isinstance(
@@ -5917,6 +6172,8 @@ class XYZType(ICCProfileTag, XYZNumber):
 		"""
 
         def fget(self):
+            if self._tagData:
+                return self._tagData
             tagData = ["XYZ ", "\0" * 4]
             tagData.append(self.tohex())
             return "".join(tagData)
@@ -5980,12 +6237,27 @@ class chromaticAdaptionTag(colormath.Matrix3x3, s15Fixed16ArrayType):
 
 
 class NamedColor2Value(object):
+
+    # Named color profiles can hold thousands of colors, so instances are
+    # kept compact. PCS and device values are decoded on first access.
+    __slots__ = (
+        "_device",
+        "_devicename",
+        "_pcs",
+        "_pcsname",
+        "devicevalues",
+        "pcsvalues",
+        "rootName",
+    )
+
     def __init__(
         self, valueData="\0" * 38, deviceCoordCount=0, pcs="XYZ", device="RGB"
     ):
         self._pcsname = pcs
         self._devicename = device
-        end = valueData[0:32].find("\0")
+        self._pcs = None
+        self._device = None
+        end = valueData[0:32].find(b"\0" if isinstance(valueData, bytes) else "\0")
         if end < 0:
             end = 32
         self.rootName = valueData[0:end]
@@ -5995,42 +6267,67 @@ class NamedColor2Value(object):
             uInt16Number(valueData[36:38]),
         ]
 
-        self.pcs = AODict()
-        for i, pcsvalue in enumerate(self.pcsvalues):
-            if pcs == "Lab":
-                if i == 0:
-                    # L* range 0..100 + (25500 / 65280.0)
-                    self.pcs[pcs[i]] = pcsvalue / 65536.0 * 256 / 255.0 * 100
-                else:
-                    # a, b range -128..127 + (255/256.0)
-                    self.pcs[pcs[i]] = -128 + (pcsvalue / 65536.0 * 256)
-            elif pcs == "XYZ":
-                # X, Y, Z range 0..100 + (32767 / 32768.0)
-                self.pcs[pcs[i]] = pcsvalue / 32768.0 * 100
-
         deviceCoords = []
         if deviceCoordCount > 0:
             for i in range(38, 38 + deviceCoordCount * 2, 2):
                 deviceCoords.append(uInt16Number(valueData[i : i + 2]))
         self.devicevalues = deviceCoords
-        if device == "Lab":
-            # L* range 0..100 + (25500 / 65280.0)
-            # a, b range range -128..127 + (255 / 256.0)
-            self.device = tuple(
-                v / 65536.0 * 256 / 255.0 * 100
-                if i == 0
-                else -128 + (v / 65536.0 * 256)
-                for i, v in enumerate(deviceCoords)
-            )
-        elif device == "XYZ":
-            # X, Y, Z range 0..100 + (32767 / 32768.0)
-            self.device = tuple(v / 32768.0 * 100 for v in deviceCoords)
-        else:
-            # Device range 0..100
-            self.device = tuple(v / 65535.0 * 100 for v in deviceCoords)
+
+    @Property
+    def device():
+        def fget(self):
+            if self._device is None:
+                device = self._devicename
+                if device == "Lab":
+                    # L* range 0..100 + (25500 / 65280.0)
+                    # a, b range range -128..127 + (255 / 256.0)
+                    self._device = tuple(
+                        v / 65536.0 * 256 / 255.0 * 100
+                        if i == 0
+                        else -128 + (v / 65536.0 * 256)
+                        for i, v in enumerate(self.devicevalues)
+                    )
+                elif device == "XYZ":
+                    # X, Y, Z range 0..100 + (32767 / 32768.0)
+                    self._device = tuple(v / 32768.0 * 100 for v in self.devicevalues)
+                else:
+                    # Device range 0..100
+                    self._device = tuple(v / 65535.0 * 100 for v in self.devicevalues)
+            return self._device
+
+        def fset(self, device):
+            self._device = device
+
+        return locals()
+
+    @Property
+    def pcs():
+        def fget(self):
+            if self._pcs is None:
+                pcs = self._pcsname
+                self._pcs = AODict()
+                for i, pcsvalue in enumerate(self.pcsvalues):
+                    if pcs == "Lab":
+                        if i == 0:
+                            # L* range 0..100 + (25500 / 65280.0)
+                            self._pcs[pcs[i]] = pcsvalue / 65536.0 * 256 / 255.0 * 100
+                        else:
+                            # a, b range -128..127 + (255/256.0)
+                            self._pcs[pcs[i]] = -128 + (pcsvalue / 65536.0 * 256)
+                    elif pcs == "XYZ":
+                        # X, Y, Z range 0..100 + (32767 / 32768.0)
+                        self._pcs[pcs[i]] = pcsvalue / 32768.0 * 100
+            return self._pcs
+
+        def fset(self, pcs):
+            self._pcs = pcs
+
+        return locals()
 
     @property
     def name(self):
+        if isinstance(self.rootName, bytes):
+            return self.rootName.decode("latin-1")
         return str(Text(self.rootName.strip("\0")), "latin-1")
 
     def __repr__(self):
@@ -6121,7 +6418,7 @@ class NamedColor2Type(ICCProfileTag, AODict):
                 )
                 keys.append(nc2.name)
                 values.append(nc2)
-        self.update(OrderedDict(list(zip(keys, values))))
+        self.update(zip(keys, values))
 
     def __setattr__(self, name, value):
         object.__setattr__(self, name, value)
@@ -6259,6 +6556,194 @@ class ICCProfileInvalidError(IOError):
 
 _iccprofilecache = WeakValueDictionary()
 
+# Estimated memory use of a decoded cLUT value (int object and reference to it
+# in the row list)
+CLUT_VALUE_NBYTES = 36
+
+
+def _tobytes(data):
+    if isinstance(data, str):
+        return data.encode("latin-1")
+    return data
+
+
+class ICCProfileCache(object):
+
+    """
+    Bounded LRU cache of parsed profiles with optional disk tier
+
+    The memory tier holds references to the most recently used profiles so
+    they stay in the (weak) profile cache, up to 'maxbytes'. The size of a
+    profile is its raw data plus the estimated size of its decoded cLUTs.
+    Sizes are tracked per entry, cLUTs which are decoded lazily after the
+    profile was cached are accounted for by add_nbytes.
+
+    If 'cachedir' is set, decoded cLUTs are also stored on disk as numpy
+    arrays, keyed by profile ID, tag signature and MD5 of the tag data, so
+    that decoding them again is not necessary even after the profile was
+    evicted or in another process.
+
+    """
+
+    def __init__(self, maxbytes=128 * 1024 * 1024, cachedir=None):
+        self.maxbytes = maxbytes
+        self.cachedir = cachedir
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def get_nbytes(profile):
+        """Return estimated memory use of profile data and decoded cLUTs"""
+        nbytes = len(profile._data) or profile.size
+        for tag in dict.values(profile._tags):
+            if isinstance(tag, LUT16Type) and tag._clut is not None:
+                nbytes += tag._g**tag._i * tag._o * CLUT_VALUE_NBYTES
+        return nbytes
+
+    def get(self, key):
+        """Return cached profile for key (or None) and update statistics"""
+        profile = _iccprofilecache.get(key)
+        if profile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.put(key, profile)
+        return profile
+
+    def put(self, key, profile):
+        _iccprofilecache[key] = profile
+        if self._entries.get(key) is not profile:
+            self._pop(key)
+            self._entries[key] = profile
+            self._sizes[key] = self.get_nbytes(profile)
+            self._nbytes += self._sizes[key]
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def add_nbytes(self, profile, nbytes):
+        """Account for memory allocated by a cached profile (decoded cLUT)"""
+        key = getattr(profile, "_key", None)
+        if key and self._entries.get(key) is profile:
+            self._sizes[key] += nbytes
+            self._nbytes += nbytes
+            self._evict()
+
+    def remove(self, key):
+        self._pop(key)
+        if key in _iccprofilecache:
+            try:
+                del _iccprofilecache[key]
+            except KeyError:
+                # GC was faster
+                pass
+
+    def _pop(self, key):
+        if self._entries.pop(key, None) is not None:
+            self._nbytes -= self._sizes.pop(key)
+
+    def _evict(self):
+        # Evict least recently used, but always keep the most recent entry
+        while self._nbytes > self.maxbytes and len(self._entries) > 1:
+            key, profile = self._entries.popitem(last=False)
+            self._nbytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self._nbytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "nbytes": self._nbytes,
+            "maxbytes": self.maxbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+        }
+
+    def _get_clut_path(self, tag):
+        ID = getattr(tag.profile, "ID", None) or "\0" * 16
+        return os.path.join(
+            self.cachedir,
+            "%s-%s-%s.npy"
+            % (
+                binascii.hexlify(_tobytes(ID)).decode("ASCII"),
+                re.sub(r"[^\w]", "_", str(tag.tagSignature)),
+                md5(_tobytes(tag._tagData)).hexdigest(),
+            ),
+        )
+
+    def load_clut(self, tag):
+        """Return decoded cLUT of a LUT16Type tag from the disk tier, or None"""
+        if not self.cachedir:
+            return None
+        path = self._get_clut_path(tag)
+        try:
+            import numpy
+
+            if os.path.isfile(path):
+                clut = numpy.load(path).tolist()
+                self.disk_hits += 1
+                return clut
+        except (ImportError, EnvironmentError, ValueError) as exception:
+            safe_print("Warning - could not load cached cLUT:", exception)
+        self.disk_misses += 1
+
+    def store_clut(self, tag, clut):
+        """Store decoded cLUT of a LUT16Type tag in the disk tier"""
+        if not self.cachedir:
+            return
+        path = self._get_clut_path(tag)
+        try:
+            import numpy
+
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            with open(path + ".tmp", "wb") as npyfile:
+                numpy.save(npyfile, numpy.array(clut, dtype=numpy.uint16))
+            os.replace(path + ".tmp", path)
+        except (ImportError, EnvironmentError) as exception:
+            # Disk tier is optional
+            safe_print("Warning - could not store cLUT in cache:", exception)
+
+
+profile_cache = ICCProfileCache(cachedir=os.path.join(cache, appname, "clut"))
+
+
+def _find_profile(filename):
+    """Return full path of a profile given its bare filename (if found)"""
+    if re.search(r"\.ic[cm]$", filename, re.I):
+        # Only files with profile extension are indexed
+        try:
+            return profile_index.find(filename) or filename
+        except (sqlite3.Error, EnvironmentError) as exception:
+            safe_print("Warning - profile index not available:", exception)
+    for path in iccprofiles_home + [
+        x for x in iccprofiles if x not in iccprofiles_home
+    ]:
+        if os.path.isdir(path):
+            for path, dirs, files in os.walk(path):
+                path = os.path.join(path, filename)
+                if os.path.isfile(path):
+                    return path
+    return filename
+
 
 class ICCProfile(object):
 
@@ -6273,8 +6758,6 @@ class ICCProfile(object):
 
     """
 
-    _recent = []
-
     def __new__(cls, profile=None, load=True, use_cache=False):
 
         key = None
@@ -6292,17 +6775,7 @@ class ICCProfile(object):
                         or not os.path.altsep in profile
                     )
                 ):
-                    for path in iccprofiles_home + [
-                        x for x in iccprofiles if x not in iccprofiles_home
-                    ]:
-                        if os.path.isdir(path):
-                            for path, dirs, files in os.walk(path):
-                                path = os.path.join(path, profile)
-                                if os.path.isfile(path):
-                                    profile = path
-                                    break
-                            if profile == path:
-                                break
+                    profile = _find_profile(profile)
                 if use_cache:
                     stat = os.stat(profile)
                     # NOTE under Python 2.x Windows, st_ino is always zero!
@@ -6323,7 +6796,7 @@ class ICCProfile(object):
                     key = md5(profile).hexdigest()
 
             if use_cache:
-                chk = _iccprofilecache.get(key)
+                chk = profile_cache.get(key)
                 if chk:
                     return chk
 
@@ -6333,14 +6806,6 @@ class ICCProfile(object):
 
         self = super(ICCProfile, cls).__new__(cls)
 
-        if use_cache and key:
-            _iccprofilecache[key] = self
-
-            # Make sure most recent three are not garbage collected
-            if len(ICCProfile._recent) == 3:
-                ICCProfile._recent.pop(0)
-            ICCProfile._recent.append(self)
-
         self._key = key
         self.ID = "\0" * 16
         self._data = ""
@@ -6351,6 +6816,9 @@ class ICCProfile(object):
         self.is_loaded = False
         self.size = 0
 
+        if use_cache and key:
+            profile_cache.put(key, self)
+
         if profile is not None:
 
             if isinstance(profile, str):
@@ -6471,6 +6939,8 @@ class ICCProfile(object):
                     if vcgt:
                         self.tags["vcgt"] = vcgt
                 self.size = len(self.data)
+                if use_cache and key:
+                    profile_cache.add_nbytes(self, self.size)
                 return self
 
             if data[36:40] != "acsp":
@@ -6519,6 +6989,9 @@ class ICCProfile(object):
                 self.ID = header[84:100]
 
             self._data = data[: self.size]
+            if use_cache and key:
+                # The profile was cached before any data was read
+                profile_cache.add_nbytes(self, len(self._data))
 
             if load:
                 self.tags
@@ -6569,21 +7042,21 @@ class ICCProfile(object):
         """
         return len(self.tags)
 
-    @property
-    def data(self):
+    def _assemble(self):
         """
-        Get raw binary profile data.
+        Assemble tag table and tag data.
 
-        This will re-assemble the various profile parts (header,
-        tag table and data) on-the-fly.
+        Return tag table size, tag data size and the list of parts following
+        the header (tag count, tag table, tag data and padding). The parts
+        are not joined, so tag data is not copied. Unmodified tags return
+        the data they were loaded from, so they don't need to be re-encoded.
 
         """
-        # Assemble tag table and tag data
         tagCount = len(self.tags)
         tagTable = OrderedDict()
         tagTableSize = tagCount * 12
         tagsData = []
-        tagsDataOffset = []
+        tagsDataOffsets = {}
         tagDataOffset = 128 + 4 + tagTableSize
         tags = []
         # Order of tag table and actual tag data may be different.
@@ -6605,31 +7078,35 @@ class ICCProfile(object):
             tagDataSize = len(tagData)
             # Pad all data with binary zeros so it lies on 4-byte boundaries
             padding = int(math.ceil(tagDataSize / 4.0)) * 4 - tagDataSize
-            tagData += "\0" * padding
             if (
                 tagDataOffset,
                 tagSignature,
-            ) not in self._tagoffsets and tagData in tagsData:
-                tagTable[tagSignature] += uInt32Number_tohex(
-                    tagsDataOffset[tagsData.index(tagData)]
-                )
+            ) not in self._tagoffsets and tagData in tagsDataOffsets:
+                # Shared tag data
+                tagTable[tagSignature] += uInt32Number_tohex(tagsDataOffsets[tagData])
             else:
                 tagTable[tagSignature] += uInt32Number_tohex(tagDataOffset)
                 tagsData.append(tagData)
-                tagsDataOffset.append(tagDataOffset)
+                if padding:
+                    tagsData.append("\0" * padding)
+                tagsDataOffsets.setdefault(tagData, tagDataOffset)
                 tagDataOffset += tagDataSize + padding
             tagTable[tagSignature] += uInt32Number_tohex(tagDataSize)
-        tagsData = "".join(tagsData)
-        header = self.header(tagTableSize, len(tagsData))
-        data = "".join(
-            [
-                header,
-                uInt32Number_tohex(tagCount),
-                "".join(list(tagTable.values())),
-                tagsData,
-            ]
-        )
-        return data
+        parts = [uInt32Number_tohex(tagCount), "".join(list(tagTable.values()))]
+        parts.extend(tagsData)
+        return tagTableSize, tagDataOffset - 128 - 4 - tagTableSize, parts
+
+    @property
+    def data(self):
+        """
+        Get raw binary profile data.
+
+        This will re-assemble the various profile parts (header,
+        tag table and data) on-the-fly.
+
+        """
+        tagTableSize, tagDataSize, parts = self._assemble()
+        return "".join([self.header(tagTableSize, tagDataSize)] + parts)
 
     def header(self, tagTableSize, tagDataSize):
         "Profile Header"
@@ -6788,17 +7265,23 @@ class ICCProfile(object):
         temporarily replaced with zeros.
 
         """
-        data = self.data
-        data = (
-            data[:44]
+        return self._calculateID(*self._assemble(), setID=setID)
+
+    def _calculateID(self, tagTableSize, tagDataSize, parts, setID=True):
+        # Calculate the ID incrementally over the assembled parts
+        header = self.header(tagTableSize, tagDataSize)
+        checksum = md5(
+            header[:44]
             + "\0\0\0\0"
-            + data[48:64]
+            + header[48:64]
             + "\0\0\0\0"
-            + data[68:84]
+            + header[68:84]
             + "\0\0\0\0\0\0\0\0\0\0\0\0\0\0\0\0"
-            + data[100:]
+            + header[100:]
         )
-        ID = md5(data).digest()
+        for part in parts:
+            checksum.update(part)
+        ID = checksum.digest()
         if setID:
             if ID != self.ID:
                 # No longer reflects original profile
@@ -7490,9 +7973,11 @@ class ICCProfile(object):
             if self._file.closed:
                 self._file = open(self._file.name, "rb")
                 self._file.seek(len(self._data))
-            self._data += self._file.read(self.size - len(self._data))
+            data = self._file.read(self.size - len(self._data))
+            self._data += data
             self._file.close()
             self.is_loaded = True
+            profile_cache.add_nbytes(self, len(data))
 
     def print_info(self):
         safe_print("=" * 80)
@@ -8175,12 +8660,17 @@ class ICCProfile(object):
                 for key, factor in gamut_coverage.items():
                     self.tags.meta["GAMUT_coverage(%s)" % key] = factor
 
-    def write(self, stream_or_filename=None):
+    def write(self, stream_or_filename=None, update_ID=False):
         """
         Write profile to stream.
 
         This will re-assemble the various profile parts (header,
-        tag table and data) on-the-fly.
+        tag table and data) on-the-fly and write them to the stream one
+        after the other.
+
+        If update_ID is True, the profile ID is calculated first (same as
+        calling calculateID before writing, but assembling the profile
+        only once).
 
         """
         if not stream_or_filename:
@@ -8194,7 +8684,12 @@ class ICCProfile(object):
                 self.fileName = stream_or_filename
         else:
             stream = stream_or_filename
-        stream.write(self.data)
+        tagTableSize, tagDataSize, parts = self._assemble()
+        if update_ID:
+            self._calculateID(tagTableSize, tagDataSize, parts)
+        stream.write(self.header(tagTableSize, tagDataSize))
+        for part in parts:
+            stream.write(part)
         if isinstance(stream_or_filename, str):
             stream.close()
 
@@ -8206,9 +8701,5 @@ class ICCProfile(object):
 
     def _delfromcache(self):
         # Make doubly sure to remove ourself from the cache
-        if self._key and self._key in _iccprofilecache:
-            try:
-                del _iccprofilecache[self._key]
-            except KeyError:
-                # GC was faster
-                pass
+        if self._key:
+            profile_cache.remove(self._key)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+Single-pass parser turning Argyll CMS utility output into typed events
+
+All patterns of interest are combined into one precompiled regular
+expression, so each chunk of output is scanned once regardless of the
+number of event types. Consumers can either use the list of events
+returned by ArgyllOutputParser.feed, or subscribe to event types.
+
+Run this module with recorded Argyll output (e.g. session logs) as
+arguments to compare its throughput against separate searches per pattern.
+
+"""
+
+import re
+import sys
+from collections import namedtuple
+from time import perf_counter
+
+# Event types
+PATCH = "patch"  # Patch N of M, value = (N, M)
+PATCH_COUNT = "patch_count"  # Number of patches = M, value = M
+RGB = "rgb"  # Current RGB sent to a pattern generator, value = (R, G, B)
+READING = "reading"  # XYZ reading, value = (X, Y, Z)
+INSTRUMENT = "instrument"  # Instrument name, value = name
+SERIAL = "serial"  # Instrument serial number, value = serial
+PROMPT = "prompt"  # Prompt for user interaction, value = prompt line
+ERROR = "error"  # Error message, value = message line
+START = "start"  # Start of a measurement sequence, value = None
+UPDATE = "update"  # Patch update, value = None
+REMOVED = "removed"  # Instrument can be removed from screen, value = None
+
+ArgyllEvent = namedtuple("ArgyllEvent", ("type", "value", "text"))
+
+_NUMBER = r"-?\d+(?:\.\d+)?"
+
+# Prompts and errors are anchored at the start of a line so the unbounded
+# line match is only attempted once per line. They are lookahead-only (zero
+# width), so the rest of the line is still scanned for other events (e.g.
+# 'patch N of M' on a prompt line). Patterns which may overlap with others
+# (e.g. "\ current" and "Current RGB") use lookahead so they don't consume
+# the text the other pattern needs.
+_EVENTS_RE = re.compile(
+    r"^(?=(?P<prompt>[^\r\n]*?(?:key to continue|key to retry|"
+    r"key to take a reading|space when done)[^\r\n]*))"
+    r"|^(?=(?P<error>[^\r\n]*?\b(?:Error|Fatal)\b\s*-[^\r\n]*))"
+    r"|(?P<instrument_key>Instrument Type|Product Name|Model|Identificaton):"
+    r"[ \t]+(?P<instrument>[^\r\n]+)"
+    r"|Serial Number:[ \t]+(?P<serial>[^\r\n]+)"
+    r"|patch (?P<patch>\d+) of (?P<patch_total>\d+)"
+    r"|Number of patches = (?P<patch_count>\d+)"
+    r"|Current RGB(?:\s+\d+){3}(?P<rgb>(?:\s+\d+(?:\.\d+)){3})"
+    r"|XYZ(?::|\s+=)?\s+(?P<XYZ>%s\s+%s\s+%s)" % ((_NUMBER,) * 3)
+    + r"|(?P<update>[/\\] (?=current))"
+    r"|(?P<start>press 1)"
+    r"|(?P<removed>the instrument can be removed from the screen)",
+    re.I | re.M,
+)
+
+
+class ArgyllOutputParser(object):
+
+    """
+    Turn Argyll utility output into a sequence of ArgyllEvent tuples
+
+    A patch update (UPDATE) is reported for 'Patch N of M' and progress
+    marker ('/ current', '\\ current') lines, a measurement sequence start
+    (START) for the first patch and 'press 1'/'space when done' prompts,
+    in addition to the more specific events.
+
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, event_type, callback):
+        """Call callback(event) for each event of event_type (None = all)"""
+        self._subscribers.setdefault(event_type, []).append(callback)
+
+    def unsubscribe(self, event_type, callback):
+        callbacks = self._subscribers.get(event_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def feed(self, txt):
+        """Parse a chunk of output, dispatch and return its events"""
+        events = []
+        for match in _EVENTS_RE.finditer(txt):
+            self._add_events(match, events)
+        if self._subscribers:
+            for event in events:
+                for event_type in (event.type, None):
+                    for callback in self._subscribers.get(event_type, ()):
+                        callback(event)
+        return events
+
+    @staticmethod
+    def _add_events(match, events):
+        kind = match.lastgroup
+        if kind in ("prompt", "error"):
+            # Zero width match
+            text = match.group(kind)
+        else:
+            text = match.group(0)
+        if kind == "prompt":
+            events.append(ArgyllEvent(PROMPT, text.strip(), text))
+            if "space when done" in text.lower():
+                events.append(ArgyllEvent(START, None, text))
+        elif kind == "error":
+            events.append(ArgyllEvent(ERROR, text.strip(), text))
+        elif kind == "instrument":
+            events.append(ArgyllEvent(INSTRUMENT, match.group("instrument"), text))
+        elif kind == "serial":
+            events.append(ArgyllEvent(SERIAL, match.group("serial"), text))
+        elif kind == "patch_total":
+            number = int(match.group("patch"))
+            if number == 1:
+                events.append(ArgyllEvent(START, None, text))
+            events.append(
+                ArgyllEvent(PATCH, (number, int(match.group("patch_total"))), text)
+            )
+            events.append(ArgyllEvent(UPDATE, None, text))
+        elif kind == "patch_count":
+            events.append(
+                ArgyllEvent(PATCH_COUNT, int(match.group("patch_count")), text)
+            )
+        elif kind == "rgb":
+            events.append(
+                ArgyllEvent(
+                    RGB, tuple(float(v) for v in match.group("rgb").split()), text
+                )
+            )
+        elif kind == "XYZ":
+            events.append(
+                ArgyllEvent(
+                    READING, tuple(float(v) for v in match.group("XYZ").split()), text
+                )
+            )
+        elif kind == "update":
+            events.append(ArgyllEvent(UPDATE, None, text))
+        elif kind == "start":
+            events.append(ArgyllEvent(START, None, text))
+        elif kind == "removed":
+            events.append(ArgyllEvent(REMOVED, None, text))
+
+
+def _scan_separately(txt):
+    """Separate searches per pattern, as done before the parser existed"""
+    re.search(
+        r"(?:Instrument Type|Product Name|Model|Identificaton):\s+([^\r\n]+)",
+        txt,
+        re.I,
+    )
+    re.search(r"(?:Serial Number):\s+([^\r\n]+)", txt, re.I)
+    re.search("press 1|space when done|patch 1 of ", txt, re.I)
+    re.search(
+        r"[/\\] current|patch \d+ of |the instrument can be removed from the screen",
+        txt,
+        re.I,
+    )
+    re.search(r"Current RGB(?:\s+\d+){3}((?:\s+\d+(?:\.\d+)){3})", txt)
+    re.search("(?:Patch (\\d+) of|Number of patches =) (\\d+)", txt, re.I)
+    re.search(r"Patch (\d+) of (\d+)", txt, re.I)
+    re.search(r"XYZ(?::|\s+=)?\s+(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)", txt)
+    "the instrument can be removed from the screen" in txt.lower()
+    "patch 1 of " in txt.lower()
+
+
+def replay_benchmark(paths, repeat=5):
+    """
+    Replay recorded output line by line through the parser and through
+    separate searches, return (patches, parser seconds, separate seconds)
+
+    """
+    lines = []
+    for path in paths:
+        with open(path, "r", errors="replace") as log:
+            lines.extend(log.read().splitlines(True))
+    parser = ArgyllOutputParser()
+    patches = sum(
+        1 for line in lines for event in parser.feed(line) if event.type == UPDATE
+    )
+    results = []
+    for fn in (parser.feed, _scan_separately):
+        ts = perf_counter()
+        for i in range(repeat):
+            for line in lines:
+                fn(line)
+        results.append((perf_counter() - ts) / repeat)
+    return (patches,) + tuple(results)
+
+
+if __name__ == "__main__":
+    if not sys.argv[1:]:
+        print("Usage: %s argyll_output.log [...]" % sys.argv[0])
+    else:
+        patches, parser_s, separate_s = replay_benchmark(sys.argv[1:])
+        per_patch = max(patches, 1)
+        print("Patch updates: %i" % patches)
+        print(
+            "Single-pass parser: %.3f ms (%.1f us per patch)"
+            % (parser_s * 1000, parser_s / per_patch * 1e6)
+        )
+        print(
+            "Separate searches: %.3f ms (%.1f us per patch)"
+            % (separate_s * 1000, separate_s / per_patch * 1e6)
+        )
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of Argyll CMS utility capabilities
+
+Version strings, technology strings and instrument measurement modes are
+learned by running Argyll utilities and parsing their usage output. The
+results only depend on the executable, so they are stored in a JSON file
+in the cache directory, keyed by the executable's path, size and
+modification time. As long as the Argyll installation doesn't change, the
+utilities don't need to be run again in later sessions.
+
+"""
+
+import json
+import os
+import threading
+
+from .defaultpaths import cache
+from .log import safe_print
+from .meta import name as appname
+
+
+class ArgyllCapabilityCache(object):
+
+    """
+    Persistent cache of values per Argyll executable
+
+    Values for an executable are discarded as soon as its size or
+    modification time changes. Values need to be JSON serializable.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _get_stamp(exe):
+        stat = os.stat(exe)
+        return [stat.st_size, stat.st_mtime]
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.isfile(self.path):
+                try:
+                    with open(self.path, "r") as cachefile:
+                        self._entries = json.load(cachefile)
+                except (EnvironmentError, ValueError) as exception:
+                    safe_print("Warning - could not read %s:" % self.path, exception)
+        return self._entries
+
+    def _save(self):
+        try:
+            cachedir = os.path.dirname(self.path)
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+            with open(self.path + ".tmp", "w") as cachefile:
+                json.dump(self._entries, cachefile, indent=1, sort_keys=True)
+            os.replace(self.path + ".tmp", self.path)
+        except EnvironmentError as exception:
+            # The cache is optional
+            safe_print("Warning - could not write %s:" % self.path, exception)
+
+    def get(self, exe, key, default=None):
+        """Return cached value for executable, or default"""
+        if not exe:
+            return default
+        try:
+            stamp = self._get_stamp(exe)
+        except EnvironmentError:
+            return default
+        with self._lock:
+            entry = self._load().get(exe)
+            if entry and entry["stamp"] == stamp:
+                return entry["values"].get(key, default)
+        return default
+
+    def set(self, exe, key, value):
+        if not exe:
+            return
+        try:
+            stamp = self._get_stamp(exe)
+        except EnvironmentError:
+            return
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(exe)
+            if not entry or entry["stamp"] != stamp:
+                entry = entries[exe] = {"stamp": stamp, "values": {}}
+            if entry["values"].get(key) != value:
+                entry["values"][key] = value
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+
+argyll_capabilities = ArgyllCapabilityCache(
+    os.path.join(cache, appname, "argyll_capabilities.json")
+)
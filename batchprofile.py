@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+"""
+Headless batch generation of profiles and 3D LUTs from existing measurements
+
+Jobs are read from a JSON manifest:
+
+    {
+        "outdir": "profiles",
+        "max_jobs": 4,
+        "defaults": {"config": {"profile.type": "X", "profile.quality": "h"}},
+        "jobs": [
+            {"ti3": "Display 1.ti3"},
+            {
+                "ti3": "Display 2.ti3",
+                "name": "Display 2 XYZLUT",
+                "config": {"profile.type": "x", "3dlut.format": "cube"},
+                "lut3d": {"source": "Rec709.icm"}
+            }
+        ]
+    }
+
+Each job's settings are the defaults updated with the job's own keys, 'config'
+being merged option by option. 'config' holds configuration options which are
+set while the job runs, everything else uses the current configuration.
+
+Profiles are created by the worker the same way as interactively created ones
+(including B2A tables, calibration, metadata, description and profile ID), and
+a 3D LUT (optional) from the source profile to the new profile using the
+3dlut.* options. Each job's files are saved to a directory of the job's name
+in the output directory. Relative paths are relative to the manifest.
+
+A job is skipped if its outputs exist and were created from the same
+measurements and settings. Up to 'max_jobs' (default: number of CPUs) jobs
+run in parallel worker processes. A JSON report with status and timings of
+all jobs is written to the output directory.
+
+"""
+
+import json
+import os
+import sys
+from hashlib import md5
+from time import strftime, time
+
+from utils.util_str import make_filename_safe, safe_unicode
+
+from . import ICCProfile as ICCP
+from . import localization as lang
+from .config import getcfg, initcfg, profile_ext, setcfg
+from .log import safe_print
+from .multiprocess import pool_slice
+
+STAMP_EXT = ".batch.json"
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return md5(f.read()).hexdigest()
+
+
+def get_lut3d_ext(format):
+    """Return the file extension of a 3D LUT format"""
+    if format == "eeColor":
+        return "txt"
+    elif format == "madVR":
+        return "3dlut"
+    elif format == "ReShade":
+        return "png"
+    elif format == "icc":
+        return profile_ext[1:]
+    return format
+
+
+class BatchJob(object):
+
+    """A single profile (and optional 3D LUT) generation job"""
+
+    def __init__(self, settings, basedir, outdir):
+        self.settings = settings
+        self.config = settings.get("config", {})
+        self.ti3 = os.path.join(basedir, settings["ti3"])
+        self.name = settings.get(
+            "name", os.path.splitext(os.path.basename(self.ti3))[0]
+        )
+        self.basename = make_filename_safe(self.name)
+        self.outdir = os.path.join(outdir, self.basename)
+        self.lut3d = settings.get("lut3d")
+        if self.lut3d:
+            self.source = os.path.join(basedir, self.lut3d["source"])
+        self.status = "pending"
+        self.error = None
+        self.seconds = 0
+        self.timings = []
+
+    @property
+    def profile_path(self):
+        return os.path.join(self.outdir, self.basename + profile_ext)
+
+    @property
+    def lut3d_path(self):
+        format = self.config.get("3dlut.format", getcfg("3dlut.format"))
+        return os.path.join(
+            self.outdir, self.basename + ".lut3d." + get_lut3d_ext(format)
+        )
+
+    @property
+    def outputs(self):
+        outputs = [self.profile_path]
+        if self.lut3d:
+            lut3d_path = self.lut3d_path
+            outputs.append(lut3d_path)
+            # Device link saved alongside the 3D LUT
+            link_path = os.path.splitext(lut3d_path)[0] + profile_ext
+            if link_path != lut3d_path:
+                outputs.append(link_path)
+        return outputs
+
+    @property
+    def stamp_path(self):
+        return os.path.join(self.outdir, self.basename + STAMP_EXT)
+
+    def get_digest(self):
+        """Digest of measurements, source profile and settings"""
+        digest = md5(json.dumps(self.settings, sort_keys=True).encode("UTF-8"))
+        digest.update(_file_digest(self.ti3).encode("ASCII"))
+        if self.lut3d:
+            digest.update(_file_digest(self.source).encode("ASCII"))
+        return digest.hexdigest()
+
+    def is_up_to_date(self):
+        if not os.path.isfile(self.stamp_path):
+            return False
+        for path in self.outputs:
+            if not os.path.isfile(path):
+                return False
+        try:
+            with open(self.stamp_path, "r") as stamp:
+                return json.load(stamp).get("digest") == self.get_digest()
+        except (EnvironmentError, ValueError):
+            return False
+
+    def write_stamp(self):
+        with open(self.stamp_path, "w") as stamp:
+            json.dump({"digest": self.get_digest(), "created": strftime("%c")}, stamp)
+
+    def run(self, worker):
+        """
+        Create the profile (and 3D LUT) using worker
+
+        The job's configuration options are set for the duration of the run.
+
+        """
+        previous = [(name, getcfg(name, False, True)) for name in self.config]
+        for name, value in self.config.items():
+            setcfg(name, value)
+        try:
+            self._run(worker)
+        except Exception as exception:
+            self.status = "failed"
+            self.error = safe_unicode(exception)
+        finally:
+            worker.wrapup(False)
+            for name, value in previous:
+                setcfg(name, value)
+        self.seconds = sum(seconds for step, seconds in self.timings)
+
+    def _run(self, worker):
+        ts = time()
+        inoutfile = worker.setup_inout(self.basename)
+        if isinstance(inoutfile, Exception):
+            raise inoutfile
+        with open(self.ti3, "rb") as ti3:
+            data = ti3.read()
+        with open(inoutfile + ".ti3", "wb") as ti3:
+            ti3.write(data)
+        result = worker.create_profile(self.profile_path, True)
+        self.timings.append(["create_profile", time() - ts])
+        if isinstance(result, Exception):
+            raise result
+        elif not result:
+            self.status = "aborted"
+            return
+        if self.lut3d:
+            ts = time()
+            create_3dlut(
+                worker,
+                ICCP.ICCProfile(self.source),
+                ICCP.ICCProfile(self.profile_path),
+                self.lut3d_path,
+            )
+            self.timings.append(["create_3dlut", time() - ts])
+        self.status = "done"
+
+    def todict(self):
+        return {
+            "name": self.name,
+            "ti3": self.ti3,
+            "status": self.status,
+            "error": self.error,
+            "seconds": round(self.seconds, 3),
+            "timings": [[step, round(seconds, 3)] for step, seconds in self.timings],
+            "outputs": self.outputs,
+        }
+
+
+def create_3dlut(worker, profile_in, profile_out, path):
+    """Create a 3D LUT using the 3dlut.* configuration options"""
+    apply_cal = isinstance(
+        profile_out.tags.get("vcgt"), ICCP.VideoCardGammaType
+    ) and getcfg("3dlut.output.profile.apply_cal")
+    if getcfg("3dlut.apply_trc"):
+        trc = getcfg("3dlut.trc")
+        if trc.startswith("smpte2084") or trc == "hlg":
+            # SMPTE ST.2084 (PQ) or Hybrid Log-Gamma (HLG)
+            trc_gamma = trc
+        else:
+            trc_gamma = getcfg("3dlut.trc_gamma")
+    else:
+        trc_gamma = None
+    worker.create_3dlut(
+        profile_in,
+        path,
+        profile_out=profile_out,
+        apply_cal=apply_cal,
+        intent=getcfg("3dlut.rendering_intent"),
+        format=getcfg("3dlut.format"),
+        size=getcfg("3dlut.size"),
+        input_bits=getcfg("3dlut.bitdepth.input"),
+        output_bits=getcfg("3dlut.bitdepth.output"),
+        input_encoding=getcfg("3dlut.encoding.input"),
+        output_encoding=getcfg("3dlut.encoding.output"),
+        trc_gamma=trc_gamma,
+        trc_gamma_type=getcfg("3dlut.trc_gamma_type"),
+        trc_output_offset=getcfg("3dlut.trc_output_offset"),
+        apply_black_offset=getcfg("3dlut.apply_black_offset"),
+        use_b2a=getcfg("3dlut.gamap.use_b2a"),
+        white_cdm2=getcfg("3dlut.hdr_peak_luminance"),
+        minmll=getcfg("3dlut.hdr_minmll"),
+        maxmll=getcfg("3dlut.hdr_maxmll"),
+        use_alternate_master_white_clip=getcfg("3dlut.hdr_maxmll_alt_clip"),
+        hdr_sat=getcfg("3dlut.hdr_sat"),
+        hdr_hue=getcfg("3dlut.hdr_hue"),
+        ambient_cdm2=getcfg("3dlut.hdr_ambient_luminance"),
+        hdr_display=getcfg("3dlut.hdr_display"),
+    )
+
+
+def _mp_run_jobs(jobs, thread_abort_event, progress_queue):
+    """Run a slice of jobs sequentially in one worker process"""
+    # Configuration and worker state are per process
+    initcfg()
+    lang.init()
+    from .worker import Worker
+
+    worker = Worker()
+    results = []
+    for job in jobs:
+        if thread_abort_event is not None and thread_abort_event.is_set():
+            job.status = "aborted"
+        else:
+            job.run(worker)
+            safe_print("%s: %s (%.1f s)" % (job.name, job.status, job.seconds))
+        results.append((job.status, job.error, job.timings))
+        progress_queue.put(100.0 / len(jobs))
+    return results
+
+
+def load_manifest(manifest_path):
+    """Return (jobs, outdir, max_jobs) from a JSON manifest"""
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    basedir = os.path.dirname(os.path.abspath(manifest_path))
+    outdir = os.path.join(basedir, manifest.get("outdir", ""))
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for entry in manifest["jobs"]:
+        settings = dict(defaults)
+        settings.update(entry)
+        settings["config"] = dict(defaults.get("config", {}))
+        settings["config"].update(entry.get("config", {}))
+        jobs.append(BatchJob(settings, basedir, outdir))
+    return jobs, outdir, manifest.get("max_jobs")
+
+
+def run_batch(manifest_path, report_path=None, force=False):
+    """
+    Run all jobs of a manifest which are not up to date
+
+    Return the report (which is also written to report_path, default
+    batch_report.json in the output directory).
+
+    """
+    ts = time()
+    jobs, outdir, max_jobs = load_manifest(manifest_path)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    pending = []
+    for job in jobs:
+        try:
+            if not force and job.is_up_to_date():
+                job.status = "skipped"
+                continue
+        except EnvironmentError as exception:
+            job.status = "failed"
+            job.error = safe_unicode(exception)
+            continue
+        pending.append(job)
+    safe_print("Running %i of %i jobs" % (len(pending), len(jobs)))
+    if pending:
+        results = sum(pool_slice(_mp_run_jobs, pending, num_workers=max_jobs), [])
+        for job, (status, error, timings) in zip(pending, results):
+            job.status = status
+            job.error = error
+            job.timings = timings
+            job.seconds = sum(seconds for step, seconds in timings)
+            if job.status == "done":
+                job.write_stamp()
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    report = {
+        "manifest": os.path.abspath(manifest_path),
+        "finished": strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time() - ts, 3),
+        "counts": counts,
+        "jobs": [job.todict() for job in jobs],
+    }
+    if not report_path:
+        report_path = os.path.join(outdir, "batch_report.json")
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    initcfg()
+    lang.init()
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    if not 0 < len(args) < 3:
+        safe_print("Create profiles and 3D LUTs from existing measurements.")
+        safe_print(
+            "Usage: %s [--force] manifest.json [report.json]"
+            % os.path.basename(sys.argv[0])
+        )
+    else:
+        report = run_batch(args[0], (args[1:] or [None])[0], "--force" in sys.argv)
+        safe_print(json.dumps(report["counts"]))
+        sys.exit(int("failed" in report["counts"] or "aborted" in report["counts"]))
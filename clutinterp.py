@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Array based interpolation of three-dimensional color lookup tables
+
+The cLUT is expected as numpy array of shape (g, g, g, o) where g is the
+number of grid points per dimension and o the number of output channels,
+indexed [first input channel][second input channel][third input channel]
+(i.e. the first input channel changes slowest, as in ICC profile cLUTs).
+Input coordinates are in the range 0..1.
+
+"""
+
+import numpy
+
+
+def _prepare(clut, coords):
+    clut = numpy.asarray(clut, dtype=numpy.float64)
+    if clut.ndim != 4 or not clut.shape[0] == clut.shape[1] == clut.shape[2]:
+        raise ValueError("cLUT must have shape (g, g, g, o), got %r" % (clut.shape,))
+    coords = numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3)
+    g = clut.shape[0]
+    if g < 2:
+        raise ValueError("cLUT must have at least 2 grid points per dimension")
+    pos = numpy.clip(coords, 0.0, 1.0) * (g - 1)
+    base = numpy.minimum(numpy.floor(pos).astype(numpy.intp), g - 2)
+    frac = pos - base
+    strides = numpy.array([g * g, g, 1], dtype=numpy.intp)
+    flat = clut.reshape(-1, clut.shape[3])
+    return flat, base.dot(strides), frac, strides
+
+
+def trilinear(clut, coords):
+    """Trilinear interpolation of cLUT at coords (N x 3), return N x o"""
+    flat, i0, frac, strides = _prepare(clut, coords)
+    result = numpy.zeros((len(i0), flat.shape[1]))
+    for corner in range(8):
+        offset = 0
+        weight = numpy.ones(len(i0))
+        for dim in range(3):
+            if corner >> (2 - dim) & 1:
+                offset += strides[dim]
+                weight *= frac[:, dim]
+            else:
+                weight *= 1 - frac[:, dim]
+        result += flat[i0 + offset] * weight[:, None]
+    return result
+
+
+def tetrahedral(clut, coords):
+    """
+    Tetrahedral interpolation of cLUT at coords (N x 3), return N x o
+
+    The grid cube containing each point is split into six tetrahedra along
+    its neutral (0, 0, 0) - (1, 1, 1) diagonal. The point is interpolated
+    from the four vertices of the tetrahedron it falls into, which are
+    reached by stepping along the dimensions in order of descending
+    fractional part.
+
+    """
+    flat, i0, frac, strides = _prepare(clut, coords)
+    order = numpy.argsort(-frac, axis=1, kind="stable")
+    f = numpy.take_along_axis(frac, order, axis=1)
+    i1 = i0 + strides[order[:, 0]]
+    i2 = i1 + strides[order[:, 1]]
+    i3 = i0 + strides.sum()
+    return (
+        flat[i0] * (1 - f[:, 0])[:, None]
+        + flat[i1] * (f[:, 0] - f[:, 1])[:, None]
+        + flat[i2] * (f[:, 1] - f[:, 2])[:, None]
+        + flat[i3] * f[:, 2][:, None]
+    )
+
+
+methods = {"trilinear": trilinear, "tetrahedral": tetrahedral}
+
+
+def interp(clut, coords, method="tetrahedral"):
+    """Interpolate cLUT at coords using method 'trilinear' or 'tetrahedral'"""
+    try:
+        fn = methods[method]
+    except KeyError:
+        raise ValueError("Unknown cLUT interpolation method: %r" % method)
+    return fn(clut, coords)
+
+
+def grid_coords(clutres):
+    """Return coordinates (clutres ** 3 x 3) of all grid points in cLUT order"""
+    steps = numpy.linspace(0.0, 1.0, clutres)
+    return numpy.stack(
+        numpy.meshgrid(steps, steps, steps, indexing="ij"), axis=-1
+    ).reshape(-1, 3)
+
+
+def resize(clut, clutres, method="tetrahedral"):
+    """Resample cLUT to clutres grid points per dimension"""
+    clut = numpy.asarray(clut, dtype=numpy.float64)
+    values = interp(clut, grid_coords(clutres), method)
+    return values.reshape((clutres,) * 3 + (clut.shape[3],))
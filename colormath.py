@@ -712,6 +712,60 @@ def blend_blackpoint(
     return X, Y, Z
 
 
+def blend_blackpoint_array(XYZ, bp_in=None, bp_out=None, wp=None, power=40.0):
+    """
+    Blend to destination black as L approaches black, optionally compensating
+    for input black first
+
+    Vectorized equivalent of blend_blackpoint (without pinning chromaticity)
+    for an array of XYZ values (N x 3). Return numpy array.
+
+    """
+    import numpy
+
+    wp = get_whitepoint(wp)
+    XYZ = numpy.array(XYZ, dtype=numpy.float64)
+
+    for i, bp in enumerate((bp_in, bp_out)):
+        if not bp or tuple(bp) == (0, 0, 0):
+            continue
+        bp_wp = tuple(v / wp[1] * bp[1] for v in wp)
+        if i == 0:
+            XYZ = _blend_ab_array(XYZ, bp, wp, power, -1)
+            XYZ = _apply_bpc_array(XYZ, bp_wp, (0, 0, 0), wp)
+        else:
+            XYZ = _apply_bpc_array(XYZ, (0, 0, 0), bp_wp, wp)
+            XYZ = _blend_ab_array(XYZ, bp, wp, power, 1)
+
+    return XYZ
+
+
+def _apply_bpc_array(XYZ, bp_in, bp_out, wp_out):
+    for i in range(3):
+        XYZ[:, i] = (
+            (wp_out[i] - bp_out[i]) * XYZ[:, i] - wp_out[i] * (bp_in[i] - bp_out[i])
+        ) / (wp_out[i] - bp_in[i])
+    return XYZ
+
+
+def _blend_ab_array(XYZ, bp, wp, power=40.0, signscale=1):
+    import numpy
+
+    bpL, bpa, bpb = XYZ2Lab(*bp, whitepoint=wp)
+    if bpL == 100:
+        raise ValueError("Black L* is 100!")
+    negative = XYZ[:, 1] < 0
+    Lab = XYZ2Lab_array(XYZ, whitepoint=wp)
+    vv = (Lab[:, 0] - bpL) / (100.0 - bpL)  # 0 at bp, 1 at wp
+    vv = numpy.clip(1.0 - vv, 0.0, 1.0)  # 1 at bp, 0 at wp
+    vv = numpy.power(vv, power) * signscale
+    Lab[:, 1] += vv * bpa
+    Lab[:, 2] += vv * bpb
+    XYZ = Lab2XYZ_array(Lab, whitepoint=wp)
+    XYZ[negative] = 0
+    return XYZ
+
+
 def interp(x, xp, fp, left=None, right=None):
     """
     One-dimensional linear interpolation similar to numpy.interp
@@ -774,7 +828,13 @@ def smooth_avg(values, passes=1, window=None, protect=None):
                       determines the size of the window to use.
                       Defaults to (1.0, 1.0, 1.0)
 
+    The first and last value are not changed, the window is shrunk
+    symmetrically towards the ends. Values with an index in 'protect'
+    are not changed either.
+
     """
+    import numpy
+
     if not window or len(window) < 3 or len(window) % 2 != 1:
         if window:
             warnings.warn(
@@ -783,26 +843,26 @@ def smooth_avg(values, passes=1, window=None, protect=None):
                 Warning,
             )
         window = (1.0, 1.0, 1.0)
+    window = [float(weight) for weight in window]
+    center = len(window) // 2
+    values = numpy.array(values, dtype=numpy.float64)
+    count = len(values)
+    if protect:
+        protect = [j for j in protect if 0 <= j < count]
     for x in range(0, passes):
-        data = []
-        for j, v in enumerate(values):
-            tmpwindow = window
-            if not protect or j not in protect:
-                while j > 0 and j < len(values) - 1 and len(tmpwindow) >= 3:
-                    tl = (len(tmpwindow) - 1) / 2
-                    # print j, tl, tmpwindow
-                    if tl > 0 and j - tl >= 0 and j + tl <= len(values) - 1:
-                        windowslice = values[j - tl : j + tl + 1]
-                        windowsize = 0
-                        for k, weight in enumerate(tmpwindow):
-                            windowsize += float(weight) * windowslice[k]
-                        v = windowsize / sum(tmpwindow)
-                        break
-                    else:
-                        tmpwindow = tmpwindow[1:-1]
-            data.append(v)
+        data = values.copy()
+        # Larger windows overwrite the results of smaller ones where they fit
+        for tl in range(1, center + 1):
+            if count <= 2 * tl:
+                break
+            weights = window[center - tl : center + tl + 1]
+            data[tl : count - tl] = numpy.correlate(values, weights, "valid") / sum(
+                weights
+            )
+        if protect:
+            data[protect] = values[protect]
         values = data
-    return data
+    return values.tolist()
 
 
 def compute_bpc(bp_in, bp_out):
@@ -1032,6 +1092,198 @@ def delta(
     }
 
 
+def _delta_method_key(method):
+    if isinstance(method, str):
+        method = method.lower()
+    else:
+        method = str(int(method))
+    if method in ("94", "1994", "cie94", "cie1994"):
+        return "94"
+    elif method in ("cmc(2:1)", "cmc21"):
+        return "cmc21"
+    elif method in ("cmc(1:1)", "cmc11", "cmc"):
+        return "cmc"
+    elif method in ("00", "2k", "2000", "cie00", "cie2k", "cie2000"):
+        return "00"
+    return "76"
+
+
+def delta_batch(
+    Lab1,
+    Lab2,
+    methods=("76", "94", "00"),
+    p1=None,
+    p2=None,
+    p3=None,
+    cie94_use_symmetric_chrominance=True,
+):
+    """
+    Compute the delta of two sets of samples (N x 3 L*a*b*) at once
+
+    Same formulas and arguments as delta(), evaluated on numpy arrays for
+    several methods in one call. Return a dictionary mapping each method
+    (as given) to a dictionary of numpy arrays with the same keys as
+    returned by delta() ("E", "L", "C", "H", "a", "b", "Lw", "Cw", "Hw").
+
+    Transcendental functions and powers are evaluated element-wise with the
+    math module functions used by delta() (numpy's own implementations may
+    differ in the last bit), so results are identical to delta().
+
+    """
+    import numpy
+
+    def mathfunc(fn, nin=1):
+        ufunc = numpy.frompyfunc(fn, nin, 1)
+        return lambda *args: ufunc(*args).astype(numpy.float64)
+
+    pow_ = mathfunc(math.pow, 2)
+    sin = mathfunc(math.sin)
+    cos = mathfunc(math.cos)
+    exp = mathfunc(math.exp)
+    atan2 = mathfunc(math.atan2, 2)
+    degrees = mathfunc(math.degrees)
+    radians = mathfunc(math.radians)
+
+    Lab1 = numpy.asarray(Lab1, dtype=numpy.float64).reshape(-1, 3)
+    Lab2 = numpy.asarray(Lab2, dtype=numpy.float64).reshape(-1, 3)
+    L1, a1, b1 = Lab1.T
+    L2, a2, b2 = Lab2.T
+    sqrt = numpy.sqrt
+    # Shared terms
+    dL = L2 - L1
+    da = a1 - a2
+    db = b1 - b2
+    C1 = sqrt(pow_(a1, 2) + pow_(b1, 2))
+    C2 = sqrt(pow_(a2, 2) + pow_(b2, 2))
+    dC = C2 - C1
+    dH2 = pow_(da, 2) + pow_(db, 2) - pow_(dC, 2)
+    dH = numpy.where(dH2 > 0, sqrt(numpy.maximum(dH2, 0)), 0.0)
+    results = {}
+    for method in methods:
+        key = _delta_method_key(method)
+        if key == "94":
+            textiles = p1
+            SL = 1.0
+            K1 = 0.048 if textiles else 0.045
+            K2 = 0.014 if textiles else 0.015
+            if cie94_use_symmetric_chrominance:
+                C_ = sqrt(C1 * C2)
+            else:
+                C_ = C1
+            SC = 1.0 + K1 * C_
+            SH = 1.0 + K2 * C_
+            KL = 2.0 if textiles else 1.0
+            dLw, dCw, dHw = dL / (KL * SL), dC / (1.0 * SC), dH / (1.0 * SH)
+            dE = sqrt(pow_(dLw, 2) + pow_(dCw, 2) + pow_(dHw, 2))
+            result = {"L": dL, "C": dC, "H": dH}
+        elif key in ("cmc", "cmc21"):
+            l = 2.0 if key == "cmc21" else (p1 if isinstance(p1, (float, int)) else 1.0)
+            c = p2 if isinstance(p2, (float, int)) else 1.0
+            SL = numpy.where(L1 < 16, 0.511, (0.040975 * L1) / (1 + 0.01765 * L1))
+            SC = (0.0638 * C1) / (1 + 0.0131 * C1) + 0.638
+            F = sqrt(pow_(C1, 4) / (pow_(C1, 4) + 1900.0))
+            H1 = degrees(atan2(b1, a1)) + numpy.where(b1 >= 0, 0, 360.0)
+            T = numpy.where(
+                (164 <= H1) & (H1 <= 345),
+                0.56 + numpy.abs(0.2 * cos(radians(H1 + 168.0))),
+                0.36 + numpy.abs(0.4 * cos(radians(H1 + 35))),
+            )
+            SH = SC * (F * T + 1 - F)
+            dLw, dCw, dHw = dL / (l * SL), dC / (c * SC), dH / SH
+            dE = sqrt(pow_(dLw, 2) + pow_(dCw, 2) + pow_(dHw, 2))
+            result = {"L": dL, "C": dC, "H": dH}
+        elif key == "00":
+            pow25_7 = math.pow(25, 7)
+            k_L = p1 if isinstance(p1, (float, int)) else 1.0
+            k_C = p2 if isinstance(p2, (float, int)) else 1.0
+            k_H = p3 if isinstance(p3, (float, int)) else 1.0
+            C_avg = (C1 + C2) / 2.0
+            G = 0.5 * (1 - sqrt(pow_(C_avg, 7) / (pow_(C_avg, 7) + pow25_7)))
+            a1_ = (1 + G) * a1
+            a2_ = (1 + G) * a2
+            C1_ = sqrt(pow_(a1_, 2) + pow_(b1, 2))
+            C2_ = sqrt(pow_(a2_, 2) + pow_(b2, 2))
+            h1_ = numpy.where(
+                (a1_ == 0) & (b1 == 0),
+                0.0,
+                degrees(atan2(b1, a1_)) + numpy.where(b1 >= 0, 0, 360.0),
+            )
+            h2_ = numpy.where(
+                (a2_ == 0) & (b2 == 0),
+                0.0,
+                degrees(atan2(b2, a2_)) + numpy.where(b2 >= 0, 0, 360.0),
+            )
+            dh = h2_ - h1_
+            dh_ = numpy.where(
+                dh > 180, h2_ - h1_ - 360.0, numpy.where(dh < -180, h2_ + 360.0 - h1_, dh)
+            )
+            dC_ = C2_ - C1_
+            dH_ = 2 * sqrt(C1_ * C2_) * sin(radians(dh_ / 2.0))
+            L__avg = (L1 + L2) / 2.0
+            C__avg = (C1_ + C2_) / 2.0
+            h_avg = (h1_ + h2_) / 2.0
+            h__avg = numpy.where(
+                C1_ * C2_ == 0,
+                h1_ + h2_,
+                numpy.where(
+                    numpy.abs(dh) <= 180,
+                    h_avg,
+                    numpy.where(h2_ + h1_ < 360, h_avg + 180.0, h_avg - 180.0),
+                ),
+            )
+            AB = pow_(L__avg - 50.0, 2)
+            S_L = 1 + 0.015 * AB / sqrt(20.0 + AB)
+            S_C = 1 + 0.045 * C__avg
+            T = (
+                1
+                - 0.17 * cos(radians(h__avg - 30.0))
+                + 0.24 * cos(radians(2.0 * h__avg))
+                + 0.32 * cos(radians(3.0 * h__avg + 6.0))
+                - 0.2 * cos(radians(4 * h__avg - 63.0))
+            )
+            S_H = 1 + 0.015 * C__avg * T
+            dTheta = 30.0 * exp(-1 * pow_((h__avg - 275.0) / 25.0, 2))
+            R_C = 2.0 * sqrt(pow_(C__avg, 7) / (pow_(C__avg, 7) + pow25_7))
+            R_T = -sin(radians(2.0 * dTheta)) * R_C
+            dLw = dL / S_L / k_L
+            dCw = dC_ / S_C / k_C
+            dHw = dH_ / S_H / k_H
+            dE = sqrt(pow_(dLw, 2) + pow_(dCw, 2) + pow_(dHw, 2) + R_T * dCw * dHw)
+            result = {"L": dL, "C": dC_, "H": dH_}
+        else:
+            dLw, dCw, dHw = dL, dC, dH
+            dE = sqrt(pow_(dL, 2) + pow_(da, 2) + pow_(db, 2))
+            result = {"L": dL, "C": dC, "H": dH}
+        result.update({"E": dE, "a": da, "b": db, "Lw": dLw, "Cw": dCw, "Hw": dHw})
+        results[method] = result
+    return results
+
+
+def delta_stats(dE, percentiles=(50, 90, 95, 99)):
+    """
+    Return summary statistics of delta E values
+
+    Keys are "count", "avg", "min", "max", "rms" and "p<percentile>"
+    (linear interpolation between closest ranks).
+
+    """
+    import numpy
+
+    dE = numpy.asarray(dE, dtype=numpy.float64).ravel()
+    if not dE.size:
+        raise ValueError("delta_stats: no values")
+    stats = {
+        "count": int(dE.size),
+        "avg": float(dE.mean()),
+        "min": float(dE.min()),
+        "max": float(dE.max()),
+        "rms": float(numpy.sqrt((dE**2).mean())),
+    }
+    for percentile, value in zip(percentiles, numpy.percentile(dE, percentiles)):
+        stats["p%s" % percentile] = float(value)
+    return stats
+
+
 def XYZ2Lab_delta(
     X1,
     Y1,
@@ -1164,6 +1416,28 @@ def get_gamma(values, scale=1.0, vmin=0.0, vmax=1.0, average=True, least_squares
         return gammas
 
 
+def get_gamma_array(x, y, scale=1.0, vmin=0.0, vmax=1.0):
+    """
+    Return gamma values for arrays of x and y values
+
+    Vectorized equivalent of get_gamma(zip(x, y), scale, vmin, vmax, False),
+    but the returned numpy array has the shape of the (broadcast) inputs and
+    contains NaN where no gamma can be determined.
+
+    """
+    import numpy
+
+    vmin /= scale
+    vmax /= scale
+    x = numpy.asarray(x, dtype=numpy.float64) / scale
+    y = (numpy.asarray(y, dtype=numpy.float64) / scale - vmin) * (vmax + vmin)
+    x, y = numpy.broadcast_arrays(x, y)
+    valid = (x > 0) & (x < 1) & (y > 0)
+    gammas = numpy.full(x.shape, numpy.nan)
+    gammas[valid] = numpy.log(y[valid]) / numpy.log(x[valid])
+    return gammas
+
+
 def guess_cat(chad, whitepoint_source=None, whitepoint_destination=None):
     """Try and guess the chromatic adaption transform used in a chromatic
     adaption matrix as found in an ICC profile's 'chad' tag"""
@@ -1572,6 +1846,32 @@ def Lab2XYZ(L, a, b, whitepoint=None, scale=1.0):
     return X, Y, Z
 
 
+def Lab2XYZ_array(Lab, whitepoint=None, scale=1.0):
+    """
+    Convert an array of Lab values (N x 3) to XYZ
+
+    Vectorized equivalent of Lab2XYZ. Return numpy array.
+
+    """
+    import numpy
+
+    Lab = numpy.asarray(Lab, dtype=numpy.float64)
+    L = Lab[:, 0]
+    fy = (L + 16) / 116.0
+    fx = Lab[:, 1] / 500.0 + fy
+    fz = fy - Lab[:, 2] / 200.0
+
+    fx3 = numpy.power(fx, 3.0)
+    xr = numpy.where(fx3 > LSTAR_E, fx3, (116.0 * fx - 16) / LSTAR_K)
+    yr = numpy.where(L > LSTAR_K * LSTAR_E, numpy.power(fy, 3.0), L / LSTAR_K)
+    fz3 = numpy.power(fz, 3.0)
+    zr = numpy.where(fz3 > LSTAR_E, fz3, (116.0 * fz - 16) / LSTAR_K)
+
+    Xr, Yr, Zr = get_whitepoint(whitepoint, scale)
+
+    return numpy.column_stack((xr * Xr, yr * Yr, zr * Zr))
+
+
 def Lab2xyY(L, a, b, whitepoint=None, scale=1.0):
     X, Y, Z = Lab2XYZ(L, a, b, whitepoint, scale)
     return XYZ2xyY(X, Y, Z, whitepoint)
@@ -2429,6 +2729,27 @@ def XYZ2Lab(X, Y, Z, whitepoint=None, scale=100):
     return L, a, b
 
 
+def XYZ2Lab_array(XYZ, whitepoint=None, scale=100):
+    """
+    Convert an array of XYZ values (N x 3) to Lab
+
+    Vectorized equivalent of XYZ2Lab. Return numpy array.
+
+    """
+    import numpy
+
+    XYZ = numpy.asarray(XYZ, dtype=numpy.float64)
+    xyzr = XYZ / numpy.array(get_whitepoint(whitepoint, scale), dtype=numpy.float64)
+    # Same as cbrt (which differs from numpy.cbrt in the last digit)
+    cbrt_xyzr = numpy.sign(xyzr) * numpy.power(numpy.abs(xyzr), 1.0 / 3.0)
+    f = numpy.where(xyzr > LSTAR_E, cbrt_xyzr, (LSTAR_K * xyzr + 16) / 116.0)
+    L = 116 * f[:, 1] - 16
+    a = 500 * (f[:, 0] - f[:, 1])
+    b = 200 * (f[:, 1] - f[:, 2])
+
+    return numpy.column_stack((L, a, b))
+
+
 def XYZ2Lpt(X, Y, Z, whitepoint=None):
     """
     Convert from XYZ to Lpt
@@ -3022,7 +3343,7 @@ def linmin(cp, xi, di, ftol, func, fdata):
     return xf
 
 
-def powell(di, cp, s, ftol, maxit, func, fdata, prog=None, pdata=None):
+def powell_argyll(di, cp, s, ftol, maxit, func, fdata, prog=None, pdata=None):
     # Adapted from ArgyllCMS powell.c
 
     """
@@ -3158,6 +3479,250 @@ def powell(di, cp, s, ftol, maxit, func, fdata, prog=None, pdata=None):
     return False  # Failed due to execessive iterations
 
 
+# Powell optimizer backend used by powell(): "fast" (tuples, cached
+# function evaluations, no per-step logging) or "argyll" (line-by-line port of ArgyllCMS
+# powell.c, see powell_argyll)
+powell_backend = "fast"
+
+
+def powell(di, cp, s, ftol, maxit, func, fdata, prog=None, pdata=None):
+    """
+    Standard interface for powell function
+    return True on sucess, False on failure due to excessive iterions
+    Result will be in cp
+
+    Dispatches to the backend selected by powell_backend.
+
+    """
+    if powell_backend == "argyll":
+        fn = powell_argyll
+    else:
+        fn = powell_fast
+    return fn(di, cp, s, ftol, maxit, func, fdata, prog, pdata)
+
+
+class CachedObjective(object):
+
+    """
+    Objective function wrapper for the fast Powell optimizer
+
+    Points are tuples. Evaluations are cached by point, so that revisited
+    points (e.g. the start point of each line search) are not evaluated
+    again.
+
+    """
+
+    def __init__(self, func, fdata):
+        self.func = func
+        self.fdata = fdata
+        self.cache = {}
+        self.evaluations = 0
+
+    def __call__(self, p):
+        value = self.cache.get(p)
+        if value is None:
+            value = self.func(self.fdata, p)
+            self.cache[p] = value
+            self.evaluations += 1
+        return value
+
+
+def _point_along(cp, t, xi):
+    return tuple([c + t * x for c, x in zip(cp, xi)])
+
+
+def _linmin_fast(cp, xi, ftol, func):
+    """
+    Line bracketing and (Brent) minimisation along xi starting at cp
+
+    Same algorithm as linmin, operating on tuples.
+    Return (value at minimum, point at minimum).
+
+    """
+    POWELL_GOLD = 1.618034
+    POWELL_CGOLD = 0.3819660
+    POWELL_MAXIT = 100
+
+    # Bracket the solution
+    ax = 0.0
+    af = func(cp)
+    xx = 1.0 / POWELL_GOLD
+    xf = func(_point_along(cp, xx, xi))
+    if xf > af:
+        ax, xx = xx, ax
+        af, xf = xf, af
+    bx = xx + POWELL_GOLD * (xx - ax)
+    bf = func(_point_along(cp, bx, xi))
+    while xf > bf:
+        q = (xx - bx) * (xf - af)
+        r = (xx - ax) * (xf - bf)
+        tt = q - r
+        if 0.0 <= tt < 1e-20:
+            tt = 1e-20
+        elif -1e-20 < tt <= 0.0:
+            tt = -1e-20
+        ux = xx - ((xx - bx) * q - (xx - ax) * r) / (2.0 * tt)
+        ulim = xx + 100.0 * (bx - xx)
+        if (xx - ux) * (ux - bx) > 0.0:
+            uf = func(_point_along(cp, ux, xi))
+            if uf < bf:
+                ax, af, xx, xf = xx, xf, ux, uf
+                break
+            elif uf > xf:
+                bx, bf = ux, uf
+                break
+            ux = bx + POWELL_GOLD * (bx - xx)
+        elif (bx - ux) * (ux - ulim) > 0.0:
+            uf = func(_point_along(cp, ux, xi))
+            if uf > bf:
+                ax, af, xx, xf, bx, bf = xx, xf, bx, bf, ux, uf
+                break
+            xx, xf, bx, bf = bx, bf, ux, uf
+            ux = bx + POWELL_GOLD * (bx - xx)
+        elif (ux - ulim) * (ulim - bx) >= 0.0:
+            ux = ulim
+        else:
+            ux = bx + POWELL_GOLD * (bx - xx)
+        uf = func(_point_along(cp, ux, xi))
+        ax, af, xx, xf, bx, bf = xx, xf, bx, bf, ux, uf
+
+    # Brent minimiser between a and b
+    vf = 0.0
+    de = 0.0
+    e = 0.0
+    if ax > bx:
+        ax, bx = bx, ax
+        af, bf = bf, af
+    wx = vx = xx
+    wf = xf
+    for iter in range(1, POWELL_MAXIT + 1):
+        mx = 0.5 * (ax + bx)
+        tol1 = ftol * abs(xx) + 1e-10
+        tol2 = 2.0 * tol1
+        if abs(xx - mx) <= (tol2 - 0.5 * (bx - ax)):
+            break
+        if abs(e) > tol1:
+            r = (xx - wx) * (xf - vf)
+            q = (xx - vx) * (xf - wf)
+            p = (xx - vx) * q - (xx - wx) * r
+            q = 2.0 * (q - r)
+            if q > 0.0:
+                p = -p
+            else:
+                q = -q
+            te = e
+            e = de
+            if abs(p) >= abs(0.5 * q * te) or p <= q * (ax - xx) or p >= q * (bx - xx):
+                e = ax - xx if xx >= mx else bx - xx
+                de = POWELL_CGOLD * e
+            else:
+                de = p / q
+                ux = xx + de
+                if (ux - ax) < tol2 or (bx - ux) < tol2:
+                    if (mx - xx) > 0.0:
+                        de = tol1
+                    else:
+                        de = -tol1
+        else:
+            e = ax - xx if xx >= mx else bx - xx
+            de = POWELL_CGOLD * e
+        if abs(de) >= tol1:
+            ux = xx + de
+        elif de > 0.0:
+            ux = xx + tol1
+        else:
+            ux = xx - tol1
+        uf = func(_point_along(cp, ux, xi))
+        if uf <= xf:
+            if ux >= xx:
+                ax, af = xx, xf
+            else:
+                bx, bf = xx, xf
+            vx, vf = wx, wf
+            wx, wf = xx, xf
+            xx, xf = ux, uf
+        else:
+            if ux < xx:
+                ax, af = ux, uf
+            else:
+                bx, bf = ux, uf
+            if uf <= wf or wx == xx:
+                vx, vf = wx, wf
+                wx, wf = ux, uf
+            elif uf <= vf or vx == xx or vx == wx:
+                vx, vf = ux, uf
+
+    return xf, _point_along(cp, xx, xi)
+
+
+def powell_fast(di, cp, s, ftol, maxit, func, fdata, prog=None, pdata=None):
+    """
+    Powell optimizer operating on tuples with cached evaluations
+
+    Same interface and algorithm as powell_argyll, without per-step
+    (debug) logging. 'func' is called with fdata and a tuple (which
+    supports indexing like the dict/list used by powell_argyll).
+
+    """
+    DBL_EPSILON = 2.2204460492503131e-016
+    objective = CachedObjective(func, fdata)
+    p = tuple([float(cp[i]) for i in range(di)])
+    # Direction vectors (columns of the direction matrix)
+    dirs = [tuple([float(s[i]) if j == i else 0.0 for j in range(di)]) for i in range(di)]
+    startdel = -1.0
+    pc = 0
+    if prog:
+        prog(pdata, pc)
+    retv = objective(p)
+    for iter in range(1, maxit):
+        ibig = 0
+        del_ = 0.0
+        pretv = retv
+        spt = p
+        for i in range(di):
+            lretv = retv
+            retv, p = _linmin_fast(p, dirs[i], ftol, objective)
+            if abs(lretv - retv) > del_:
+                del_ = abs(lretv - retv)
+                ibig = i
+        stopth = ftol * 0.5 * (abs(pretv) + abs(retv) + DBL_EPSILON)
+        curdel = abs(pretv - retv)
+        if startdel < 0.0:
+            startdel = curdel
+        elif prog and curdel > 0 and startdel > 0:
+            tt = (
+                100.0
+                * math.pow(
+                    (math.log(curdel) - math.log(startdel))
+                    / (math.log(stopth) - math.log(startdel)),
+                    4.0,
+                )
+                + 0.5
+            )
+            if tt > pc and tt < 100:
+                pc = tt
+                prog(pdata, pc)
+        if iter > 1 and curdel <= stopth:
+            break
+        svec = tuple([v - v0 for v, v0 in zip(p, spt)])
+        lretv = objective(_point_along(p, 1.0, svec))
+        if lretv < pretv:
+            t1 = pretv - retv - del_
+            t2 = pretv - lretv
+            t = 2.0 * (pretv - 2.0 * retv + lretv) * t1 * t1 - del_ * t2 * t2
+            if t < 0.0:
+                retv, p = _linmin_fast(p, svec, ftol, objective)
+                dirs[ibig] = svec
+    if prog:
+        prog(pdata, 100)
+    for i in range(di):
+        cp[i] = p[i]
+    if iter < maxit:
+        return True
+    logging.debug("powell: returning False due to excessive iterations")
+    return False
+
+
 def xicc_tech_gamma(egamma, off, outoffset=0.0):
     # Adapted from ArgyllCMS xicc.c
 
@@ -3343,6 +3908,61 @@ class BT1886(object):
 
         return out
 
+    def apply_array(self, XYZ):
+        """
+        Apply BT.1886 to an array of XYZ values (N x 3)
+
+        Vectorized equivalent of apply. Return numpy array.
+
+        """
+        import numpy
+
+        out = numpy.asarray(XYZ, dtype=numpy.float64).dot(
+            numpy.array(self.bwd_matrix, dtype=numpy.float64).T
+        )
+        vv = out
+        if self.apply_trc:
+            # Convert linear light to Rec709 transfer curve
+            with numpy.errstate(invalid="ignore"):
+                vv = numpy.where(
+                    vv < 0.018, 4.5 * vv, 1.099 * numpy.power(vv, 0.45) - 0.099
+                )
+        # Apply input offset
+        vv = vv + self.ingo
+        # Apply power and scale
+        if self.apply_trc:
+            with numpy.errstate(invalid="ignore"):
+                vv = numpy.where(vv > 0.0, self.outsc * numpy.power(vv, self.gamma), vv)
+        else:
+            vv = numpy.where(vv > 0.0, vv * self.outsc, vv)
+        # Apply output portion of offset
+        vv = vv + self.outo
+        out = vv.dot(numpy.array(self.fwd_matrix, dtype=numpy.float64).T)
+        # XYZ to Lab (D50)
+        wp = numpy.array(get_whitepoint(None, 100), dtype=numpy.float64)
+        xyzr = out * 100 / wp
+        f = numpy.where(
+            xyzr > LSTAR_E, numpy.cbrt(xyzr), (LSTAR_K * xyzr + 16) / 116.0
+        )
+        Lab = numpy.column_stack(
+            (116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2]))
+        )
+        # Blend ab to required black point offset self.tab[] as L approaches black.
+        vv = 1.0 - (Lab[:, 0] - self.outL) / (100.0 - self.outL)
+        vv = numpy.clip(vv, 0.0, 1.0) ** 40.0
+        Lab += vv[:, numpy.newaxis] * numpy.array(self.tab, dtype=numpy.float64)
+        # Lab to XYZ (D50)
+        L = Lab[:, 0]
+        fy = (L + 16) / 116.0
+        fx = Lab[:, 1] / 500.0 + fy
+        fz = fy - Lab[:, 2] / 200.0
+        xr = numpy.where(fx**3.0 > LSTAR_E, fx**3.0, (116.0 * fx - 16) / LSTAR_K)
+        yr = numpy.where(L > LSTAR_K * LSTAR_E, fy**3.0, L / LSTAR_K)
+        zr = numpy.where(fz**3.0 > LSTAR_E, fz**3.0, (116.0 * fz - 16) / LSTAR_K)
+        return numpy.column_stack((xr, yr, zr)) * numpy.array(
+            get_whitepoint(None, 1.0), dtype=numpy.float64
+        )
+
 
 class BT2390(object):
 
@@ -3735,6 +4355,9 @@ class Matrix3x3(list):
 
 
 class NumberTuple(tuple):
+
+    __slots__ = ()
+
     def __repr__(self):
         return "(%s)" % ", ".join(str(value) for value in self)
 
@@ -741,6 +741,8 @@ valid_ranges = {
     "patterngenerator.ffp_insertion.interval": [0.0, 3600.0],
     "patterngenerator.ffp_insertion.level": [0.0, 1.0],
     "patterngenerator.quantize_bits": [0, 32],
+    "patterngenerator.resolve.clients": [1, 64],
+    "patterngenerator.resolve.clients.timeout": [0.1, 600.0],
     "patterngenerator.resolve.port": [1, 65535],
     "profile_loader.quantize_bits": [8, 16],
     "synthprofile.trc_gamma": [0.01, 10],
@@ -854,6 +856,7 @@ valid_values = {
         "maximize_rec709_luma_difference",
         "maximize_RGB_difference",
         "vary_RGB_difference",
+        "minimize_settle_time",
     ],
     "trc": ["240", "709", "l", "s", ""],
     "trc.type": ["g", "G"],
@@ -1040,6 +1043,9 @@ defaults = {
     "measurement.name.expanded": "",
     "measurement.play_sound": 1,
     "measurement.save_path": expanduseru("~"),
+    "measure.adaptive_settle_time": 0,
+    "measure.checkpoint": 1,
+    "measure.checkpoint.max_age_hours": 24,
     "measure.darken_background": 0,
     "measure.darken_background.show_warning": 1,
     "measure.display_settle_time_mult": 1.0,
@@ -1065,6 +1071,8 @@ defaults = {
     "patterngenerator.prisma.port": 80,
     "patterngenerator.quantize_bits": 0,
     "patterngenerator.resolve": "CM",
+    "patterngenerator.resolve.clients": 1,
+    "patterngenerator.resolve.clients.timeout": 10.0,
     "patterngenerator.resolve.port": 20002,
     "patterngenerator.use_pattern_window": 0,
     "patterngenerator.use_video_levels": 0,
@@ -1121,6 +1129,7 @@ defaults = {
     "profile.b2a.hires.diagpng": 2,
     "profile.b2a.hires.size": -1,
     "profile.b2a.hires.smooth": 1,
+    "profile.b2a.hires.smooth.use_numpy": 0,
     "profile.save_path": storage,  # directory
     # Force profile type to single shaper + matrix
     # due to OS X bugs with cLUT profiles and
@@ -1508,50 +1517,67 @@ standard_profiles = []
 
 def get_standard_profiles(paths_only=False):
     if not standard_profiles:
+        import sqlite3
+
         from . import ICCProfile as ICCP
+        from .profileindex import profile_index
 
         # Reference profiles (Argyll + DisplayCAL)
         ref_icc = get_data_path("ref", "\.ic[cm]$") or []
         # Other profiles installed on the system
+        try:
+            # Only open profiles which can possibly qualify
+            installed = [
+                (row["basename"], row["path"])
+                for row in profile_index.query(pcs=("Lab", "XYZ"))
+                if row["version"] < "4"
+                and row["profile_class"] != "nmcl"
+                and row["color_space"] != "GRAY"
+            ]
+        except (sqlite3.Error, EnvironmentError) as exception:
+            safe_print("Warning - profile index not available:", exception)
+            installed = []
+            rex = re.compile("\.ic[cm]$", re.IGNORECASE)
+            for icc_dir in set(iccprofiles + iccprofiles_home):
+                for dirpath, dirnames, basenames in os.walk(icc_dir):
+                    for basename in filter(rex.search, basenames):
+                        installed.append((basename, os.path.join(dirpath, basename)))
         other_icc = []
-        rex = re.compile("\.ic[cm]$", re.IGNORECASE)
-        for icc_dir in set(iccprofiles + iccprofiles_home):
-            for dirpath, dirnames, basenames in os.walk(icc_dir):
-                for basename in filter(rex.search, basenames):
-                    filename, ext = os.path.splitext(basename.lower())
-                    if (
-                        filename.endswith("_bas")
-                        or filename.endswith("_eci")
-                        or filename.endswith("adobergb1998")
-                        or filename.startswith("eci-rgb")
-                        or filename.startswith("ecirgb")
-                        or filename.startswith("ekta space")
-                        or filename.startswith("ektaspace")
-                        or filename.startswith("fogra")
-                        or filename.startswith("gracol")
-                        or filename.startswith("iso")
-                        or filename.startswith("lstar-")
-                        or filename.startswith("pso")
-                        or filename.startswith("prophoto")
-                        or filename.startswith("psr_")
-                        or filename.startswith("psrgravure")
-                        or filename.startswith("snap")
-                        or filename.startswith("srgb")
-                        or filename.startswith("swop")
-                        or filename
-                        in (
-                            "applergb",
-                            "bestrgb",
-                            "betargb",
-                            "brucergb",
-                            "ciergb",
-                            "cie-rgb",
-                            "colormatchrgb",
-                            "donrgb",
-                            "widegamutrgb",
-                        )
-                    ):
-                        other_icc.append(os.path.join(dirpath, basename))
+        for basename, path in installed:
+            filename, ext = os.path.splitext(basename.lower())
+            if (
+                filename.endswith("_bas")
+                or filename.endswith("_eci")
+                or filename.endswith("adobergb1998")
+                or filename.startswith("eci-rgb")
+                or filename.startswith("ecirgb")
+                or filename.startswith("ekta space")
+                or filename.startswith("ektaspace")
+                or filename.startswith("fogra")
+                or filename.startswith("gracol")
+                or filename.startswith("iso")
+                or filename.startswith("lstar-")
+                or filename.startswith("pso")
+                or filename.startswith("prophoto")
+                or filename.startswith("psr_")
+                or filename.startswith("psrgravure")
+                or filename.startswith("snap")
+                or filename.startswith("srgb")
+                or filename.startswith("swop")
+                or filename
+                in (
+                    "applergb",
+                    "bestrgb",
+                    "betargb",
+                    "brucergb",
+                    "ciergb",
+                    "cie-rgb",
+                    "colormatchrgb",
+                    "donrgb",
+                    "widegamutrgb",
+                )
+            ):
+                other_icc.append(path)
         for path in ref_icc + other_icc:
             try:
                 profile = ICCP.ICCProfile(path, load=False, use_cache=True)
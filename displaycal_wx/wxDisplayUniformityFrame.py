@@ -12,10 +12,10 @@ import re
 import sys
 from time import sleep, strftime
 
+import argyll_events
 import colormath
 import config
 import localization as lang
-import report
 from config import (
     get_display_number,
     get_display_rects,
@@ -25,6 +25,7 @@ from config import (
     getcfg,
     setcfg,
 )
+from lazyimport import lazy_import
 from log import get_file_logger, safe_print
 from meta import name as appname
 from meta import version as appversion
@@ -42,6 +43,8 @@ from .wxwindows import (
     wx_Panel,
 )
 
+report = lazy_import("report")
+
 BGCOLOUR = wx.Colour(0x33, 0x33, 0x33)
 
 
@@ -180,6 +183,7 @@ class DisplayUniformityFrame(BaseFrame):
 
         # Final initialization steps
         self.logger = get_file_logger("uniformity")
+        self.output_parser = argyll_events.ArgyllOutputParser()
         self._setup()
 
         self.Show()
@@ -342,15 +346,22 @@ class DisplayUniformityFrame(BaseFrame):
             self.Pulse(lang.getstr("instrument.initializing"))
         if "Spot read failed" in txt:
             self.last_error = txt
-        if "Result is XYZ:" in txt:
+        XYZ = None
+        take_reading = False
+        for event in self.output_parser.feed(txt):
+            if event.type == argyll_events.READING and XYZ is None:
+                XYZ = event.value
+            elif (
+                event.type == argyll_events.PROMPT
+                and "key to take a reading" in event.value
+            ):
+                take_reading = True
+        if XYZ:
             # Result is XYZ: d.dddddd d.dddddd d.dddddd, D50 Lab: d.dddddd d.dddddd d.dddddd
             # 							CCT = ddddK (Delta E d.dddddd)
             # Closest Planckian temperature = ddddK (Delta E d.dddddd)
             # Closest Daylight temperature  = ddddK (Delta E d.dddddd)
-            XYZ = re.search("XYZ:\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)", txt)
-            self.results[self.index].append(
-                {"XYZ": [float(value) for value in XYZ.groups()]}
-            )
+            self.results[self.index].append({"XYZ": list(XYZ)})
             self.last_error = None
         loci = {"t": "Daylight", "T": "Planckian"}
         for locus in list(loci.values()):
@@ -359,7 +370,7 @@ class DisplayUniformityFrame(BaseFrame):
                     "Closest\s+%s\s+temperature\s+=\s+(\d+)K" % locus, txt, re.I
                 )
                 self.results[self.index][-1]["C%sT" % locus[0]] = int(CT.groups()[0])
-        if "key to take a reading" in txt and not self.last_error:
+        if take_reading and not self.last_error:
             safe_print("%s: Got 'key to take a reading'" % appname)
             if not self.is_measuring:
                 self.enable_buttons()
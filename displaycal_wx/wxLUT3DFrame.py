@@ -18,7 +18,6 @@ import config
 import floatspin
 import ICCProfile as ICCP
 import localization as lang
-import madvr
 import worker
 import xh_bitmapctrls
 import xh_filebrowsebutton
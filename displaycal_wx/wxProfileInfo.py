@@ -12,7 +12,6 @@ import colormath
 import config
 import ICCProfile as ICCP
 import localization as lang
-import x3dom
 from config import (
     defaults,
     fs_enc,
@@ -28,6 +27,8 @@ from config import (
     setcfg,
     writecfg,
 )
+from gamutcache import gamut_sample_cache, is_matrix_trc_profile, matrix_trc_lookup
+from lazyimport import lazy_import
 from log import safe_print
 from meta import name as appname
 from options import debug
@@ -66,6 +67,8 @@ from .wxwindows import (
     TwoWaySplitter,
 )
 
+x3dom = lazy_import("x3dom")
+
 BGCOLOUR = "#333333"
 FGCOLOUR = "#999999"
 TEXTCOLOUR = "#333333"
@@ -405,6 +408,26 @@ class GamutCanvas(LUTCanvas):
     def reset(self):
         self.axis_x = self.axis_y = -128, 128
 
+    def _lookup_pcs(self, profile, device_values, intent, direction, order):
+        if is_matrix_trc_profile(profile):
+            return matrix_trc_lookup(profile, device_values, intent)
+        if direction == "ib" and intent not in "ar":
+            fwd_intent = "r"
+        else:
+            fwd_intent = intent
+        try:
+            # Device -> PCS, fwd
+            odata = self.worker.xicclu(profile, device_values, intent, "f", order)
+            if direction == "ib":
+                # PCS -> device, bwd
+                odata = self.worker.xicclu(profile, odata, intent, "b", order)
+                # Device -> PCS, fwd
+                odata = self.worker.xicclu(profile, odata, fwd_intent, "f", order)
+        except Exception as exception:
+            self.errors.append(Error(safe_unicode(exception)))
+            return None
+        return odata
+
     def set_pcs_data(self, i):
         if len(self.pcs_data) < i + 1:
             self.pcs_data.append([])
@@ -598,26 +621,20 @@ class GamutCanvas(LUTCanvas):
                     for v in device_values:
                         safe_print(" ".join(("%3.4f",) * len(v)) % tuple(v))
 
-                # Lookup device -> XYZ values through profile using xicclu
-                if direction == "ib" and intent not in "ar":
-                    fwd_intent = "r"
-                else:
-                    fwd_intent = intent
-                try:
-                    # Device -> PCS, fwd
-                    odata = self.worker.xicclu(
-                        profile, device_values, intent, "f", order
+                # Lookup device -> XYZ values through profile, either
+                # in-process (matrix/TRC) or using xicclu. Results are cached
+                # per profile ID, intent, direction and order.
+                cache_key = gamut_sample_cache.get_key(
+                    profile, intent, direction, order, self.size
+                )
+                odata = gamut_sample_cache.get(cache_key)
+                if odata is None:
+                    odata = self._lookup_pcs(
+                        profile, device_values, intent, direction, order
                     )
-                    if direction == "ib":
-                        # PCS -> device, bwd
-                        odata = self.worker.xicclu(profile, odata, intent, "b", order)
-                        # Device -> PCS, fwd
-                        odata = self.worker.xicclu(
-                            profile, odata, fwd_intent, "f", order
-                        )
-                except Exception as exception:
-                    self.errors.append(Error(safe_unicode(exception)))
-                    continue
+                    if odata is None:
+                        continue
+                    gamut_sample_cache.put(cache_key, odata)
 
                 if debug:
                     safe_print("Out:")
@@ -990,6 +990,7 @@ class TestchartEditor(BaseFrame):
             "testchart.maximize_rec709_luma_difference",
             "testchart.maximize_RGB_difference",
             "testchart.vary_RGB_difference",
+            "testchart.minimize_settle_time",
         ):
             patch_order_choices.append(lang.getstr(lstr))
         self.change_patch_order_ctrl = wx.Choice(panel, -1, choices=patch_order_choices)
@@ -1518,6 +1519,9 @@ END_DATA"""
         elif idx == 22:
             # Vary RGB difference
             self.ti1.checkerboard(CGATS.sort_by_RGB, None, split_grays=True, shift=True)
+        elif idx == 23:
+            # Minimize estimated display settle time
+            self.ti1.sort_by_settle_time()
         self.tc_clear(False)
         self.tc_preview(True)
 
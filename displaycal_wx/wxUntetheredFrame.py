@@ -8,10 +8,10 @@ Interactive display calibration UI
 
 import math
 import os
-import re
 import sys
 import time
 
+import argyll_events
 import audio
 import CGATS
 import colormath
@@ -219,6 +219,7 @@ class UntetheredFrame(BaseFrame):
                 # to work best to reduce flicker.
                 child.SetDoubleBuffered(True)
         self.logger = get_file_logger("untethered")
+        self.output_parser = argyll_events.ArgyllOutputParser()
         self._setup()
 
         self.Show()
@@ -497,17 +498,21 @@ class UntetheredFrame(BaseFrame):
             self.is_measuring = False
         if "Spot read failed" in txt:
             self.last_error = txt
-        if "Result is XYZ:" in txt:
+        XYZ = None
+        take_reading = False
+        for event in self.output_parser.feed(txt):
+            if event.type == argyll_events.READING and XYZ is None:
+                XYZ = list(event.value)
+            elif (
+                event.type == argyll_events.PROMPT
+                and "key to take a reading" in event.value
+            ):
+                take_reading = True
+        if XYZ:
             self.last_error = None
             if getcfg("measurement.play_sound"):
                 self.measurement_sound.safe_play()
             # Result is XYZ: d.dddddd d.dddddd d.dddddd, D50 Lab: d.dddddd d.dddddd d.dddddd
-            XYZ = re.search(
-                "XYZ:\s+(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)", txt
-            )
-            if not XYZ:
-                return
-            XYZ = [float(v) for v in XYZ.groups()]
             row = self.cgats[0].DATA[self.index]
             if row["RGB_R"] == 100 and row["RGB_G"] == 100 and row["RGB_B"] == 100:
                 # White
@@ -591,7 +596,7 @@ class UntetheredFrame(BaseFrame):
                                 self.index, "\u25ba %i" % (self.index + 1)
                             )
                             self.grid.MakeCellVisible(self.index, 0)
-        if "key to take a reading" in txt and not self.last_error:
+        if take_reading and not self.last_error:
             if getcfg("untethered.measure.auto") and self.is_measuring:
                 if not self.finished and self.keepGoing:
                     self.measure()
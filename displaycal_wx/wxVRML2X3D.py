@@ -5,12 +5,14 @@ import sys
 
 import config
 import localization as lang
-import x3dom
+from lazyimport import lazy_import
 from meta import name as appname
 from safe_print import safe_print
 from utils.util_os import launch_file, make_win32_compatible_long_path, waccess
 from utils.util_str import safe_unicode
 
+x3dom = lazy_import("x3dom")
+
 gui = "wx" in sys.modules
 
 if gui:
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+"""
+Display response (settle time) model used for patch sequence optimization
+
+The model parameters can be fitted to the patch timing observed during a
+measurement session (see SettleTimeRecorder) and are stored per display in
+a small JSON database (see DisplayResponseDB), so that later sessions can
+use a display specific model for patch ordering and measurement delays.
+
+"""
+
+import itertools
+import json
+import math
+import os
+import time
+
+from . import argyll_events, colormath
+
+
+# Rise and fall time constants (seconds) of the reference display response.
+# They stand for the display response ArgyllCMS' own settle time estimate
+# assumes, i.e. a display settle time multiplier of 1.0 (LCD, falling
+# transitions slower than rising ones).
+REFERENCE_RISE_TIME = 0.05
+REFERENCE_FALL_TIME = 0.075
+
+
+class DisplayResponseModel(object):
+
+    """
+    Simple exponential display response model
+
+    Each channel is assumed to approach its new level exponentially with time
+    constant 'rise' (getting brighter) or 'fall' (getting darker), in seconds.
+    The settle time of a transition is the time until the remaining error of
+    the slowest channel is below 'threshold' (in L* units), plus a constant
+    'latency'.
+
+    Device values are expected in the range 0..100 (as in TI1 files).
+
+    """
+
+    def __init__(
+        self,
+        rise=REFERENCE_RISE_TIME,
+        fall=REFERENCE_FALL_TIME,
+        threshold=0.1,
+        latency=0.0,
+        gamma=2.2,
+    ):
+        self.rise = rise
+        self.fall = fall
+        self.threshold = threshold
+        self.latency = latency
+        self.gamma = gamma
+        self._L_cache = {}
+
+    def channel_L(self, v):
+        """Return (approximate) L* of a single channel value in range 0..100"""
+        L = self._L_cache.get(v)
+        if L is None:
+            Y = (max(v, 0) / 100.0) ** self.gamma * 100
+            L = colormath.XYZ2Lab(0, Y, 0)[0]
+            self._L_cache[v] = L
+        return L
+
+    def settle_terms(self, rgb1, rgb2):
+        """
+        Return the largest rising and falling log error terms of transition
+        rgb1 -> rgb2, so that the settle time (without latency) is
+        max(rise * rising term, fall * falling term)
+
+        """
+        rising = falling = 0
+        for v1, v2 in zip(rgb1[:3], rgb2[:3]):
+            if v1 == v2:
+                continue
+            dL = self.channel_L(v2) - self.channel_L(v1)
+            if abs(dL) > self.threshold:
+                term = math.log(abs(dL) / self.threshold)
+                if dL > 0:
+                    rising = max(rising, term)
+                else:
+                    falling = max(falling, term)
+        return rising, falling
+
+    def settle_time(self, rgb1, rgb2):
+        """Estimated settle time in seconds for transition rgb1 -> rgb2"""
+        rising, falling = self.settle_terms(rgb1, rgb2)
+        return self.latency + max(self.rise * rising, self.fall * falling)
+
+    def todict(self):
+        return {
+            "rise": self.rise,
+            "fall": self.fall,
+            "threshold": self.threshold,
+            "latency": self.latency,
+            "gamma": self.gamma,
+        }
+
+    @classmethod
+    def fit(cls, transitions, threshold=0.1, gamma=2.2):
+        """
+        Fit rise and fall time constants and latency to observed transitions
+
+        'transitions' is a sequence of (rgb1, rgb2, seconds) tuples.
+        The latency absorbs all constant per-patch overhead (instrument
+        integration, communication), so only differences in timing between
+        transitions are attributed to the display response.
+        Return a new model, or None if there are too few transitions.
+
+        """
+        if len(transitions) < 8:
+            return None
+        model = cls(threshold=threshold, gamma=gamma)
+        terms = [
+            model.settle_terms(rgb1, rgb2) + (seconds,)
+            for rgb1, rgb2, seconds in transitions
+        ]
+        # Log-spaced time constants from 5 ms to ~3.2 s
+        taus = [0.005 * 1.25**i for i in range(30)]
+        best = None
+        for rise in taus:
+            for fall in taus:
+                residuals = sorted(
+                    seconds - max(rise * rising, fall * falling)
+                    for rising, falling, seconds in terms
+                )
+                latency = max(residuals[len(residuals) // 2], 0)
+                error = sum(abs(residual - latency) for residual in residuals)
+                if best is None or error < best[0]:
+                    best = (error, rise, fall, latency)
+        error, model.rise, model.fall, model.latency = best
+        return model
+
+    def sequence_time(self, valueslist, start=(0, 0, 0)):
+        """
+        Estimated total settle time for a sequence of RGB(XYZ) values
+
+        'start' is the assumed displayed color before the first patch.
+
+        """
+        total = 0
+        prev = start
+        for values in valueslist:
+            total += self.settle_time(prev, values)
+            prev = values
+        return total
+
+    def order(self, valueslist):
+        """
+        Return the candidate ordering with the lowest estimated total
+        settle time and the estimated time for it.
+
+        Candidates are the original order, ascending and descending
+        lightness, and serpentine orderings which sweep through one channel
+        while alternating the direction of the remaining channels, so that
+        consecutive patches differ in as few channels as possible.
+        All candidates are O(n log n).
+
+        """
+
+        def key_L(values):
+            return sum(self.channel_L(v) for v in values[:3])
+
+        ascending = sorted(valueslist, key=key_L)
+        candidates = [list(valueslist), ascending, ascending[::-1]]
+        for channels in ((0, 1, 2), (1, 0, 2), (2, 1, 0)):
+            candidates.append(serpentine(valueslist, channels))
+        best = None
+        best_time = None
+        for candidate in candidates:
+            t = self.sequence_time(candidate)
+            if best_time is None or t < best_time:
+                best = candidate
+                best_time = t
+        return best, best_time
+
+
+def serpentine(valueslist, channels=(0, 1, 2), reverse=False):
+    """
+    Sort values by channels, alternating the sort direction of each
+    subsequent channel within groups of equal preceding channels
+    ("boustrophedon" order)
+
+    """
+    channel = channels[0]
+    valueslist = sorted(valueslist, key=lambda values: values[channel], reverse=reverse)
+    if len(channels) == 1:
+        return valueslist
+    result = []
+    for i, (v, group) in enumerate(
+        itertools.groupby(valueslist, lambda values: values[channel])
+    ):
+        result.extend(serpentine(list(group), channels[1:], bool(i % 2)))
+    return result
+
+
+class SettleTimeRecorder(object):
+
+    """
+    Record patch timing from measurement tool output
+
+    The time between two consecutive 'Patch N of M' announcements is the
+    time the display took to settle on patch N (plus measurement overhead)
+    after the transition from patch N - 1.
+
+    """
+
+    def __init__(self, valueslist):
+        self.valueslist = valueslist
+        self.timestamps = {}
+
+    def on_event(self, event, ts=None):
+        """Record the time of a PATCH event (argyll_events.ArgyllOutputParser)"""
+        if event.type != argyll_events.PATCH:
+            return
+        number = event.value[0]
+        if 0 < number <= len(self.valueslist) and number not in self.timestamps:
+            self.timestamps[number] = ts or time.time()
+
+    def durations(self):
+        """Return list of (patch number, seconds) in patch order"""
+        numbers = sorted(self.timestamps)
+        return [
+            (number, self.timestamps[number + 1] - self.timestamps[number])
+            for number in numbers
+            if number + 1 in self.timestamps
+        ]
+
+    def transitions(self):
+        """
+        Return list of (rgb1, rgb2, seconds) transitions
+
+        Durations which are much longer than typical (e.g. because the
+        session was paused or a reading was repeated) are excluded.
+
+        """
+        durations = [
+            (number, seconds) for number, seconds in self.durations() if number > 1
+        ]
+        if not durations:
+            return []
+        median = sorted(seconds for number, seconds in durations)[len(durations) // 2]
+        return [
+            (self.valueslist[number - 2], self.valueslist[number - 1], seconds)
+            for number, seconds in durations
+            if seconds <= median * 10
+        ]
+
+    @property
+    def total(self):
+        """Total recorded time in seconds"""
+        if len(self.timestamps) < 2:
+            return 0
+        return max(self.timestamps.values()) - min(self.timestamps.values())
+
+
+class DisplayResponseDB(object):
+
+    """
+    Per-display store of fitted display response models (JSON file)
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.displays = None
+
+    def load(self):
+        self.displays = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "r") as db:
+                    self.displays = json.load(db)
+            except (EnvironmentError, ValueError):
+                pass
+        return self.displays
+
+    def get(self, key):
+        """Return the model stored for display 'key' or None"""
+        if self.displays is None:
+            self.load()
+        entry = self.displays.get(key)
+        if entry:
+            return DisplayResponseModel(**entry["model"])
+
+    def update(self, key, model, transitions):
+        """
+        Store a newly fitted model for display 'key'
+
+        Parameters are averaged with a previously stored model, weighted by
+        the number of transitions each was fitted to.
+
+        """
+        if self.displays is None:
+            self.load()
+        entry = self.displays.get(key)
+        params = model.todict()
+        if entry:
+            n1 = entry.get("transitions", 0)
+            n2 = float(n1 + transitions)
+            for name in ("rise", "fall", "latency"):
+                params[name] = (entry["model"][name] * n1 + params[name] * transitions) / n2
+            transitions += n1
+            sessions = entry.get("sessions", 0) + 1
+        else:
+            sessions = 1
+        self.displays[key] = {
+            "model": params,
+            "transitions": transitions,
+            "sessions": sessions,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        return DisplayResponseModel(**params)
+
+    def save(self):
+        if self.displays is None:
+            return
+        dirname = os.path.dirname(self.path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(self.path + ".tmp", "w") as db:
+            json.dump(self.displays, db, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
@@ -6,6 +6,7 @@ import os
 import string
 import struct
 import sys
+import threading
 import warnings
 from hashlib import md5
 
@@ -83,18 +84,130 @@ TRC = (81, 127)
 
 pnpidcache = {}
 
+# Parsed EDID by raw EDID data
+_parsed_edid_cache = {}
+
 
 def combine_hi_8lo(hi, lo):
     return hi << 8 | lo
 
 
+def get_display_fingerprint():
+    """Return a cheap fingerprint of the current display configuration
+
+    The fingerprint changes when displays are connected, disconnected or
+    rearranged. Return None if the configuration can't be fingerprinted.
+
+    """
+    if sys.platform == "win32":
+        return tuple(
+            (monitor["Device"], tuple(monitor["Monitor"]))
+            for monitor in util_win.get_real_display_devices_info()
+        )
+    elif sys.platform != "darwin" and os.getenv("DISPLAY"):
+        try:
+            from . import xrandr
+
+            with xrandr.XDisplay() as display:
+                return (display.name,) + display.get_config_timestamps()
+        except (ImportError, ValueError):
+            pass
+
+
+class DisplayCache(object):
+
+    """
+    Cache of EDID and display enumeration results
+
+    Entries are valid as long as the display configuration fingerprint
+    (see get_display_fingerprint) stays the same and invalidate() has not
+    been called (e.g. on a display changed event). Nothing is cached if the
+    display configuration can't be fingerprinted.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._fingerprint = None
+        self._entries = {}
+        self._displays = None
+
+    def check(self):
+        """Drop all entries if the display configuration changed
+
+        Return whether cached entries can be used.
+
+        """
+        try:
+            fingerprint = get_display_fingerprint()
+        except Exception as exception:
+            safe_print("Warning - could not get display fingerprint:", exception)
+            fingerprint = None
+        with self._lock:
+            if fingerprint is None or fingerprint != self._fingerprint:
+                self._entries.clear()
+                self._displays = None
+            self._fingerprint = fingerprint
+            return fingerprint is not None
+
+    def invalidate(self):
+        with self._lock:
+            self._fingerprint = None
+            self._entries.clear()
+            self._displays = None
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._entries.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            if self._fingerprint is not None:
+                self._entries[key] = value
+
+    def get_displays(self):
+        """Return a snapshot (list of dicts) of the enumerated displays
+
+        Return None if displays have not been enumerated since the display
+        configuration last changed (as of the last call to check()).
+
+        """
+        with self._lock:
+            if self._displays is not None:
+                return [dict(display) for display in self._displays]
+
+    def set_displays(self, displays):
+        with self._lock:
+            self._displays = [dict(display) for display in displays]
+
+
+display_cache = DisplayCache()
+
+
 def get_edid(display_no=0, display_name=None, device=None):
     """Get and parse EDID. Return dict.
 
     On Mac OS X, you need to specify a display name.
     On all other platforms, you need to specify a display number (zero-based).
 
+    Results are cached until the display configuration changes.
+
     """
+    key = ("edid", display_no, display_name, device and device.DeviceID)
+    if sys.platform not in ("darwin", "win32"):
+        # The display number is mapped to XRandR outputs via the
+        # configured (Argyll) display list
+        key += (tuple(config.getcfg("displays")),)
+    if display_cache.check():
+        edid = display_cache.get(key)
+        if edid is not None:
+            return dict(edid)
+    edid = _get_edid(display_no, display_name, device)
+    display_cache.set(key, edid)
+    return dict(edid)
+
+
+def _get_edid(display_no=0, display_name=None, device=None):
     edid = None
     if sys.platform == "win32":
         if not device:
@@ -337,6 +450,13 @@ def edid_parse_string(desc):
 
 def parse_edid(edid):
     """Parse raw EDID data (binary string) and return dict."""
+    result = _parsed_edid_cache.get(edid)
+    if result is None:
+        result = _parsed_edid_cache[edid] = _parse_edid(edid)
+    return dict(result)
+
+
+def _parse_edid(edid):
     hash = md5(edid).hexdigest()
     header = edid[HEADER[0] : HEADER[1]]
     manufacturer_id = parse_manufacturer_id(
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fake Prisma device for development and testing
+
+FakePrismaServer is a local stand-in for the Prisma HTTP REST interface, so
+that patterngenerators.PrismaPatternGeneratorClient can be exercised without
+a device, e.g.
+
+    server = FakePrismaServer()
+    server.start()
+    client = PrismaPatternGeneratorClient("127.0.0.1", server.port)
+
+Not used by the application itself.
+
+"""
+
+import http.server
+import json
+import threading
+import urllib.parse
+from socketserver import ThreadingMixIn
+from time import sleep
+
+
+class FakePrismaRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    """Request handler of FakePrismaServer"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.record(self.command, self.path)
+        if self.server.delay:
+            sleep(self.server.delay)
+        if self.server.drop_next:
+            # Simulate a dropped keep-alive connection
+            self.server.drop_next -= 1
+            self.close_connection = True
+            return
+        components = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(components.query)
+        data = {"v": 1}
+        if "m" in query:
+            data[query["m"][0]] = "Ok"
+        self._send_json(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.record(self.command, self.path)
+        self._send_json({})
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("UTF-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePrismaServer(ThreadingMixIn, http.server.HTTPServer, object):
+
+    """
+    Local stand-in for the Prisma HTTP REST interface
+
+    Answers every API call with success, records requests and the number of
+    distinct client connections, and can simulate latency and dropped
+    connections.
+
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=0):
+        http.server.HTTPServer.__init__(
+            self, ("127.0.0.1", port), FakePrismaRequestHandler
+        )
+        self.port = self.server_address[1]
+        self.delay = delay
+        self.drop_next = 0
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def get_request(self):
+        with self._lock:
+            self.connections += 1
+        return http.server.HTTPServer.get_request(self)
+
+    def record(self, method, path):
+        with self._lock:
+            self.requests.append((method, path))
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="FakePrismaServerThread"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    server = FakePrismaServer(8080)
+    print("Fake Prisma listening on 127.0.0.1:%i" % server.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
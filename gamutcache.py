@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Gamut boundary sample cache and in-process lookup for matrix/TRC profiles
+
+Used by the profile information gamut view so that switching rendering
+intent, direction or comparison profile does not need to call xicclu for
+each redraw.
+
+"""
+
+import json
+import os
+from binascii import hexlify
+from collections import OrderedDict
+
+from . import colormath
+from .ICCProfile import _tobytes
+from .defaultpaths import cache
+from .meta import name as appname
+
+
+def is_matrix_trc_profile(profile):
+    """
+    Return whether device -> PCS lookups of 'profile' can be done in-process
+
+    This is the case for RGB matrix/TRC profiles with XYZ PCS and no A2B
+    tables (which would take precedence when looked up with xicclu).
+
+    """
+    return (
+        profile.colorSpace == "RGB"
+        and profile.connectionColorSpace == "XYZ"
+        and profile.profileClass in ("mntr", "scnr", "spac")
+        and not [
+            tagname for tagname in ("A2B0", "A2B1", "A2B2") if tagname in profile.tags
+        ]
+        and not [
+            tagname
+            for tagname in ("rXYZ", "gXYZ", "bXYZ", "rTRC", "gTRC", "bTRC", "wtpt")
+            if tagname not in profile.tags
+        ]
+    )
+
+
+def _get_curve_lookup(trc):
+    if hasattr(trc, "params"):
+        # ParametricCurveType
+        return trc.apply
+    elif len(trc) == 1:
+        # CurveType, gamma
+        gamma = trc[0]
+        return lambda v: v**gamma
+    # CurveType, table
+    xp = [i / (len(trc) - 1.0) for i in range(len(trc))]
+    fp = [v / 65535.0 for v in trc]
+    return colormath.Interp(xp, fp)
+
+
+def matrix_trc_lookup(profile, device_values, intent="r"):
+    """
+    Device RGB (0..1) -> PCS XYZ (0..1) lookup for matrix/TRC profiles
+
+    The per-channel curves are evaluated column-wise and the (optionally
+    whitepoint adapted) matrix is applied to all values in one pass.
+    For in-gamut device values the inverse-forward ('ib') roundtrip of a
+    matrix/TRC profile is the identity, so the result can be used for the
+    'f' and 'ib' directions alike.
+
+    """
+    curves = [
+        _get_curve_lookup(profile.tags[channel + "TRC"]) for channel in "rgb"
+    ]
+    columns = [
+        list(map(curves[i], [min(max(v[i], 0.0), 1.0) for v in device_values]))
+        for i in range(3)
+    ]
+    matrix = colormath.Matrix3x3(
+        [
+            [profile.tags[channel + "XYZ"][component] for channel in "rgb"]
+            for component in "XYZ"
+        ]
+    )
+    if intent == "a":
+        # Same adaptation as used for named color profiles in the gamut view
+        matrix = (
+            colormath.wp_adaption_matrix(
+                None, list(profile.tags.wtpt.ir.values()), "Bradford"
+            )
+            * matrix
+        )
+    (Xr, Xg, Xb), (Yr, Yg, Yb), (Zr, Zg, Zb) = matrix
+    return [
+        [
+            Xr * R + Xg * G + Xb * B,
+            Yr * R + Yg * G + Yb * B,
+            Zr * R + Zg * G + Zb * B,
+        ]
+        for R, G, B in zip(*columns)
+    ]
+
+
+class GamutSampleCache(object):
+
+    """
+    Two-tier (memory, disk) cache of gamut boundary samples
+
+    Entries are keyed by the checksum of the profile data, rendering intent,
+    lookup direction, order and number of samples. The memory tier keeps the
+    'maxsize' most recently used entries, the disk tier stores JSON files in
+    'cachedir' and is limited to 'maxdiskbytes' by removing the least
+    recently used files (by modification time, which is updated on access).
+
+    """
+
+    def __init__(self, maxsize=16, cachedir=None, maxdiskbytes=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.cachedir = cachedir
+        self.maxdiskbytes = maxdiskbytes
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def get_key(profile, intent, direction, order, size):
+        # The ID in the header is stale if the profile was changed in memory,
+        # so always calculate the checksum of the current data
+        ID = profile.calculateID(False)
+        return "%s-%s-%s-%s-%i" % (
+            hexlify(_tobytes(ID)).decode("ASCII"),
+            intent,
+            direction,
+            order,
+            size,
+        )
+
+    def _get_path(self, key):
+        if self.cachedir:
+            return os.path.join(self.cachedir, key + ".json")
+
+    def get(self, key):
+        samples = self._cache.get(key)
+        if samples is None:
+            path = self._get_path(key)
+            if path and os.path.isfile(path):
+                try:
+                    with open(path, "r") as cachefile:
+                        samples = json.load(cachefile)
+                    # Mark as recently used
+                    os.utime(path, None)
+                except (EnvironmentError, ValueError):
+                    samples = None
+        if samples is not None:
+            self._set(key, samples)
+        return samples
+
+    def put(self, key, samples):
+        self._set(key, samples)
+        path = self._get_path(key)
+        if not path:
+            return
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            with open(path + ".tmp", "w") as cachefile:
+                json.dump(samples, cachefile)
+            os.replace(path + ".tmp", path)
+            self._prune()
+        except EnvironmentError:
+            # Disk cache is optional
+            pass
+
+    def _prune(self):
+        """Remove least recently used files exceeding the disk tier limit"""
+        entries = []
+        nbytes = 0
+        for entry in os.scandir(self.cachedir):
+            if entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                nbytes += stat.st_size
+        entries.sort()
+        # Always keep the most recent entry
+        for mtime, size, path in entries[:-1]:
+            if nbytes <= self.maxdiskbytes:
+                break
+            os.remove(path)
+            nbytes -= size
+
+    def _set(self, key, samples):
+        self._cache[key] = samples
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+
+gamut_sample_cache = GamutSampleCache(cachedir=os.path.join(cache, appname, "gamut"))
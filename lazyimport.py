@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+Deferred module imports and import time profiling.
+
+Heavy submodules which are only needed by some code paths (e.g. madVR,
+report generation, X3D conversion) can be bound to a LazyModule proxy at
+import time. The real module is imported on first attribute access.
+
+If the --profile-startup commandline option is given, the ImportProfiler
+records cumulative and self import time per module so that the cost of
+each entry point can be inspected.
+
+"""
+
+import builtins
+import importlib
+import importlib.util
+import sys
+import threading
+from time import perf_counter
+
+
+class LazyModule(object):
+
+    """
+    Module proxy which imports the actual module on first attribute access
+
+    """
+
+    def __init__(self, name, package=None):
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_package"] = package
+        self.__dict__["_lazy_module"] = None
+
+    def __repr__(self):
+        if self.__dict__["_lazy_module"] is not None:
+            return repr(self.__dict__["_lazy_module"])
+        return "<lazy module %r>" % self.__dict__["_lazy_name"]
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(
+                self.__dict__["_lazy_name"], self.__dict__["_lazy_package"]
+            )
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    @property
+    def is_loaded(self):
+        return self.__dict__["_lazy_module"] is not None
+
+
+def lazy_import(name, package=None):
+    """
+    Return a proxy for module 'name' which is imported on first use
+
+    If the module has already been imported, return the module itself.
+    'package' is used to resolve relative names like '.madvr'.
+
+    """
+    if name.startswith("."):
+        fullname = importlib.util.resolve_name(name, package)
+    else:
+        fullname = name
+    module = sys.modules.get(fullname)
+    if module is not None:
+        return module
+    return LazyModule(name, package)
+
+
+class ImportProfiler(object):
+
+    """
+    Record per-module import times by wrapping builtins.__import__
+
+    Cumulative time includes nested imports, self time does not.
+
+    """
+
+    def __init__(self):
+        self.times = {}
+        self._orig_import = None
+        self._stack = []
+        self._start = None
+        self._lock = threading.RLock()
+
+    def start(self):
+        if self._orig_import:
+            return
+        self._orig_import = builtins.__import__
+        self._start = perf_counter()
+        builtins.__import__ = self._import
+
+    def stop(self):
+        if self._orig_import:
+            builtins.__import__ = self._orig_import
+            self._orig_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if threading.current_thread() is not threading.main_thread():
+            return self._orig_import(name, globals, locals, fromlist, level)
+        key = name
+        if level:
+            package = (globals or {}).get("__package__")
+            try:
+                key = importlib.util.resolve_name("." * level + name, package)
+            except (ImportError, ValueError):
+                key = None
+        if key in sys.modules and fromlist:
+            # "from package import submodule" imports the submodule(s)
+            # via the import system directly, account for them here
+            submodules = [
+                "%s.%s" % (key, item)
+                for item in fromlist
+                if item != "*" and "%s.%s" % (key, item) not in sys.modules
+            ]
+            key = ", ".join(submodules) or key
+        if key is None or key in sys.modules:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        with self._lock:
+            self._stack.append(0.0)
+            ts = perf_counter()
+            try:
+                return self._orig_import(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = perf_counter() - ts
+                nested = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                if key not in self.times:
+                    self.times[key] = (elapsed, elapsed - nested)
+
+    @property
+    def total(self):
+        if self._start is None:
+            return 0
+        return perf_counter() - self._start
+
+    def report(self, limit=30):
+        """
+        Return import times as list of lines, slowest (cumulative) first
+
+        """
+        lines = [
+            "Startup import profile (%i modules, %.3f s since start):"
+            % (len(self.times), self.total),
+            "%10s %10s  %s" % ("cumul [ms]", "self [ms]", "module"),
+        ]
+        items = sorted(
+            iter(self.times.items()), key=lambda item: item[1][0], reverse=True
+        )
+        for name, (cumulative, own) in items[:limit]:
+            lines.append("%10.1f %10.1f  %s" % (cumulative * 1000, own * 1000, name))
+        return lines
+
+
+import_profiler = ImportProfiler()
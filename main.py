@@ -1,10 +1,19 @@
+import sys
+
+from options import profile_startup
+
+if profile_startup:
+    # Start as early as possible so the imports below are accounted for
+    from lazyimport import import_profiler
+
+    import_profiler.start()
+
 import atexit
 import errno
 import glob
 import os
 import socket
 import subprocess as sp
-import sys
 import threading
 from platform import platform as print_platform
 from time import sleep
@@ -361,6 +370,10 @@ def _main(module, name, applockfilename, probe_ports=True):
             from .profile_loader import main
         else:
             from .DisplayCAL import main
+    if profile_startup:
+        import_profiler.stop()
+        for line in import_profiler.report():
+            safe_print(line)
     # Run main after releasing lock
     main()
 
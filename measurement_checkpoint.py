@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checkpointing of measurement sessions
+
+Readings are appended to a checkpoint file as soon as they are reported by
+the measurement tool, so that an aborted session (user abort, instrument
+disconnect, crash) can be resumed from the first unmeasured patch instead of
+starting over. The checkpoint is keyed by the device values of the testchart
+and the measurement settings (display, instrument, measurement mode, observer,
+measurement tool arguments), and lives outside of the (temporary) session
+directory. Checkpoints older than a maximum age are not resumed.
+
+Readings can only be checkpointed if the measurement tool output contains
+them. Nothing is written (and consequently nothing resumed) for sessions
+which only report progress ('Patch N of M') without readings.
+
+Checkpoint file format (one reading per line, after a header line holding the
+digest, patch count and creation time):
+
+    # <digest> <number of patches> <creation time>
+    <patch index> <X> <Y> <Z>
+
+"""
+
+import os
+import time
+from hashlib import md5
+
+from . import CGATS, argyll_events
+from .config import datahome
+from .log import safe_print
+
+checkpoint_dir = os.path.join(datahome, "checkpoints")
+
+
+def _read_data_block(lines):
+    """
+    Return (data format, index of first data line, index of END_DATA line)
+    of the first table in CGATS lines
+
+    """
+    data_format = None
+    begin = end = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped == "BEGIN_DATA_FORMAT":
+            data_format = lines[i + 1].split()
+        elif stripped == "BEGIN_DATA":
+            begin = i + 1
+        elif stripped == "END_DATA" and begin is not None:
+            end = i
+            break
+    return data_format, begin, end
+
+
+class MeasurementCheckpoint(object):
+
+    """
+    Checkpoint of a measurement session for a given TI1 file
+
+    settings is a sequence of strings identifying the measurement conditions
+    (display, instrument, measurement mode etc.). Readings are only resumed
+    for the same testchart and settings, and if the checkpoint is not older
+    than max_age seconds (if given).
+
+    """
+
+    def __init__(
+        self, ti1_path, fsync_interval=16, path=None, settings=(), max_age=None
+    ):
+        self.ti1_path = ti1_path
+        self.fsync_interval = fsync_interval
+        self.max_age = max_age
+        with open(ti1_path, "r") as ti1:
+            lines = ti1.read().splitlines()
+        data_format, begin, end = _read_data_block(lines)
+        if not data_format or [
+            field
+            for field in ("SAMPLE_ID", "RGB_R", "RGB_G", "RGB_B")
+            if field not in data_format
+        ]:
+            raise CGATS.CGATSInvalidError("No RGB data in %s" % ti1_path)
+        columns = [data_format.index("RGB_" + channel) for channel in "RGB"]
+        self.RGB = []
+        for line in lines[begin:end]:
+            values = line.split()
+            self.RGB.append([float(values[i]) for i in columns])
+        digest = md5(
+            "\n".join("%.6f %.6f %.6f" % tuple(RGB) for RGB in self.RGB).encode(
+                "ASCII"
+            )
+        )
+        for setting in settings:
+            digest.update(b"\n" + str(setting).encode("UTF-8"))
+        self.digest = digest.hexdigest()
+        # White and black patch are always measured in a resumed session
+        # (the measurement tool normalizes readings to the measured white)
+        sums = [sum(RGB) for RGB in self.RGB]
+        self.white = sums.index(max(sums))
+        self.black = sums.index(min(sums))
+        if not path:
+            path = os.path.join(checkpoint_dir, self.digest + ".ckpt")
+        self.path = path
+        self.readings = {}
+        # Maps patch numbers of the currently measured (possibly reduced)
+        # chart to patch indexes of the full chart
+        self.index_map = list(range(len(self.RGB)))
+        self._file = None
+        self._pending = 0
+        self._current = None
+        self._resumable = False
+        # Patches announced and readings reported in the current session
+        self.patches_reported = 0
+        self.readings_reported = 0
+
+    def __len__(self):
+        return len(self.readings)
+
+    def load(self):
+        """
+        Load readings from an existing checkpoint for this testchart and
+        measurement settings
+
+        """
+        self.readings = {}
+        self._resumable = False
+        if not os.path.isfile(self.path):
+            return self.readings
+        with open(self.path, "r") as checkpoint:
+            lines = checkpoint.read().splitlines()
+        header = lines and lines[0].split()[1:]
+        if not header or header[:2] != [self.digest, str(len(self.RGB))]:
+            safe_print("Ignoring checkpoint for different testchart:", self.path)
+            return self.readings
+        try:
+            created = float(header[2])
+        except (IndexError, ValueError):
+            created = 0
+        if self.max_age and time.time() - created > self.max_age:
+            safe_print("Ignoring expired checkpoint:", self.path)
+            return self.readings
+        self._resumable = True
+        for line in lines[1:]:
+            values = line.split()
+            if len(values) != 4:
+                # Incomplete last line (interrupted write)
+                continue
+            try:
+                index = int(values[0])
+                XYZ = [float(v) for v in values[1:]]
+            except ValueError:
+                continue
+            if 0 <= index < len(self.RGB):
+                self.readings[index] = XYZ
+        return self.readings
+
+    def unmeasured(self):
+        """Return indexes of all patches without a checkpointed reading"""
+        return [i for i in range(len(self.RGB)) if i not in self.readings]
+
+    def add(self, index, XYZ):
+        """Append a reading for patch index (zero-based, full chart)"""
+        if not self._file:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            if self._resumable:
+                self._file = open(self.path, "a")
+            else:
+                # New, mismatched or expired checkpoint
+                self._file = open(self.path, "w")
+                self._file.write(
+                    "# %s %i %i\n" % (self.digest, len(self.RGB), time.time())
+                )
+                self._resumable = True
+        self.readings[index] = XYZ
+        self._file.write("%i %.6f %.6f %.6f\n" % ((index,) + tuple(XYZ)))
+        self._pending += 1
+        if self._pending >= self.fsync_interval:
+            self.flush()
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Remove the checkpoint after a successfully completed session"""
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def on_event(self, event):
+        """
+        Checkpoint readings reported by the measurement tool
+
+        Subscribe to PATCH and READING events of an
+        argyll_events.ArgyllOutputParser. A reading is attributed to the
+        patch announced by the last 'Patch N of M' line.
+
+        """
+        if event.type == argyll_events.PATCH:
+            self.patches_reported += 1
+            number = event.value[0]
+            if 0 < number <= len(self.index_map):
+                self._current = self.index_map[number - 1]
+            else:
+                self._current = None
+        elif event.type == argyll_events.READING and self._current is not None:
+            self.readings_reported += 1
+            self.add(self._current, list(event.value))
+            self._current = None
+
+    def write_resume_ti1(self, ti1_path):
+        """
+        Write a reduced TI1 containing the unmeasured patches
+
+        The white and black patch are always kept (and re-measured), so that
+        the measurement tool normalizes readings to the same white as in a
+        full session and still produces a complete TI3 (header, keywords)
+        which readings can be merged into. Return the number of patches in
+        the reduced TI1.
+
+        """
+        indexes = sorted(set(self.unmeasured()) | set((self.white, self.black)))
+        with open(self.ti1_path, "r") as ti1:
+            lines = ti1.read().splitlines()
+        data_format, begin, end = _read_data_block(lines)
+        rows = lines[begin:end]
+        reduced = []
+        for number, index in enumerate(indexes, 1):
+            values = rows[index].split()
+            values[data_format.index("SAMPLE_ID")] = str(number)
+            reduced.append(" ".join(values))
+        lines[begin:end] = reduced
+        for i, line in enumerate(lines[:begin]):
+            if line.startswith("NUMBER_OF_SETS"):
+                lines[i] = "NUMBER_OF_SETS %i" % len(reduced)
+        with open(ti1_path, "w") as ti1:
+            ti1.write("\n".join(lines) + "\n")
+        self.index_map = indexes
+        return len(indexes)
+
+    def merge(self, ti3_path):
+        """
+        Merge checkpointed readings into the TI3 of a resumed session
+
+        The TI3 is rewritten with all patches of the full chart, in the
+        original order. Patches measured in the resumed session (including
+        the re-measured white and black patch) take precedence over
+        checkpointed readings. Return False if the TI3 contains fields which
+        are not available from checkpointed readings (e.g. spectral data).
+
+        """
+        with open(ti3_path, "r") as ti3:
+            lines = ti3.read().splitlines()
+        data_format, begin, end = _read_data_block(lines)
+        known = ("SAMPLE_ID", "RGB_R", "RGB_G", "RGB_B", "XYZ_X", "XYZ_Y", "XYZ_Z")
+        if not data_format or [field for field in data_format if field not in known]:
+            return False
+        # Normalize checkpointed (absolute) readings the same way as the TI3
+        scale = 1.0
+        normalized = luminance = None
+        for line in lines[:begin]:
+            if line.startswith("NORMALIZED_TO_Y_100"):
+                normalized = "YES" in line
+            elif line.startswith("LUMINANCE_XYZ_CDM2"):
+                luminance = float(line.split()[2].strip('"'))
+        if normalized and luminance:
+            scale = 100.0 / luminance
+        rows = {}
+        for number, line in enumerate(lines[begin:end]):
+            if number < len(self.index_map):
+                rows[self.index_map[number]] = line.split()
+        merged = []
+        for index, RGB in enumerate(self.RGB):
+            values = rows.get(index)
+            if not values:
+                XYZ = self.readings.get(index)
+                if XYZ is None:
+                    # Should not happen
+                    return False
+                XYZ = [v * scale for v in XYZ]
+                values = []
+                for field in data_format:
+                    if field.startswith("RGB_"):
+                        values.append("%.6f" % RGB["RGB".index(field[-1])])
+                    elif field.startswith("XYZ_"):
+                        values.append("%.6f" % XYZ["XYZ".index(field[-1])])
+                    else:
+                        values.append("")
+            values[data_format.index("SAMPLE_ID")] = str(index + 1)
+            merged.append(" ".join(values))
+        lines[begin:end] = merged
+        for i, line in enumerate(lines[:begin]):
+            if line.startswith("NUMBER_OF_SETS"):
+                lines[i] = "NUMBER_OF_SETS %i" % len(merged)
+        with open(ti3_path, "w") as ti3:
+            ti3.write("\n".join(lines) + "\n")
+        self.index_map = list(range(len(self.RGB)))
+        return True
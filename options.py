@@ -81,3 +81,6 @@ use_colord_gi = "--use-colord-gi" in sys.argv[1:]
 force_skip_initial_instrument_detection = (
     "--force-skip-initial-instrument-detection" in sys.argv[1:]
 )
+
+# Report per-module import times on startup
+profile_startup = "--profile-startup" in sys.argv[1:]
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+
+"""
+Headless orchestration of concurrent calibration/profiling sessions
+
+A Pipeline runs a sequence of Argyll utilities (e.g. dispcal, dispread,
+colprof) for one display/instrument pair in its own temporary directory,
+with its own session log and progress callback. An Orchestrator runs any
+number of pipelines in parallel. CPU intensive steps (profiling, linking)
+of all pipelines share a bounded number of slots, so that throughput scales
+with the number of instruments without oversubscribing the machine.
+
+Pipelines are not interactive: dispcal is always run with -m (no
+interactive display adjustment), prompts to hit a key to continue are
+answered automatically, so instruments need to be placed on the displays
+beforehand. A pipeline fails if a utility prompts for anything else (e.g.
+instrument calibration).
+
+"""
+
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+from time import time
+
+from utils.util_str import make_filename_safe, safe_unicode
+
+from . import localization as lang
+from . import subprocess as sp
+from .config import getcfg, initcfg
+from .debughelpers import Error, Info
+from .log import safe_print
+from .multiprocess import cpu_count
+from .worker_base import WorkerBase, get_argyll_util, printcmdline
+
+# Utilities whose runtime is bound by CPU rather than by the instrument
+cpu_bound_utils = ("colprof", "collink", "targen")
+
+_PATCH_RE = re.compile(r"Patch (\d+) of (\d+)", re.I)
+# Prompt which is answered automatically
+_CONTINUE_RE = re.compile(r"key to continue\W*$", re.I)
+# Any other prompt (incomplete line waiting for input)
+_PROMPT_RE = re.compile(r"(?:\bhit\b|\bkey\b|\besc\b|\benter\b|\?).*[:?]\s*$", re.I)
+
+
+class PipelineStep(object):
+
+    """
+    Invocation of a single Argyll utility as part of a pipeline
+
+    Unless append_basename is False, the pipeline's basename is passed as
+    last argument.
+
+    """
+
+    def __init__(self, util, args=None, cpu_bound=None, append_basename=True):
+        self.util = util
+        self.args = list(args or [])
+        if cpu_bound is None:
+            cpu_bound = util in cpu_bound_utils
+        self.cpu_bound = cpu_bound
+        self.append_basename = append_basename
+
+
+class Pipeline(WorkerBase):
+
+    """
+    Calibration/profiling pipeline for one display
+
+    Each step is run in the pipeline's temporary directory. 'infiles' is a
+    list of (path, filename) tuples which are copied to the temporary
+    directory before the first step. On success, all files starting with
+    the basename are copied to 'outdir'.
+
+    progress_callback(pipeline, step, line, percent) is called for every
+    line of output, percent is None unless a patch number was reported.
+
+    """
+
+    def __init__(
+        self, name, basename, steps, infiles=(), outdir=None, progress_callback=None
+    ):
+        WorkerBase.__init__(self)
+        self.name = name
+        self.basename = basename
+        self.steps = steps
+        self.infiles = list(infiles)
+        self.outdir = outdir
+        self.progress_callback = progress_callback
+        self.subprocess = None
+        self.status = "pending"
+        self.error = None
+        self.timings = []
+        self._abort = False
+
+    def abort(self):
+        self._abort = True
+        if self.status == "pending":
+            self.status = "aborted"
+        if self.isalive():
+            self.subprocess.terminate()
+
+    def run(self, cpu_slots=None):
+        """
+        Run all steps. Return True on success.
+
+        cpu_slots is an optional semaphore which is acquired for the
+        duration of CPU bound steps.
+
+        """
+        self.status = "running"
+        tempdir = self.create_tempdir()
+        if isinstance(tempdir, Exception):
+            self.status = "failed"
+            self.error = tempdir
+            return False
+        try:
+            self.sessionlogfile = open(
+                os.path.join(tempdir, self.basename + ".log"), "w", encoding="UTF-8"
+            )
+            for path, filename in self.infiles:
+                shutil.copyfile(path, os.path.join(tempdir, filename))
+            for step in self.steps:
+                if self._abort:
+                    raise Info(lang.getstr("aborted"))
+                ts = time()
+                if step.cpu_bound and cpu_slots:
+                    with cpu_slots:
+                        retcode = self._run_step(step)
+                else:
+                    retcode = self._run_step(step)
+                self.timings.append((step.util, time() - ts))
+                if self._abort:
+                    raise Info(lang.getstr("aborted"))
+                if retcode:
+                    raise Error(
+                        "%s: %s exited with code %s" % (self.name, step.util, retcode)
+                    )
+            if self.outdir:
+                self.sessionlogfile.flush()
+                self._collect()
+        except Info as exception:
+            self.status = "aborted"
+            self.error = exception
+        except Exception as exception:
+            # Any other error fails the pipeline, not the orchestrator
+            self.status = "failed"
+            self.error = exception
+        else:
+            self.status = "done"
+        finally:
+            if self.error:
+                self.log("%s: %s" % (self.name, safe_unicode(self.error)))
+            if self.sessionlogfile:
+                self.sessionlogfile.close()
+                self.sessionlogfile = None
+            shutil.rmtree(tempdir, True)
+            self.tempdir = None
+        return self.status == "done"
+
+    def _collect(self):
+        if not os.path.isdir(self.outdir):
+            os.makedirs(self.outdir)
+        for filename in os.listdir(self.tempdir):
+            if filename.startswith(self.basename + "."):
+                shutil.copyfile(
+                    os.path.join(self.tempdir, filename),
+                    os.path.join(self.outdir, filename),
+                )
+
+    def _run_step(self, step):
+        exe = get_argyll_util(step.util)
+        if not exe:
+            raise Error(lang.getstr("argyll.util.not_found", step.util))
+        args = list(step.args)
+        if step.append_basename:
+            args.append(self.basename)
+        printcmdline(exe, args, fn=self.log, cwd=self.tempdir)
+        self.subprocess = sp.Popen(
+            [exe] + args,
+            stdin=sp.PIPE,
+            stdout=sp.PIPE,
+            stderr=sp.STDOUT,
+            cwd=self.tempdir,
+        )
+        fd = self.subprocess.stdout.fileno()
+        buf = ""
+        while True:
+            # Read unbuffered, prompts are not terminated by a newline
+            data = os.read(fd, 4096)
+            if not data:
+                break
+            buf += data.decode("UTF-8", "replace").replace("\r\n", "\n")
+            lines = re.split("[\r\n]", buf)
+            buf = lines.pop()
+            for line in lines:
+                self._output(step, line)
+            if _CONTINUE_RE.search(buf):
+                self._output(step, buf)
+                buf = ""
+                try:
+                    self.subprocess.stdin.write(b" ")
+                    self.subprocess.stdin.flush()
+                except EnvironmentError:
+                    pass
+            elif _PROMPT_RE.search(buf):
+                # Fail fast instead of waiting for input forever
+                self._output(step, buf)
+                self.subprocess.terminate()
+                self.subprocess.wait()
+                self.subprocess.stdin.close()
+                self.subprocess.stdout.close()
+                raise Error(
+                    "%s: %s is waiting for input: %s"
+                    % (self.name, step.util, buf.strip())
+                )
+        if buf:
+            self._output(step, buf)
+        self.subprocess.stdin.close()
+        self.subprocess.stdout.close()
+        return self.subprocess.wait()
+
+    def _output(self, step, line):
+        if not line.strip():
+            return
+        self.sessionlogfile.write(line + "\n")
+        if self.progress_callback:
+            percent = None
+            patch = _PATCH_RE.search(line)
+            if patch:
+                percent = 100.0 * int(patch.group(1)) / int(patch.group(2))
+            self.progress_callback(self, step, line, percent)
+
+
+def create_display_pipeline(
+    name,
+    ti1,
+    display=1,
+    instrument=1,
+    outdir=None,
+    dispcal_args=None,
+    dispread_args=None,
+    colprof_args=None,
+    progress_callback=None,
+):
+    """
+    Create a calibration (optional), measurement and profiling pipeline
+
+    Calibration is skipped if dispcal_args is None. The calibration (if
+    any) is applied while measuring the testchart 'ti1'.
+
+    """
+    basename = make_filename_safe(name)
+    display_args = ["-d%s" % display, "-c%s" % instrument]
+    steps = []
+    dispread_args = display_args + list(dispread_args or [])
+    if dispcal_args is not None:
+        dispcal_args = list(dispcal_args)
+        if "-m" not in dispcal_args:
+            # No interactive display adjustment
+            dispcal_args.insert(0, "-m")
+        steps.append(PipelineStep("dispcal", display_args + dispcal_args))
+        dispread_args += ["-k", basename + ".cal"]
+    steps.append(PipelineStep("dispread", dispread_args))
+    if colprof_args is None:
+        colprof_args = ["-qm", "-as"]
+    steps.append(PipelineStep("colprof", ["-D", name] + list(colprof_args)))
+    return Pipeline(
+        name,
+        basename,
+        steps,
+        [(ti1, basename + ".ti1")],
+        outdir,
+        progress_callback,
+    )
+
+
+class Orchestrator(object):
+
+    """
+    Run pipelines in parallel
+
+    max_cpu_jobs limits the number of concurrently running CPU bound steps
+    (default: multiprocessing.max_cpus setting or number of CPUs),
+    max_pipelines the number of concurrently running pipelines (default:
+    no limit).
+
+    """
+
+    def __init__(self, max_cpu_jobs=None, max_pipelines=None):
+        if not max_cpu_jobs:
+            max_cpu_jobs = getcfg("multiprocessing.max_cpus") or cpu_count()
+        self.max_cpu_jobs = max_cpu_jobs
+        self.max_pipelines = max_pipelines
+        self.cpu_slots = threading.BoundedSemaphore(max_cpu_jobs)
+        self.pipelines = []
+
+    def add(self, pipeline):
+        self.pipelines.append(pipeline)
+
+    def abort(self):
+        for pipeline in self.pipelines:
+            pipeline.abort()
+
+    def run(self):
+        """
+        Run all pipelines and wait for them to finish
+
+        Return a summary (list of dicts with name, status, error and step
+        timings) in pipeline order.
+
+        """
+        pending = queue.Queue()
+        for pipeline in self.pipelines:
+            pending.put(pipeline)
+
+        def run_pending():
+            while True:
+                try:
+                    pipeline = pending.get_nowait()
+                except queue.Empty:
+                    return
+                if pipeline.status == "pending":
+                    pipeline.run(self.cpu_slots)
+
+        num_threads = len(self.pipelines)
+        if self.max_pipelines:
+            num_threads = min(self.max_pipelines, num_threads)
+        threads = []
+        for i in range(num_threads):
+            thread = threading.Thread(
+                target=run_pending, name="PipelineThread-%i" % i
+            )
+            thread.start()
+            threads.append(thread)
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            self.abort()
+            for thread in threads:
+                thread.join()
+        return [
+            {
+                "name": pipeline.name,
+                "status": pipeline.status,
+                "error": pipeline.error and safe_unicode(pipeline.error),
+                "timings": pipeline.timings,
+            }
+            for pipeline in self.pipelines
+        ]
+
+
+def _print_progress(pipeline, step, line, percent):
+    if percent is not None:
+        safe_print("[%s] %s %.0f%%" % (pipeline.name, step.util, percent))
+    elif not _PATCH_RE.search(line):
+        safe_print("[%s] %s" % (pipeline.name, line))
+
+
+def run_manifest(manifest_path, outdir):
+    """
+    Run pipelines described by a JSON manifest
+
+    The manifest is either a list of pipelines, or an object with the keys
+    "pipelines" and (optionally) "max_cpu_jobs". Each pipeline is an object
+    with the keys name, ti1, display, instrument and optionally dispcal,
+    dispread and colprof (lists of extra arguments). Relative ti1 paths are
+    relative to the manifest.
+
+    """
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    if isinstance(manifest, list):
+        manifest = {"pipelines": manifest}
+    orchestrator = Orchestrator(manifest.get("max_cpu_jobs"))
+    basedir = os.path.dirname(os.path.abspath(manifest_path))
+    for entry in manifest["pipelines"]:
+        orchestrator.add(
+            create_display_pipeline(
+                entry["name"],
+                os.path.join(basedir, entry["ti1"]),
+                entry.get("display", 1),
+                entry.get("instrument", 1),
+                outdir,
+                entry.get("dispcal"),
+                entry.get("dispread"),
+                entry.get("colprof"),
+                _print_progress,
+            )
+        )
+    return orchestrator.run()
+
+
+if __name__ == "__main__":
+    initcfg()
+    lang.init()
+    if len(sys.argv) != 3:
+        safe_print("Run calibration/profiling pipelines for several displays.")
+        safe_print(
+            "Usage: %s manifest.json outdir" % os.path.basename(sys.argv[0])
+        )
+    else:
+        summary = run_manifest(sys.argv[1], sys.argv[2])
+        safe_print(json.dumps(summary, indent=2))
+        sys.exit(int(bool([item for item in summary if item["status"] != "done"])))
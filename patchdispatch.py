@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Dispatch of measurement patches to pattern generators
+
+The thread processing the measurement tool's output only queues patches,
+a dedicated thread sends them. That way output processing is not blocked
+by network round trips to the pattern generator. For each patch, the time
+it was queued, the time sending started and the time the send was
+acknowledged (the pattern generator call returned) are recorded.
+
+"""
+
+import queue
+import threading
+from time import perf_counter
+
+from .log import safe_print
+
+
+class PatchDispatcher(object):
+
+    """
+    Send patches from a dedicated thread
+
+    send(rgb) is called for each queued patch, in order. Exceptions raised
+    by it are logged and stored in self.error. timings is a list of
+    (queued, send started, acknowledged) perf_counter timestamps.
+
+    """
+
+    def __init__(self, send, name="PatchDispatcherThread"):
+        self.send = send
+        self.error = None
+        self.timings = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+
+    def __str__(self):
+        stats = self.stats()
+        if not stats["count"]:
+            return "no patches"
+        return (
+            "%(count)i patches, queue wait avg %(wait_avg_ms).1f ms "
+            "(max %(wait_max_ms).1f ms), send to ack avg %(ack_avg_ms).1f ms "
+            "(max %(ack_max_ms).1f ms)" % stats
+        )
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            queued, rgb = item
+            sent = perf_counter()
+            try:
+                self.send(rgb)
+            except Exception as exception:
+                self.error = exception
+                safe_print("Warning - could not send patch:", exception)
+            self.timings.append((queued, sent, perf_counter()))
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def put(self, rgb):
+        """Queue a patch for sending, return immediately"""
+        self._queue.put((perf_counter(), rgb))
+
+    def start(self):
+        self._thread.start()
+
+    def stats(self):
+        """Return queue wait and send to ack times in milliseconds"""
+        waits = [(sent - queued) * 1000 for queued, sent, acked in self.timings]
+        acks = [(acked - sent) * 1000 for queued, sent, acked in self.timings]
+        count = len(self.timings)
+        return {
+            "count": count,
+            "wait_avg_ms": count and sum(waits) / count,
+            "wait_max_ms": max(waits or [0]),
+            "ack_avg_ms": count and sum(acks) / count,
+            "ack_max_ms": max(acks or [0]),
+        }
+
+    def stop(self, timeout=None):
+        """Send remaining queued patches, then stop the thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
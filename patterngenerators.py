@@ -4,6 +4,7 @@ import errno
 import http.client
 import json
 import select
+import selectors
 import struct
 import sys
 import threading
@@ -22,18 +23,23 @@ from socket import (
     gethostbyname,
     gethostname,
     socket,
+    socketpair,
     timeout,
 )
-from socketserver import TCPServer
-from time import sleep
+from socketserver import TCPServer, ThreadingMixIn
+from time import perf_counter, sleep
 
 from utils.util_http import encode_multipart_formdata
 from utils.util_str import safe_unicode
 
 from . import localization as lang
-from . import webwin
+from .lazyimport import lazy_import
 from .log import safe_print
 from .network import get_network_addr
+from .options import verbose
+
+# Only needed by the web pattern generator server, import on first use
+webwin = lazy_import(".webwin", __package__)
 
 _lock = threading.RLock()
 
@@ -65,9 +71,79 @@ def _shutdown(sock, addr):
     sock.close()
 
 
+class LatencyHistogram(object):
+
+    """Request latency histogram with logarithmic buckets (milliseconds)"""
+
+    bounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.clear()
+
+    def __str__(self):
+        if not self.count:
+            return "no requests"
+        return "%i requests, avg %.1f ms, max %.1f ms, %s" % (
+            self.count,
+            self.total / self.count * 1000,
+            self.max * 1000,
+            ", ".join(
+                "%s: %i" % (bucket, count)
+                for bucket, count in self.export()["buckets"].items()
+                if count
+            ),
+        )
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        for i, bound in enumerate(self.bounds):
+            if ms <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def clear(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def export(self):
+        """Return histogram as JSON serializable dictionary"""
+        buckets = {}
+        for i, bound in enumerate(self.bounds):
+            buckets["<=%ims" % bound] = self.counts[i]
+        buckets[">%ims" % self.bounds[-1]] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": self.count and self.total / self.count * 1000,
+            "max_ms": self.max * 1000,
+            "buckets": buckets,
+        }
+
+
 class GenHTTPPatternGeneratorClient(object):
 
-    """Generic pattern generator client using HTTP REST interface"""
+    """
+    Generic pattern generator client using HTTP REST interface
+
+    Connections are kept alive between requests. Idempotent (GET) requests
+    which fail because the connection was dropped are retried on a new
+    connection with exponential backoff. Requests are issued in sequence on
+    a single connection, so that calls which change the device state are
+    applied in order. Request latencies are collected in a histogram
+    (self.latency).
+
+    """
+
+    max_retries = 3
+    retry_backoff = 0.1  # Seconds, doubled on each retry
 
     def __init__(self, host, port, bits, use_video_levels=False, logfile=None):
         self.host = host
@@ -75,6 +151,7 @@ class GenHTTPPatternGeneratorClient(object):
         self.bits = bits
         self.use_video_levels = use_video_levels
         self.logfile = logfile
+        self.latency = LatencyHistogram()
 
     def wait(self):
         self.connect()
@@ -83,16 +160,34 @@ class GenHTTPPatternGeneratorClient(object):
         self.disconnect_client()
 
     def _request(self, method, url, params=None, headers=None, validate=None):
-        try:
-            self.conn.request(method, url, params, headers or {})
-            resp = self.conn.getresponse()
-        except (error, http.client.HTTPException) as exception:
-            raise
-        else:
-            if resp.status == http.client.OK:
-                return self._validate(resp, url, validate)
-            else:
-                raise http.client.HTTPException("%s %s" % (resp.status, resp.reason))
+        for attempt in range(self.max_retries + 1):
+            ts = perf_counter()
+            try:
+                self.conn.request(method, url, params, headers or {})
+                resp = self.conn.getresponse()
+            except (error, http.client.HTTPException) as exception:
+                # Connection dropped (e.g. keep-alive timeout on the device).
+                # HTTPConnection reconnects automatically on the next request
+                self.conn.close()
+                if method != "GET" or attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2**attempt
+                safe_print(
+                    "%s: Request %s %s failed (%s), retrying in %.1f s"
+                    % (self.__class__.__name__, method, url, exception, delay)
+                )
+                sleep(delay)
+                continue
+            try:
+                if resp.status == http.client.OK:
+                    return self._validate(resp, url, validate)
+                else:
+                    raise http.client.HTTPException("%s %s" % (resp.status, resp.reason))
+            finally:
+                # Response needs to be read completely before the connection
+                # can be re-used
+                resp.read()
+                self.latency.add(perf_counter() - ts)
 
     def _shutdown(self):
         # Override this method in subclass!
@@ -117,6 +212,11 @@ class GenHTTPPatternGeneratorClient(object):
             self._shutdown()
             self.conn.close()
             del self.conn
+            if self.latency.count:
+                safe_print(
+                    "%s: Request latency: %s" % (self.__class__.__name__, self.latency)
+                )
+                self.latency.clear()
 
     def send(
         self,
@@ -217,8 +317,10 @@ class GenTCPSockPatternGeneratorServer(object):
             (ResolveLSPatternGeneratorServer, 8),
             (ResolveCMPatternGeneratorServer, 10),
         ):
-            server.__dict__["send"](
-                self, rgb, bgrgb, bits, use_video_levels, x, y, w, h
+            self.conn.sendall(
+                server.__dict__["_encode"](
+                    self, rgb, bgrgb, bits, use_video_levels, x, y, w, h
+                )
             )
 
 
@@ -494,7 +596,7 @@ class ResolveLSPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
             self, port, bits, use_video_levels, logfile
         )
 
-    def send(
+    def _encode(
         self,
         rgb=(0, 0, 0),
         bgrgb=(0, 0, 0),
@@ -505,15 +607,31 @@ class ResolveLSPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
         w=1,
         h=1,
     ):
-        """Send an RGB color to the pattern generator. The RGB range should be 0..1"""
+        """Return length-prefixed XML message for an RGB color"""
         rgb, bgrgb, bits = self._get_rgb(rgb, bgrgb, bits, use_video_levels)
         xml = (
             '<?xml version="1.0" encoding="UTF-8" ?><calibration><shapes>'
             '<rectangle><color red="%i" green="%i" blue="%i" />'
             '<geometry x="%.4f" y="%.4f" cx="%.4f" cy="%.4f" /></rectangle>'
             "</shapes></calibration>" % tuple(rgb + [x, y, w, h])
+        ).encode("UTF-8")
+        return struct.pack(">I", len(xml)) + xml
+
+    def send(
+        self,
+        rgb=(0, 0, 0),
+        bgrgb=(0, 0, 0),
+        bits=None,
+        use_video_levels=None,
+        x=0,
+        y=0,
+        w=1,
+        h=1,
+    ):
+        """Send an RGB color to the pattern generator. The RGB range should be 0..1"""
+        self.conn.sendall(
+            self._encode(rgb, bgrgb, bits, use_video_levels, x, y, w, h)
         )
-        self.conn.sendall("%s%s" % (struct.pack(">I", len(xml)), xml))
 
 
 class ResolveCMPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
@@ -522,7 +640,7 @@ class ResolveCMPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
             self, port, bits, use_video_levels, logfile
         )
 
-    def send(
+    def _encode(
         self,
         rgb=(0, 0, 0),
         bgrgb=(0, 0, 0),
@@ -533,7 +651,7 @@ class ResolveCMPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
         w=1,
         h=1,
     ):
-        """Send an RGB color to the pattern generator. The RGB range should be 0..1"""
+        """Return length-prefixed XML message for an RGB color"""
         rgb, bgrgb, bits = self._get_rgb(rgb, bgrgb, bits, use_video_levels)
         xml = (
             '<?xml version="1.0" encoding="utf-8"?><calibration>'
@@ -541,20 +659,303 @@ class ResolveCMPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
             '<background red="%i" green="%i" blue="%i" bits="%i"/>'
             '<geometry x="%.4f" y="%.4f" cx="%.4f" cy="%.4f"/>'
             "</calibration>" % tuple(rgb + [bits] + bgrgb + [bits, x, y, w, h])
+        ).encode("UTF-8")
+        return struct.pack(">I", len(xml)) + xml
+
+    def send(
+        self,
+        rgb=(0, 0, 0),
+        bgrgb=(0, 0, 0),
+        bits=None,
+        use_video_levels=None,
+        x=0,
+        y=0,
+        w=1,
+        h=1,
+    ):
+        """Send an RGB color to the pattern generator. The RGB range should be 0..1"""
+        self.conn.sendall(
+            self._encode(rgb, bgrgb, bits, use_video_levels, x, y, w, h)
+        )
+
+
+class MultiClientTCPSockPatternGeneratorServer(GenTCPSockPatternGeneratorServer):
+
+    """
+    Pattern generator server using TCP sockets, serving multiple clients
+
+    All socket I/O happens in a selector thread. send() encodes a pattern
+    once and queues it for every connected client (broadcast) without
+    blocking on slow clients, flush() can be used to wait until all queued
+    patterns have been handed to the OS. Clients connecting later get the
+    current pattern. Subclasses need to implement _encode.
+
+    While clients are connected, self.conn is the dictionary of client
+    sockets and their pending output.
+
+    """
+
+    def __init__(
+        self, port, bits, use_video_levels=False, logfile=None, min_clients=1
+    ):
+        GenTCPSockPatternGeneratorServer.__init__(
+            self, port, bits, use_video_levels, logfile
         )
-        self.conn.sendall("%s%s" % (struct.pack(">I", len(xml)), xml))
+        self.socket.listen(8)
+        self.socket.setblocking(False)
+        self.min_clients = min_clients
+        self._clients = {}
+        self._changed = threading.Condition()
+        self._last = None
+        self._selector = None
+        self._thread = None
+        # Created after the server socket was bound successfully, so it
+        # can't leak if binding fails
+        self._wakeup = socketpair()
+
+    def __del__(self):
+        GenTCPSockPatternGeneratorServer.__del__(self)
+        for sock in getattr(self, "_wakeup", ()):
+            sock.close()
+
+    def _encode(self, *args):
+        # Override this method in subclass!
+        raise NotImplementedError()
 
+    def _start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.socket, selectors.EVENT_READ)
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+        self._thread = threading.Thread(
+            target=self._serve, name="%sThread" % self.__class__.__name__
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _serve(self):
+        while self.listening:
+            for key, events in self._selector.select():
+                sock = key.fileobj
+                if sock is self._wakeup[0]:
+                    self._wakeup[0].recv(4096)
+                elif sock is self.socket:
+                    self._accept()
+                else:
+                    if events & selectors.EVENT_READ and not self._read(sock):
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self._write(sock)
+            # Watch clients with pending output for writability
+            with self._changed:
+                for sock, pending in self._clients.items():
+                    events = selectors.EVENT_READ
+                    if pending:
+                        events |= selectors.EVENT_WRITE
+                    if self._selector.get_key(sock).events != events:
+                        self._selector.modify(sock, events)
+        self._selector.close()
+
+    def _accept(self):
+        try:
+            sock, addr = self.socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        with self._changed:
+            self._clients[sock] = bytearray(self._last or b"")
+            self._selector.register(sock, selectors.EVENT_READ)
+            self._changed.notify_all()
+        safe_print(lang.getstr("connection.established"), "%s:%s" % addr[:2])
+
+    def _read(self, sock):
+        # Clients are not expected to send anything, only detect disconnect
+        try:
+            data = sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except error:
+            data = None
+        if not data:
+            self._remove(sock)
+            return False
+        return True
+
+    def _write(self, sock):
+        with self._changed:
+            pending = self._clients.get(sock)
+            if not pending:
+                return
+            try:
+                sent = sock.send(pending)
+            except (BlockingIOError, InterruptedError):
+                return
+            except error as exception:
+                safe_print(
+                    "Warning - could not send to pattern generator client:",
+                    exception,
+                )
+                sent = None
+            if sent is not None:
+                del pending[:sent]
+                if not pending:
+                    self._changed.notify_all()
+                return
+        self._remove(sock)
+
+    def _remove(self, sock):
+        with self._changed:
+            if self._clients.pop(sock, None) is None:
+                return
+            self._selector.unregister(sock)
+            self._changed.notify_all()
+        sock.close()
+        safe_print(lang.getstr("connection.broken"))
+
+    def _wake(self):
+        try:
+            self._wakeup[1].send(b"\0")
+        except error:
+            pass
+
+    def wait(self):
+        self.listening = True
+        if self.logfile:
+            try:
+                host = get_network_addr()
+            except error:
+                host = gethostname()
+            self.logfile.write(
+                lang.getstr("connection.waiting") + (" %s:%s\n" % (host, self.port))
+            )
+        self._start()
+        with self._changed:
+            while self.listening and len(self._clients) < self.min_clients:
+                self._changed.wait(1)
+            if self.listening:
+                self.conn = self._clients
+
+    def disconnect_client(self):
+        self.listening = False
+        if self._thread:
+            self._wake()
+            self._thread.join()
+            self._thread = None
+        with self._changed:
+            clients = list(self._clients)
+            self._clients.clear()
+        for sock in clients:
+            try:
+                sock.shutdown(SHUT_RDWR)
+            except error:
+                pass
+            sock.close()
+        if hasattr(self, "conn"):
+            del self.conn
+
+    def flush(self, timeout=None):
+        """
+        Wait until queued patterns have been sent to all clients
+
+        Return False on timeout.
+
+        """
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: not [pending for pending in self._clients.values() if pending],
+                timeout,
+            )
+
+    def send(
+        self,
+        rgb=(0, 0, 0),
+        bgrgb=(0, 0, 0),
+        bits=None,
+        use_video_levels=None,
+        x=0,
+        y=0,
+        w=1,
+        h=1,
+    ):
+        """Broadcast an RGB color to all clients. The RGB range should be 0..1"""
+        data = self._encode(rgb, bgrgb, bits, use_video_levels, x, y, w, h)
+        with self._changed:
+            if not self._clients:
+                raise error(errno.ENOTCONN, lang.getstr("connection.broken"))
+            self._last = data
+            for pending in self._clients.values():
+                pending += data
+        self._wake()
+
+
+class ResolveLSMultiClientPatternGeneratorServer(
+    MultiClientTCPSockPatternGeneratorServer, ResolveLSPatternGeneratorServer
+):
+
+    """Resolve (LS) pattern generator server for multiple clients"""
+
+    def __init__(
+        self, port=20002, bits=8, use_video_levels=False, logfile=None, min_clients=1
+    ):
+        MultiClientTCPSockPatternGeneratorServer.__init__(
+            self, port, bits, use_video_levels, logfile, min_clients
+        )
+
+    _encode = ResolveLSPatternGeneratorServer._encode
+
+
+class ResolveCMMultiClientPatternGeneratorServer(
+    MultiClientTCPSockPatternGeneratorServer, ResolveCMPatternGeneratorServer
+):
+
+    """Resolve (CM) pattern generator server for multiple clients"""
+
+    def __init__(
+        self, port=20002, bits=10, use_video_levels=False, logfile=None, min_clients=1
+    ):
+        MultiClientTCPSockPatternGeneratorServer.__init__(
+            self, port, bits, use_video_levels, logfile, min_clients
+        )
+
+    _encode = ResolveCMPatternGeneratorServer._encode
+
+
+class WebWinHTTPPatternGeneratorServer(ThreadingMixIn, TCPServer, object):
+
+    """
+    Web pattern generator (HTTP server for a browser window)
+
+    Pattern changes are pushed to the browser via Server-Sent Events
+    (/events) or returned to pending long-poll requests (/ajax/messages)
+    as soon as they happen. Each request is handled in its own thread,
+    the server loop blocks on a selector without timeout and is woken up
+    via a socket pair on shutdown.
+
+    The browser acknowledges each pattern after it has been painted
+    (/ajax/ack), which gives the patch-to-screen latency.
+
+    """
+
+    daemon_threads = True
+    block_on_close = False
 
-class WebWinHTTPPatternGeneratorServer(TCPServer, object):
     def __init__(self, port, logfile=None):
         self.port = port
         Handler = webwin.WebWinHTTPRequestHandler
         TCPServer.__init__(self, ("", port), Handler)
+        # Created after the server socket was bound successfully, so it
+        # can't leak if binding fails
+        self._wakeup = socketpair()
         self.timeout = 1
         self.patterngenerator = self
         self._listening = threading.Event()
+        self._pattern_changed = threading.Condition()
+        self._sent_ts = {}
+        self.latencies = []
         self.logfile = logfile
         self.pattern = "#808080|#808080|0|0|1|1"
+        self.pattern_seq = 0
 
     def disconnect_client(self):
         self.listening = False
@@ -576,14 +977,20 @@ class WebWinHTTPPatternGeneratorServer(TCPServer, object):
                 self._listening.set()
             else:
                 self._listening.clear()
+                self._notify()
                 if hasattr(self, "conn"):
                     self.shutdown_request(self.conn)
                     del self.conn
-                if hasattr(self, "_thread") and self._thread.isAlive():
+                if hasattr(self, "_thread") and self._thread.is_alive():
                     self.shutdown()
+                self.log_latency_stats()
 
         return locals()
 
+    def _notify(self):
+        with self._pattern_changed:
+            self._pattern_changed.notify_all()
+
     def send(
         self,
         rgb=(0, 0, 0),
@@ -600,24 +1007,79 @@ class WebWinHTTPPatternGeneratorServer(TCPServer, object):
             "#%02X%02X%02X" % tuple(round(v * 255) for v in bgrgb),
             "%.4f|%.4f|%.4f|%.4f" % (x, y, w, h),
         ]
-        self.pattern = "|".join(pattern)
+        with self._pattern_changed:
+            self.pattern = "|".join(pattern)
+            self.pattern_seq += 1
+            self._sent_ts[self.pattern_seq] = perf_counter()
+            # Only keep timestamps of recent patterns (unacknowledged ones
+            # would otherwise accumulate)
+            self._sent_ts.pop(self.pattern_seq - 100, None)
+            self._pattern_changed.notify_all()
+
+    def wait_pattern(self, curpat=None, seq=None, timeout=25):
+        """
+        Wait until the pattern differs from curpat (or pattern sequence
+        number differs from seq), the server stops listening or timeout
+        (seconds) is reached. Return (sequence number, pattern).
 
-    def serve_forever(self, poll_interval=0.5):
-        """Handle one request at a time until shutdown.
+        """
 
-        Polls for shutdown every poll_interval seconds. Ignores
-        self.timeout. If you need to do periodic tasks, do them in
-        another thread.
+        def changed():
+            if not self.listening:
+                return True
+            if seq is not None:
+                return self.pattern_seq != seq
+            return self.pattern != curpat
+
+        with self._pattern_changed:
+            self._pattern_changed.wait_for(changed, timeout)
+            return self.pattern_seq, self.pattern
+
+    def ack(self, seq):
+        """Browser acknowledged painting of pattern with sequence number"""
+        with self._pattern_changed:
+            ts = self._sent_ts.pop(seq, None)
+        if ts is None:
+            return
+        latency = perf_counter() - ts
+        self.latencies.append(latency)
+        if verbose > 1:
+            safe_print(
+                "WebWinHTTPPatternGeneratorServer: Pattern %i on screen after "
+                "%.1f ms" % (seq, latency * 1000)
+            )
+
+    def log_latency_stats(self):
+        if not self.latencies:
+            return
+        latencies = sorted(self.latencies)
+        safe_print(
+            "WebWinHTTPPatternGeneratorServer: Patch-to-screen latency for "
+            "%i patterns: avg %.1f ms, median %.1f ms, max %.1f ms"
+            % (
+                len(latencies),
+                sum(latencies) / len(latencies) * 1000,
+                latencies[len(latencies) // 2] * 1000,
+                latencies[-1] * 1000,
+            )
+        )
+        self.latencies = []
+
+    def serve_forever(self, poll_interval=None):
+        """Handle requests until shutdown.
+
+        Blocks on a selector without timeout, shutdown() wakes it up.
         """
         try:
-            while self._listening.is_set():
-                # XXX: Consider using another file descriptor or
-                # connecting to the socket to wake this up instead of
-                # polling. Polling reduces our responsiveness to a
-                # shutdown request and wastes cpu at all other times.
-                r, w, e = _eintr_retry(select.select, [self], [], [], poll_interval)
-                if self in r:
-                    self._handle_request_noblock()
+            with selectors.DefaultSelector() as selector:
+                selector.register(self, selectors.EVENT_READ)
+                selector.register(self._wakeup[0], selectors.EVENT_READ)
+                while self._listening.is_set():
+                    for key, events in _eintr_retry(selector.select):
+                        if key.fileobj is self._wakeup[0]:
+                            self._wakeup[0].recv(4096)
+                        elif self._listening.is_set():
+                            self._handle_request_noblock()
         except Exception as exception:
             safe_print(
                 "Exception in WebWinHTTPPatternGeneratorServer.serve_forever:",
@@ -632,8 +1094,20 @@ class WebWinHTTPPatternGeneratorServer(TCPServer, object):
         serve_forever() is running in another thread.
         """
         self._listening.clear()
-        while self._thread.isAlive():
-            sleep(0.05)
+        self._notify()
+        try:
+            self._wakeup[1].send(b"\0")
+        except error:
+            pass
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def server_close(self):
+        TCPServer.server_close(self)
+        # TCPServer.__init__ calls server_close if binding fails, before the
+        # wakeup socket pair exists
+        for sock in getattr(self, "_wakeup", ()):
+            sock.close()
 
     def wait(self):
         self.listening = True
@@ -100,7 +100,7 @@ if sys.platform == "win32":
         pydir,
     )
     from .debughelpers import Error, UnloggedError, handle_error
-    from .edid import get_edid
+    from .edid import display_cache, get_edid
     from .meta import domain
     from .ordereddict import OrderedDict
     from .systrayicon import Menu, MenuItem, SysTrayIcon
@@ -2396,6 +2396,7 @@ class ProfileLoader(object):
 
     def _display_changed(self, event):
         safe_print(event)
+        display_cache.invalidate()
 
         threading.Thread(
             target=self._process_display_changed, name="ProcessDisplayChangedEvent"
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parallel health check (and optional repair) of ICC profile collections
+
+Profiles are checked by a pool of worker processes. Each result is written
+as one line of JSON as soon as it is available, so that arbitrarily large
+profile stores can be checked and the output can be processed while the
+scan is still running. The last line holds the summary and tag statistics
+of the whole scan.
+
+For each profile, the header and tag table are checked for consistency
+with the file (size, tag offsets and sizes, overlapping and duplicate
+tags), the profile ID (if any) is verified, and the number of bytes that
+could be recovered by optimizing the profile (storing identical tag data
+only once) is determined. With repair enabled, profiles with recoverable
+bytes or a wrong ID are rewritten optimized and with the correct ID.
+
+Usage: profilecheck.py [--repair] [--processes=N] path [...]
+
+"""
+
+import json
+import multiprocessing as mp
+import os
+import re
+import struct
+import sys
+from functools import partial
+from hashlib import md5
+
+from . import ICCProfile as ICCP
+from .log import safe_print
+from .multiprocess import cpu_count
+
+_PROFILE_RE = re.compile(r"\.ic[cm]$", re.I)
+
+
+def iter_profile_paths(paths):
+    """Yield profile files, walking directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if _PROFILE_RE.search(filename):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+
+def get_profile_id(data):
+    """Calculate the profile ID (MD5) of raw profile data"""
+    return md5(
+        data[:44]
+        + b"\0" * 4
+        + data[48:64]
+        + b"\0" * 4
+        + data[68:84]
+        + b"\0" * 16
+        + data[100:]
+    ).digest()
+
+
+def check_structure(data):
+    """
+    Check header and tag table of raw profile data
+
+    Return (errors, warnings, tags, ID status) where tags is a list of
+    dictionaries with signature, type, offset, size and whether the tag data
+    is shared with a preceding tag.
+
+    """
+    errors = []
+    warnings = []
+    tags = []
+    if len(data) < 132 or data[36:40] != b"acsp":
+        errors.append("Not an ICC profile")
+        return errors, warnings, tags, None
+    (size,) = struct.unpack(">I", data[:4])
+    if size > len(data):
+        errors.append(
+            "Profile is truncated (size %i, file size %i)" % (size, len(data))
+        )
+    elif size < len(data):
+        warnings.append("%i bytes of trailing data" % (len(data) - size))
+    data = data[:size]
+    (count,) = struct.unpack(">I", data[128:132])
+    table_end = 132 + count * 12
+    if table_end > len(data):
+        errors.append("Tag table is truncated (%i tags)" % count)
+        count = max((len(data) - 132) // 12, 0)
+        table_end = 132 + count * 12
+    extents = {}
+    seen = set()
+    for i in range(count):
+        entry = data[132 + i * 12 : 144 + i * 12]
+        sig = entry[:4].decode("ASCII", "replace")
+        offset, tag_size = struct.unpack(">II", entry[4:])
+        tag = {
+            "signature": sig,
+            "type": data[offset : offset + 4].decode("ASCII", "replace"),
+            "offset": offset,
+            "size": tag_size,
+            "shared": (offset, tag_size) in extents,
+        }
+        tags.append(tag)
+        if sig in seen:
+            warnings.append("Duplicate tag %r" % sig)
+        seen.add(sig)
+        if offset < table_end or offset + tag_size > len(data):
+            errors.append(
+                "Tag %r data out of bounds (offset %i, size %i)"
+                % (sig, offset, tag_size)
+            )
+            continue
+        if tag_size < 8:
+            errors.append("Tag %r data too small (size %i)" % (sig, tag_size))
+        elif data[offset + 4 : offset + 8] != b"\0" * 4:
+            warnings.append("Tag %r reserved bytes not zero" % sig)
+        if offset % 4:
+            warnings.append("Tag %r data not 4-byte aligned" % sig)
+        if not tag["shared"]:
+            for (other_offset, other_size), other_sig in extents.items():
+                if (
+                    offset < other_offset + other_size
+                    and other_offset < offset + tag_size
+                ):
+                    errors.append("Tag %r data overlaps %r" % (sig, other_sig))
+            extents[(offset, tag_size)] = sig
+    stored_id = data[84:100]
+    if stored_id == b"\0" * 16:
+        id_status = "missing"
+    elif len(data) == size and get_profile_id(data) == stored_id:
+        id_status = "valid"
+    else:
+        id_status = "invalid"
+        errors.append("Profile ID mismatch")
+    return errors, warnings, tags, id_status
+
+
+def check_profile(path, repair=False):
+    """
+    Check a single profile, optionally repair it
+
+    Return a dictionary suitable for JSON serialization.
+
+    """
+    result = {
+        "path": path,
+        "ok": False,
+        "errors": [],
+        "warnings": [],
+        "id": None,
+        "recoverable_bytes": None,
+        "repaired": False,
+        "tags": [],
+    }
+    try:
+        with open(path, "rb") as profile_file:
+            data = profile_file.read()
+    except EnvironmentError as exception:
+        result["errors"].append(str(exception))
+        return result
+    result["size"] = len(data)
+    errors, warnings, tags, id_status = check_structure(data)
+    result.update(errors=errors, warnings=warnings, tags=tags, id=id_status)
+    # Only profiles without structural errors are repaired
+    repair = repair and len(errors) == (id_status == "invalid")
+    if id_status is not None:
+        try:
+            profile = ICCP.ICCProfile(path)
+            result["recoverable_bytes"] = profile.optimize(
+                return_bytes_saved=True, update_ID=False
+            )
+            if repair and (result["recoverable_bytes"] or id_status == "invalid"):
+                if id_status != "missing":
+                    profile.calculateID()
+                temp_path = path + ".tmp"
+                profile.write(temp_path)
+                os.replace(temp_path, path)
+                result["repaired"] = True
+        except Exception as exception:
+            errors.append("%s: %s" % (exception.__class__.__name__, exception))
+    result["ok"] = not errors
+    return result
+
+
+def scan_profiles(paths, stream=None, processes=None, repair=False, chunksize=16):
+    """
+    Check profiles with a pool of worker processes
+
+    Write one JSON line per profile to stream (default stdout) in the
+    order the results become available, followed by a summary line.
+    Return the summary.
+
+    """
+    if stream is None:
+        stream = sys.stdout
+    if not processes:
+        processes = cpu_count()
+    summary = {
+        "profiles": 0,
+        "ok": 0,
+        "failed": 0,
+        "warnings": 0,
+        "repaired": 0,
+        "recoverable_bytes": 0,
+        "id": {},
+        "tags": {},
+    }
+    pool = mp.Pool(processes)
+    try:
+        for result in pool.imap_unordered(
+            partial(check_profile, repair=repair),
+            iter_profile_paths(paths),
+            chunksize,
+        ):
+            stream.write(json.dumps(result) + "\n")
+            stream.flush()
+            summary["profiles"] += 1
+            summary["ok" if result["ok"] else "failed"] += 1
+            summary["warnings"] += bool(result["warnings"])
+            summary["repaired"] += result["repaired"]
+            summary["recoverable_bytes"] += result["recoverable_bytes"] or 0
+            if result["id"]:
+                summary["id"][result["id"]] = summary["id"].get(result["id"], 0) + 1
+            for tag in result["tags"]:
+                stats = summary["tags"].setdefault(
+                    tag["signature"],
+                    {"count": 0, "shared": 0, "bytes": 0, "types": {}},
+                )
+                stats["count"] += 1
+                if tag["shared"]:
+                    stats["shared"] += 1
+                else:
+                    stats["bytes"] += tag["size"]
+                stats["types"][tag["type"]] = stats["types"].get(tag["type"], 0) + 1
+    finally:
+        pool.close()
+        pool.join()
+    stream.write(json.dumps({"summary": summary}) + "\n")
+    stream.flush()
+    return summary
+
+
+def main(args):
+    repair = False
+    processes = None
+    paths = []
+    for arg in args:
+        if arg == "--repair":
+            repair = True
+        elif arg.startswith("--processes="):
+            processes = int(arg.split("=", 1)[1])
+        else:
+            paths.append(arg)
+    if not paths:
+        safe_print(__doc__.strip().splitlines()[-1])
+        return 2
+    summary = scan_profiles(paths, processes=processes, repair=repair)
+    return int(bool(summary["failed"]))
+
+
+if __name__ == "__main__":
+    mp.freeze_support()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+"""
+Persistent index of installed ICC profiles
+
+The index is an SQLite database in the configuration directory which holds
+path, modification time, size and the most important header fields and
+tags of every profile in the profile search paths. It is refreshed
+incrementally (only new or changed files are parsed) and used to resolve
+bare profile filenames and to list profiles without walking and parsing
+the profile directories each time.
+
+"""
+
+import os
+import re
+import sqlite3
+import struct
+import threading
+
+from .defaultpaths import iccprofiles, iccprofiles_home
+
+try:
+    from .log import safe_print
+except ImportError:
+    from .safe_print import safe_print
+
+_SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    path TEXT PRIMARY KEY,
+    root INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    basename TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    version TEXT,
+    profile_class TEXT,
+    color_space TEXT,
+    pcs TEXT,
+    id TEXT,
+    description TEXT,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS profiles_basename_nocase
+    ON profiles (basename COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+_COLUMNS = (
+    "path",
+    "root",
+    "depth",
+    "basename",
+    "mtime",
+    "size",
+    "version",
+    "profile_class",
+    "color_space",
+    "pcs",
+    "id",
+    "description",
+    "tags",
+)
+
+_PROFILE_RE = re.compile(r"\.ic[cm]$", re.I)
+
+
+def _get_signature(data):
+    return data.decode("ASCII", "replace").strip("\0 ")
+
+
+def _get_text(tag):
+    """Return text of a textDescriptionType, multiLocalizedUnicodeType or
+    textType tag"""
+    type_sig = tag[:4]
+    if type_sig == b"desc" and len(tag) >= 12:
+        (count,) = struct.unpack(">I", tag[8:12])
+        return tag[12 : 12 + count].split(b"\0")[0].decode("ASCII", "replace")
+    elif type_sig == b"mluc" and len(tag) >= 16:
+        count, size = struct.unpack(">II", tag[8:16])
+        texts = {}
+        for i in range(count):
+            record = tag[16 + size * i : 16 + size * i + 12]
+            if len(record) < 12:
+                break
+            length, offset = struct.unpack(">II", record[4:12])
+            texts[record[:4]] = tag[offset : offset + length].decode(
+                "UTF-16-BE", "replace"
+            )
+        for locale in (b"enUS", b"enUK", b"enGB"):
+            if locale in texts:
+                return texts[locale]
+        if texts:
+            return list(texts.values())[0]
+    elif type_sig == b"text":
+        return tag[8:].split(b"\0")[0].decode("ASCII", "replace")
+    return ""
+
+
+def read_profile_info(path):
+    """
+    Read header fields, tag signatures and description of a profile file
+
+    Only the header, the tag table and the description tag are read.
+    Return None if the file is not a valid profile.
+
+    """
+    with open(path, "rb") as profile:
+        header = profile.read(132)
+        if len(header) < 132 or header[36:40] != b"acsp":
+            return None
+        (count,) = struct.unpack(">I", header[128:132])
+        table = profile.read(12 * min(count, 1024))
+        tags = {}
+        for i in range(len(table) // 12):
+            sig = table[i * 12 : i * 12 + 4]
+            tags[sig] = struct.unpack(">II", table[i * 12 + 4 : i * 12 + 12])
+        description = ""
+        if b"desc" in tags:
+            offset, size = tags[b"desc"]
+            profile.seek(offset)
+            description = _get_text(profile.read(min(size, 65536)))
+    return {
+        "version": "%i.%i" % (header[8], header[9] >> 4),
+        "profile_class": _get_signature(header[12:16]),
+        "color_space": _get_signature(header[16:20]),
+        "pcs": _get_signature(header[20:24]),
+        "id": header[84:100].hex(),
+        "description": description.strip(),
+        "tags": ",".join(sorted(_get_signature(sig) for sig in tags)),
+    }
+
+
+class ProfileIndex(object):
+
+    """
+    SQLite backed index of the profiles in 'dirs'
+
+    Directories are searched in the given order, the first match wins when
+    looking up a bare filename (like walking the directories top-down).
+
+    The modification times of the indexed directories are stored as well.
+    Lookups refresh the index incrementally: only directories whose
+    modification time changed (i.e. files were added, removed or replaced)
+    are listed again, and only new or changed files in them are parsed.
+    Profiles which are modified in place don't change the modification time
+    of their directory, call invalidate() after doing that.
+
+    """
+
+    def __init__(self, path=None, dirs=None):
+        self.path = path
+        if dirs is None:
+            dirs = iccprofiles_home + [
+                x for x in iccprofiles if x not in iccprofiles_home
+            ]
+        self.dirs = dirs
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        if self._conn:
+            return self._conn
+        if not self.path:
+            from .config import confighome
+
+            self.path = os.path.join(confighome, "profiles.sqlite")
+        if self.path != ":memory:" and not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS profiles")
+            conn.execute("DROP TABLE IF EXISTS dirs")
+            conn.execute("PRAGMA user_version = %i" % _SCHEMA_VERSION)
+        conn.executescript(_SCHEMA)
+        conn.row_factory = sqlite3.Row
+        self._conn = conn
+        return conn
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def invalidate(self):
+        """
+        Make the next refresh list all directories again
+
+        Files are still only parsed if their modification time or size
+        changed.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM dirs")
+
+    def refresh(self):
+        """
+        Add new and changed profiles to the index, remove deleted ones
+
+        Return (number of updated entries, number of removed entries).
+
+        """
+        with self._lock:
+            conn = self._connect()
+            known_dirs = {
+                row["path"]: row["mtime"]
+                for row in conn.execute("SELECT path, mtime FROM dirs")
+            }
+            subdirs = {}
+            for dirpath in known_dirs:
+                subdirs.setdefault(os.path.dirname(dirpath), []).append(dirpath)
+            known = {}
+            for row in conn.execute("SELECT path, mtime, size FROM profiles"):
+                known.setdefault(os.path.dirname(row["path"]), {})[row["path"]] = (
+                    row["mtime"],
+                    row["size"],
+                )
+            seen_dirs = {}
+            updated = []
+            removed = []
+            for root, directory in enumerate(self.dirs):
+                stack = [(os.path.normpath(directory), 0)]
+                while stack:
+                    dirpath, depth = stack.pop()
+                    if dirpath in seen_dirs:
+                        continue
+                    try:
+                        mtime = os.stat(dirpath).st_mtime
+                    except EnvironmentError:
+                        continue
+                    seen_dirs[dirpath] = mtime
+                    files = known.pop(dirpath, {})
+                    if known_dirs.get(dirpath) == mtime:
+                        # Unchanged, keep indexed files and subdirectories
+                        stack.extend(
+                            (subdir, depth + 1)
+                            for subdir in sorted(subdirs.get(dirpath, ()), reverse=True)
+                        )
+                        continue
+                    try:
+                        entries = sorted(os.scandir(dirpath), key=lambda x: x.name)
+                    except EnvironmentError:
+                        continue
+                    children = []
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            children.append((entry.path, depth + 1))
+                            continue
+                        if not _PROFILE_RE.search(entry.name):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except EnvironmentError:
+                            continue
+                        if files.pop(entry.path, None) == (stat.st_mtime, stat.st_size):
+                            continue
+                        try:
+                            info = read_profile_info(entry.path)
+                        except EnvironmentError as exception:
+                            safe_print(exception)
+                            continue
+                        if not info:
+                            continue
+                        info.update(
+                            path=entry.path,
+                            root=root,
+                            depth=depth,
+                            basename=entry.name,
+                            mtime=stat.st_mtime,
+                            size=stat.st_size,
+                        )
+                        updated.append([info[column] for column in _COLUMNS])
+                    removed.extend((path,) for path in files)
+                    stack.extend(reversed(children))
+            # Files in directories which no longer exist or are no longer
+            # searched
+            for files in known.values():
+                removed.extend((path,) for path in files)
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO profiles (%s) VALUES (%s)"
+                    % (", ".join(_COLUMNS), ", ".join("?" * len(_COLUMNS))),
+                    updated,
+                )
+                conn.executemany("DELETE FROM profiles WHERE path = ?", removed)
+                conn.executemany(
+                    "DELETE FROM dirs WHERE path = ?",
+                    [(path,) for path in known_dirs if path not in seen_dirs],
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)",
+                    [
+                        (path, mtime)
+                        for path, mtime in seen_dirs.items()
+                        if known_dirs.get(path) != mtime
+                    ],
+                )
+            return len(updated), len(removed)
+
+    def find(self, filename):
+        """
+        Return the full path of a profile given its bare filename, or None
+
+        Filenames are compared case-insensitively, exact matches are
+        preferred.
+
+        """
+        with self._lock:
+            self.refresh()
+            for row in self._connect().execute(
+                "SELECT path FROM profiles WHERE basename = ? COLLATE NOCASE "
+                "ORDER BY basename = ? DESC, root, depth, path",
+                (filename, filename),
+            ):
+                if os.path.isfile(row["path"]):
+                    return row["path"]
+
+    def query(self, **criteria):
+        """
+        Return indexed profiles (dictionaries) matching all criteria
+
+        Criteria are column names (e.g. profile_class="mntr",
+        color_space="RGB"), values may be a single value or a sequence of
+        allowed values.
+
+        """
+        where = []
+        params = []
+        for column, value in criteria.items():
+            if column not in _COLUMNS:
+                raise ValueError("Unknown profile index column: %r" % column)
+            if isinstance(value, (list, tuple, set)):
+                where.append("%s IN (%s)" % (column, ", ".join("?" * len(value))))
+                params.extend(value)
+            else:
+                where.append("%s = ?" % column)
+                params.append(value)
+        sql = "SELECT * FROM profiles"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY root, depth, path"
+        with self._lock:
+            self.refresh()
+            return [dict(row) for row in self._connect().execute(sql, params)]
+
+
+profile_index = ProfileIndex()
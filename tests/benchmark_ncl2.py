@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure parse time and memory use of a synthetic named color (ncl2) tag
+
+Usage: python tests/benchmark_ncl2.py [number of colors] [device coords]
+
+"""
+
+import os
+import struct
+import sys
+import tracemalloc
+from time import perf_counter
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(package_dir))
+for path in (package_dir, os.path.join(package_dir, "displaycal_wx")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from package.ICCProfile import NamedColor2Type  # noqa: E402
+
+
+def build_ncl2(count, deviceCoordCount=3):
+    """Return binary data of a namedColor2Type tag with 'count' colors"""
+    parts = [
+        b"ncl2",
+        b"\0" * 8,
+        struct.pack(">II", count, deviceCoordCount),
+        b"\0" * 64,
+    ]
+    for i in range(count):
+        parts.append(("Color %i" % i).encode("ASCII").ljust(32, b"\0"))
+        parts.append(
+            struct.pack(
+                ">%iH" % (3 + deviceCoordCount),
+                *[(i * (n + 1)) % 65536 for n in range(3 + deviceCoordCount)],
+            )
+        )
+    return b"".join(parts)
+
+
+def ncl2_memory_benchmark(count=10000, deviceCoordCount=3):
+    """
+    Return (parse seconds, bytes per color after parsing the tag,
+    bytes per color after also decoding all PCS and device values)
+
+    """
+    tagData = build_ncl2(count, deviceCoordCount)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        ts = perf_counter()
+        ncl2 = NamedColor2Type(tagData, "ncl2", "Lab", "RGB")
+        seconds = perf_counter() - ts
+        loaded = tracemalloc.get_traced_memory()[0] - start
+        for value in ncl2.values():
+            value.pcs
+            value.device
+        decoded = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    assert len(ncl2) == count
+    return seconds, loaded / float(count), decoded / float(count)
+
+
+def main():
+    count = int((sys.argv[1:] or [10000])[0])
+    deviceCoordCount = int((sys.argv[2:] or [3])[0])
+    seconds, loaded, decoded = ncl2_memory_benchmark(count, deviceCoordCount)
+    print("Named colors: %i" % count)
+    print("Parse time: %.3f s" % seconds)
+    print("Memory per color: %.0f bytes (%.0f bytes decoded)" % (loaded, decoded))
+
+
+if __name__ == "__main__":
+    main()
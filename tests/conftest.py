@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+# Modules of the package use absolute imports for the bundled utils and wx
+# modules. Append (not prepend), so that package modules named like standard
+# library modules (e.g. tempfile, subprocess) don't shadow them.
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (package_dir, os.path.join(package_dir, "displaycal_wx")):
+    if path not in sys.path:
+        sys.path.append(path)
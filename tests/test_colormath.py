@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from package import colormath
+
+
+def _rosenbrock(fdata, p):
+    return (1.0 - p[0]) ** 2 + 100.0 * (p[1] - p[0] ** 2) ** 2
+
+
+def _quadratic(fdata, p):
+    return sum((p[i] - target) ** 2 for i, target in enumerate(fdata))
+
+
+def _minimize(backend, di, start, func, fdata):
+    backend_orig = colormath.powell_backend
+    colormath.powell_backend = backend
+    try:
+        cp = list(start)
+        success = colormath.powell(di, cp, [0.1] * di, 1e-10, 1000, func, fdata)
+    finally:
+        colormath.powell_backend = backend_orig
+    return success, cp
+
+
+@pytest.mark.parametrize(
+    "di,start,func,fdata",
+    [
+        (2, (-1.2, 1.0), _rosenbrock, None),
+        (3, (0.0, 0.0, 0.0), _quadratic, (0.25, -2.0, 3.5)),
+    ],
+)
+def test_powell_fast_matches_argyll(di, start, func, fdata):
+    success_argyll, cp_argyll = _minimize("argyll", di, start, func, fdata)
+    success_fast, cp_fast = _minimize("fast", di, start, func, fdata)
+    assert success_argyll and success_fast
+    assert cp_fast == pytest.approx(cp_argyll, abs=1e-4)
+
+
+@pytest.mark.parametrize("egamma,off", [(2.2, 0.0), (2.4, 0.001), (2.2, 0.02)])
+def test_xicc_tech_gamma_backends(egamma, off):
+    backend_orig = colormath.powell_backend
+    try:
+        results = []
+        for backend in ("argyll", "fast"):
+            colormath.powell_backend = backend
+            results.append(colormath.xicc_tech_gamma(egamma, off))
+    finally:
+        colormath.powell_backend = backend_orig
+    assert results[1] == pytest.approx(results[0], abs=1e-6)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from package import ICCProfile as ICCP
+from package import colormath
+
+
+def _apply_bpc_per_entry(values, black_Y_out=0):
+    """Unweighted black point compensation, one entry at a time"""
+    D50_xyY = colormath.XYZ2xyY(*colormath.get_whitepoint("D50"))
+    bp_in = colormath.xyY2XYZ(D50_xyY[0], D50_xyY[1], values[0] / 65535.0)
+    bp_out = colormath.xyY2XYZ(D50_xyY[0], D50_xyY[1], black_Y_out)
+    wp_out = colormath.xyY2XYZ(D50_xyY[0], D50_xyY[1], values[-1] / 65535.0)
+    result = []
+    for v in values:
+        X, Y, Z = colormath.xyY2XYZ(D50_xyY[0], D50_xyY[1], v / 65535.0)
+        result.append(
+            colormath.apply_bpc(X, Y, Z, bp_in, bp_out, wp_out)[1] * 65535.0
+        )
+    return result
+
+
+def test_apply_bpc_unweighted_matches_per_entry():
+    for black_Y_out in (0, 0.001):
+        trc = ICCP.CurveType()
+        trc.set_trc(1.8, 1024)
+        trc[:] = [v * 0.998 + 0.002 * 65535 for v in trc]
+        expected = _apply_bpc_per_entry(list(trc), black_Y_out)
+        trc.apply_bpc(black_Y_out)
+        assert list(trc) == expected
+        assert trc[-1] == 65535.0
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from package import argyll_events
+from package.displayresponse import SettleTimeRecorder
+
+
+def test_settle_time_recorder_events():
+    recorder = SettleTimeRecorder([[0, 0, 0], [100, 100, 100], [50, 50, 50]])
+    parser = argyll_events.ArgyllOutputParser()
+    parser.subscribe(argyll_events.PATCH, recorder.on_event)
+    for number in (1, 2, 3, 3):
+        parser.feed("\rPatch %i of 3 " % number)
+    assert sorted(recorder.timestamps) == [1, 2, 3]
+    recorder.on_event(argyll_events.ArgyllEvent(argyll_events.PATCH, (4, 3), ""))
+    recorder.on_event(argyll_events.ArgyllEvent(argyll_events.READING, (1, 1, 1), ""))
+    assert sorted(recorder.timestamps) == [1, 2, 3]
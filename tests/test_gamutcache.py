@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import os
+from hashlib import md5
+
+from package.gamutcache import GamutSampleCache
+
+
+class _Profile(object):
+
+    ID = b"\1" * 16
+
+    def __init__(self, data):
+        self.data = data
+
+    def calculateID(self, setID=True):
+        return md5(self.data).digest()
+
+
+def test_key_follows_profile_changes():
+    profile = _Profile(b"data")
+    key = GamutSampleCache.get_key(profile, "r", "f", "n", 64)
+    # Changed in memory, the stored ID is now stale
+    profile.data = b"changed"
+    assert GamutSampleCache.get_key(profile, "r", "f", "n", 64) != key
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    samples = [[0.5, 0.5, 0.5]] * 64
+    cache = GamutSampleCache(cachedir=str(tmp_path), maxdiskbytes=4096)
+    for i in range(8):
+        cache.put("key%i" % i, samples)
+        os.utime(str(tmp_path / ("key%i.json" % i)), (i, i))
+    nbytes = sum(os.path.getsize(str(path)) for path in tmp_path.iterdir())
+    assert nbytes <= 4096
+    assert (tmp_path / "key7.json").exists()
+    assert not (tmp_path / "key0.json").exists()
+    # Accessing an entry from disk marks it as recently used
+    cache.clear()
+    assert cache.get("key7") == samples
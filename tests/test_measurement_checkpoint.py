@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from package import argyll_events
+from package.measurement_checkpoint import MeasurementCheckpoint
+
+TI1 = """CTI1
+
+KEYWORD "COLOR_REP"
+COLOR_REP "RGB"
+
+NUMBER_OF_FIELDS 7
+BEGIN_DATA_FORMAT
+SAMPLE_ID RGB_R RGB_G RGB_B XYZ_X XYZ_Y XYZ_Z
+END_DATA_FORMAT
+
+NUMBER_OF_SETS 4
+BEGIN_DATA
+1 100.0000 100.0000 100.0000 95.0500 100.0000 108.9000
+2 0.0000 0.0000 0.0000 0.0000 0.0000 0.0000
+3 100.0000 0.0000 0.0000 41.2400 21.2600 1.9300
+4 0.0000 100.0000 0.0000 35.7600 71.5200 11.9200
+END_DATA
+"""
+
+# dispread -v: progress only
+DISPREAD_LOG = """Setting up the instrument
+Place instrument on test window.
+Hit Esc or Q to give up, any other key to continue:
+\rPatch 1 of 4 \rPatch 2 of 4 \rPatch 3 of 4 \rPatch 4 of 4
+The instrument can be removed from the screen.
+"""
+
+# Output which reports a reading after each patch
+READINGS_LOG = """Number of patches = 4
+Patch 1 of 4
+ Result is XYZ: 120.000000 126.000000 137.000000
+Patch 2 of 4
+ Result is XYZ: 0.100000 0.110000 0.120000
+Patch 3 of 4
+ Result is XYZ: 52.000000 27.000000 2.500000
+"""
+
+
+def replay(checkpoint, log):
+    parser = argyll_events.ArgyllOutputParser()
+    for event_type in (argyll_events.PATCH, argyll_events.READING):
+        parser.subscribe(event_type, checkpoint.on_event)
+    # Feed line by line like the worker receives output
+    for line in log.splitlines(True):
+        parser.feed(line)
+    checkpoint.close()
+
+
+def test_dispread_progress_only(tmp_path):
+    ti1 = tmp_path / "chart.ti1"
+    ti1.write_text(TI1)
+    path = tmp_path / "chart.ckpt"
+    checkpoint = MeasurementCheckpoint(str(ti1), path=str(path))
+    checkpoint.load()
+    replay(checkpoint, DISPREAD_LOG)
+    assert checkpoint.patches_reported == 4
+    assert checkpoint.readings_reported == 0
+    assert not checkpoint.readings
+    # No checkpoint file which could never fill
+    assert not path.exists()
+
+
+def test_readings_are_checkpointed_and_resumed(tmp_path):
+    ti1 = tmp_path / "chart.ti1"
+    ti1.write_text(TI1)
+    path = tmp_path / "chart.ckpt"
+    checkpoint = MeasurementCheckpoint(str(ti1), path=str(path))
+    checkpoint.load()
+    replay(checkpoint, READINGS_LOG)
+    assert checkpoint.readings_reported == 3
+    assert checkpoint.readings[2] == [52.0, 27.0, 2.5]
+
+    resumed = MeasurementCheckpoint(str(ti1), path=str(path))
+    assert sorted(resumed.load()) == [0, 1, 2]
+    assert resumed.unmeasured() == [3]
+    # White and black are measured again
+    assert resumed.write_resume_ti1(str(tmp_path / "resume.ti1")) == 3
+    assert resumed.index_map == [0, 1, 3]
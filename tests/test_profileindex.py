@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+
+from package.profileindex import ProfileIndex
+
+REF = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ref"
+)
+
+
+def test_refresh_is_incremental(tmp_path):
+    subdir = tmp_path / "sub"
+    subdir.mkdir()
+    shutil.copy(os.path.join(REF, "ACES.icm"), str(subdir / "A.icm"))
+    index = ProfileIndex(":memory:", [str(tmp_path)])
+    assert index.refresh() == (1, 0)
+    # Unchanged directories are not listed again
+    assert index.refresh() == (0, 0)
+    assert index.find("a.icm") == str(subdir / "A.icm")
+
+    shutil.copy(os.path.join(REF, "ACEScg.icm"), str(subdir / "B.icm"))
+    assert index.find("B.icm") == str(subdir / "B.icm")
+
+    os.remove(str(subdir / "A.icm"))
+    assert index.find("A.icm") is None
+
+    shutil.rmtree(str(subdir))
+    assert index.query() == []
+
+
+def test_invalidate(tmp_path):
+    shutil.copy(os.path.join(REF, "ACES.icm"), str(tmp_path / "A.icm"))
+    index = ProfileIndex(":memory:", [str(tmp_path)])
+    index.refresh()
+    index.invalidate()
+    # Directories are listed again, but unchanged files are not parsed
+    assert index.refresh() == (0, 0)
+    assert len(index.query()) == 1
@@ -8,7 +8,6 @@ Re-implementation of Argyll's webwin in pure python.
 import http.server
 import shutil
 import threading
-import time
 from io import StringIO
 from urllib.parse import unquote
 
@@ -62,20 +61,21 @@ var cpat = ["#000"];
 var oXHR;
 var pat;
 
-function XHR_request() {
-	oXHR.open("GET", "/ajax/messages?" + encodeURIComponent(cpat.join("|") + "|" + Math.random()), true);
-	oXHR.onreadystatechange = XHR_response;
-	oXHR.send();
-}
-
-function XHR_response() {
-	if (oXHR.readyState != 4)
+function ack(seq) {
+	// Acknowledge pattern after it has been painted (the callback of the
+	// second animation frame runs after the frame with the change)
+	if (!seq || !window.requestAnimationFrame)
 		return;
+	window.requestAnimationFrame(function () {
+		window.requestAnimationFrame(function () {
+			var oAckXHR = new XMLHttpRequest();
+			oAckXHR.open("GET", "/ajax/ack?" + seq, true);
+			oAckXHR.send();
+		});
+	});
+}
 
-	if (oXHR.status != 200) {
-		return;
-	}
-	var rt = oXHR.responseText;
+function set_pattern(rt, seq) {
 	if (rt.charAt(0) == '\r' && rt.charAt(1) == '\n')
 		rt = rt.slice(2);
 	rt = rt.split("|")
@@ -89,15 +89,42 @@ function XHR_response() {
 			pat.style.width = (rt[4] * 100) + "%";
 			pat.style.height = (rt[5] * 100) + "%";
 		}
+		ack(seq);
 	}
-	setTimeout(XHR_request, 50);
+}
+
+function XHR_request() {
+	oXHR.open("GET", "/ajax/messages?" + encodeURIComponent(cpat.join("|") + "|" + Math.random()), true);
+	oXHR.onreadystatechange = XHR_response;
+	oXHR.send();
+}
+
+function XHR_response() {
+	if (oXHR.readyState != 4)
+		return;
+
+	if (oXHR.status != 200) {
+		return;
+	}
+	set_pattern(oXHR.responseText, oXHR.getResponseHeader("X-Pattern-Seq"));
+	// The server holds the request until the pattern changes (long-poll)
+	XHR_request();
 }
 
 window.onload = function() {
 	pat = document.getElementById("pattern");
 
-	oXHR = new XMLHttpRequest();
-	XHR_request();
+	if (window.EventSource) {
+		// Pattern changes are pushed by the server
+		var source = new EventSource("/events");
+		source.onmessage = function (e) {
+			set_pattern(e.data, e.lastEventId);
+		};
+	}
+	else {
+		oXHR = new XMLHttpRequest();
+		XHR_request();
+	}
 };
 """
 
@@ -115,7 +142,7 @@ class WebWinHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
         """Serve a GET request."""
         s = self.send_head()
         if s:
-            self.wfile.write(s)
+            self.wfile.write(s.encode("UTF-8"))
 
     def do_HEAD(self):
         """Serve a HEAD request."""
@@ -134,6 +161,7 @@ class WebWinHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
         None, in which case the caller has nothing further to do.
 
         """
+        seq = None
         if self.path == "/":
             s = WEBDISP_HTML
             ctype = "text/html; charset=UTF-8"
@@ -141,14 +169,24 @@ class WebWinHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             s = WEBDISP_JS
             ctype = "application/javascript"
         elif self.path.startswith("/ajax/messages?"):
+            # Long-poll: Hold the request until the pattern changes
             curpat = "|".join(unquote(self.path.split("?").pop()).split("|")[:6])
-            while (
-                self.server.patterngenerator.listening
-                and self.server.patterngenerator.pattern == curpat
-            ):
-                time.sleep(0.05)
-            s = self.server.patterngenerator.pattern
+            seq, s = self.server.patterngenerator.wait_pattern(curpat)
             ctype = "text/plain; charset=UTF-8"
+        elif self.path.startswith("/ajax/ack?"):
+            try:
+                seq = int(self.path.split("?").pop())
+            except ValueError:
+                self.send_error(400)
+                return
+            self.server.patterngenerator.ack(seq)
+            self.send_response(204)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+        elif self.path == "/events":
+            self.send_events()
+            return
         else:
             self.send_error(404)
             return
@@ -157,7 +195,35 @@ class WebWinHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
                 self.send_response(200)
                 self.send_header("Cache-Control", "no-cache")
                 self.send_header("Content-Type", ctype)
+                if seq is not None:
+                    self.send_header("X-Pattern-Seq", str(seq))
                 self.end_headers()
                 return s
             except:
                 pass
+
+    def send_events(self):
+        """Push pattern changes as Server-Sent Events until disconnect"""
+        patterngenerator = self.server.patterngenerator
+        self.send_response(200)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Type", "text/event-stream; charset=UTF-8")
+        self.end_headers()
+        seq = None
+        try:
+            while patterngenerator.listening:
+                newseq, pattern = patterngenerator.wait_pattern(seq=seq, timeout=15)
+                if not patterngenerator.listening:
+                    break
+                if newseq == seq:
+                    # Keep connection alive
+                    self.wfile.write(b": \n\n")
+                else:
+                    seq = newseq
+                    self.wfile.write(
+                        ("id: %i\ndata: %s\n\n" % (seq, pattern)).encode("UTF-8")
+                    )
+                self.wfile.flush()
+        except (EnvironmentError, ValueError):
+            # Client disconnected
+            pass
@@ -68,9 +68,9 @@ from utils.util_list import intlist, natsort
 
 from . import CGATS
 from . import ICCProfile as ICCP
-from . import audio, colormath, config, defaultpaths, imfile
+from . import argyll_events, audio, colormath, config, defaultpaths, imfile
 from . import localization as lang
-from . import madvr, wexpect
+from . import wexpect
 from .argyll_cgats import (add_dispcal_options_to_cal, add_options_to_ti3,
                            cal_to_fake_profile, cal_to_vcgt,
                            extract_cal_from_profile, extract_cal_from_ti3,
@@ -84,6 +84,7 @@ from .argyll_names import names as argyll_names
 from .argyll_names import observers
 from .argyll_names import optional as argyll_optional
 from .argyll_names import viewconds
+from .argyllcache import argyll_capabilities
 from .colormath import VidRGB_to_eeColor, eeColor_to_VidRGB
 from .config import (appbasename, autostart, autostart_home, defaults, enc,
                      exe, exe_ext, exedir, fs_enc, get_data_path,
@@ -96,8 +97,13 @@ from .debughelpers import (DownloadError, Error, Info, UnloggedError,
                            handle_error)
 from .defaultpaths import (appdata, cache, get_known_folder_path,
                            iccprofiles_display_home, iccprofiles_home)
-from .edid import WMIError, get_edid
+from .displayresponse import (REFERENCE_FALL_TIME, REFERENCE_RISE_TIME,
+                              DisplayResponseDB, DisplayResponseModel,
+                              SettleTimeRecorder)
+from .edid import WMIError, display_cache, get_edid
+from .lazyimport import lazy_import
 from .log import DummyLogger, LogFile, get_file_logger, log, safe_print
+from .measurement_checkpoint import MeasurementCheckpoint
 from .meta import VERSION, VERSION_BASE, domain
 from .meta import name as appname
 from .meta import version
@@ -106,8 +112,11 @@ from .network import LoggingHTTPRedirectHandler, NoHTTPRedirectHandler
 from .options import (always_fail_download, debug, eecolor65, experimental,
                       test, test_badssl, test_require_sensor_cal, verbose)
 from .ordereddict import OrderedDict
+from .patchdispatch import PatchDispatcher
 from .patterngenerators import (PrismaPatternGeneratorClient,
+                                ResolveCMMultiClientPatternGeneratorServer,
                                 ResolveCMPatternGeneratorServer,
+                                ResolveLSMultiClientPatternGeneratorServer,
                                 ResolveLSPatternGeneratorServer,
                                 WebWinHTTPPatternGeneratorServer)
 from .trash import trash
@@ -171,6 +180,9 @@ if sys.platform not in ("darwin", "win32"):
 		warnings.warn(safe_str(exception, enc), Warning)
 import wx.lib.delayedresult as delayedresult
 
+# Only needed when madVR is used, import on first use
+madvr = lazy_import(".madvr", __package__)
+
 INST_CAL_MSGS = ["Do a reflective white calibration",
 				 "Do a transmissive white calibration",
 				 "Do a transmissive dark calibration",
@@ -1515,6 +1527,17 @@ class FilteredStream():
 		if prestrip is not None:
 			self.prestrip = prestrip
 		self._buffer = ""
+		# Compile once, so each line is checked against all triggers in a
+		# single case-insensitive search
+		self._discard_re = re.compile(self.discard)
+		if self.triggers:
+			self._triggers_re = re.compile("|".join(re.escape(trigger) for
+													trigger in self.triggers),
+										   re.I)
+		else:
+			self._triggers_re = None
+		self._substitutions = [(re.compile(search), sub) for search, sub in
+							   self.substitutions.items()]
 	
 	def __getattr__(self, name):
 		return getattr(self.stream, name)
@@ -1539,18 +1562,13 @@ class FilteredStream():
 			data = re.sub(self.prestrip, "", data)
 		lines = []
 		for line in data.split(self.linesep_in):
-			if line and not re.sub(self.discard, "", line):
+			if line and not self._discard_re.sub("", line):
 				line = ""
-			write = True
-			for trigger in self.triggers:
-				if trigger.lower() in line.lower():
-					write = False
-					break
-			if write:
+			if not self._triggers_re or not self._triggers_re.search(line):
 				if self.data_encoding and not isinstance(line, str):
 					line = line.decode(self.data_encoding, self.errors)
-				for search, sub in self.substitutions.items():
-					line = re.sub(search, sub, line)
+				for search, sub in self._substitutions:
+					line = search.sub(sub, line)
 				if self.file_encoding:
 					line = line.encode(self.file_encoding, self.errors)
 				lines.append(line)
@@ -1932,6 +1950,14 @@ class Worker(WorkerBase):
 		self.sudo = None
 		self.auth_timestamp = 0
 		self.sessionlogfiles = {}
+		self.measurement_checkpoint = None
+		self.argyll_output_parser = argyll_events.ArgyllOutputParser()
+		for event_type in (argyll_events.PATCH, argyll_events.READING):
+			self.argyll_output_parser.subscribe(event_type,
+												self._dispatch_measurement_event)
+		self.patch_dispatcher = None
+		self.predicted_settle_time_mult = None
+		self.settle_time_recorder = None
 		self.triggers = ["Password:"]
 		self.recent = FilteredStream(LineCache(maxlines=3), self.pty_encoding, 
 									 discard=self.recent_discard,
@@ -4143,8 +4169,7 @@ END_DATA
 											   ("collink.version", collink_version_string),
 											   ("encoding.input", input_encoding),
 											   ("encoding.output", output_encoding)])
-				profile_link.calculateID()
-				profile_link.write(filename + profile_ext)
+				profile_link.write(filename + profile_ext, update_ID=True)
 				profile_link.tags.A2B0.clut_writepng(filename + ".A2B0.CLUT.png")
 				del profile_link
 
@@ -4596,11 +4621,23 @@ END_DATA
 			if (argyll_bin_dir != self.argyll_bin_dir):
 				self.argyll_bin_dir = argyll_bin_dir
 				safe_print(self.argyll_bin_dir)
-			result = self.exec_cmd(cmd, args, capture_output=True, 
-								   skip_scripts=True, silent=True, 
-								   log_output=False)
-			if isinstance(result, Exception):
-				safe_print(result)
+			# Displays (but not instruments) can be enumerated from cache
+			# as long as the display configuration didn't change
+			cache_key = ("enumerate", cmd, tuple(args))
+			output = None
+			if not enumerate_ports and display_cache.check():
+				output = display_cache.get(cache_key)
+			if output is not None:
+				self.output = list(output)
+			else:
+				result = self.exec_cmd(cmd, args, capture_output=True, 
+									   skip_scripts=True, silent=True, 
+									   log_output=False)
+				if isinstance(result, Exception):
+					safe_print(result)
+				elif result is not None and self.output and not enumerate_ports:
+					# Argyll exits with non-zero status after showing usage
+					display_cache.set(cache_key, list(self.output))
 			arg = None
 			defaults["calibration.black_point_hack"] = 0
 			defaults["calibration.black_point_rate.enabled"] = 0
@@ -4625,6 +4662,8 @@ END_DATA
 													 + 8:]
 						if (argyll_version_string != self.argyll_version_string):
 							self.set_argyll_version_from_string(argyll_version_string)
+						argyll_capabilities.set(cmd, "version",
+												argyll_version_string)
 						safe_print("ArgyllCMS " + self.argyll_version_string)
 						config.defaults["copyright"] = ("No copyright. Created "
 														"with %s %s and Argyll"
@@ -4984,9 +5023,36 @@ END_DATA
 				# Untethered
 				lut_access.append(False)
 				self.lut_access = lut_access
+			display_cache.set_displays([{"name": name,
+										 "description": description,
+										 "manufacturer": manufacturer,
+										 "edid": edid}
+										for name, description, manufacturer,
+											edid in zip(self.display_names,
+														self.displays,
+														self.display_manufacturers,
+														self.display_edid)])
 		elif silent or not check_argyll_bin():
 			self.clear_argyll_info()
 
+	def get_displays(self):
+		"""
+		Return a snapshot of the available displays (list of dicts with
+		name, description, manufacturer and parsed EDID).
+		
+		Displays are only re-enumerated if the display configuration
+		changed since they were last enumerated.
+		
+		"""
+		display_cache.check()
+		displays = display_cache.get_displays()
+		if displays is None:
+			self.enumerate_displays_and_ports(silent=True,
+											  check_lut_access=False,
+											  enumerate_ports=False)
+			displays = display_cache.get_displays()
+		return displays or []
+
 	def exec_cmd(self, cmd, args=[], capture_output=False, 
 				 display_output=False, low_contrast=True, skip_scripts=False, 
 				 silent=False, parent=None, asroot=False, log_output=True,
@@ -5185,10 +5251,10 @@ END_DATA
 					"data": [list(range(0, 256)), list(range(0, 256)), list(range(0, 256))]
 				})
 				srgb.setDescription(appname + " Linear Calibration sRGB Profile")
-				srgb.calculateID()
 				srgb.write(os.path.join(self.tempdir,
 										appname +
-										" Linear Calibration sRGB Profile.icc"))
+										" Linear Calibration sRGB Profile.icc"),
+						   update_ID=True)
 				cdinstall = self._attempt_install_profile_colord(srgb)
 				if not cdinstall:
 					return Error(lang.getstr("calibration.reset_error"))
@@ -5830,7 +5896,14 @@ while 1:
 									  ("DISPLAY_SETTLE_TIME_MULT", [1, 7])):
 					backup = os.getenv("ARGYLL_%s_BACKUP" % name)
 					value = None
-					if (getcfg("measure.override_%s" % name.lower()) and
+					if getcfg("measure.override_%s" % name.lower()):
+						override = getcfg("measure.%s" % name.lower())
+					elif name == "DISPLAY_SETTLE_TIME_MULT":
+						# Adaptive settle time (if enabled and available)
+						override = self.predicted_settle_time_mult
+					else:
+						override = None
+					if (override is not None and
 						self.argyll_version >= version):
 						if backup is None:
 							# Backup current value if any
@@ -5842,7 +5915,7 @@ while 1:
 							self.log("%s: Overriding ARGYLL_%s %s" %
 									   (appname, name, current))
 						# Override
-						value = str(getcfg("measure.%s" % name.lower()))
+						value = str(override)
 						self.log("%s: Setting ARGYLL_%s %s" % (appname,
 																 name, value))
 					elif backup is not None:
@@ -6124,6 +6197,7 @@ while 1:
 				   self.retcode == 0:
 					self.retcode = -1
 				self.subprocess = None
+				self.stop_patch_dispatcher()
 				tries -= 1
 				if not silent and stderr:
 					stderr.seek(0)
@@ -7338,7 +7412,8 @@ while 1:
 		itable = profile.tags.get("B2A%i" % tableno)
 		if not itable:
 			return False
-		itable.smooth2(diagpng, profile.connectionColorSpace, filename, logfile)
+		itable.smooth2(diagpng, profile.connectionColorSpace, filename, logfile,
+					   use_numpy=bool(getcfg("profile.b2a.hires.smooth.use_numpy")))
 		return True
 	
 	def get_device_id(self, quirk=False, use_serial_32=True,
@@ -7604,8 +7679,16 @@ while 1:
 		if instrument_id:
 			measurement_modes = self.measurement_modes.get(instrument_id,
 														   OrderedDict())
+			spotread = get_argyll_util("spotread")
+			if not measurement_modes and skip_ccxx_modes and not test:
+				# Modes supplied via CCMX/CCSS depend on installed files and
+				# can't be cached, all others only depend on the executable
+				measurement_modes = OrderedDict(argyll_capabilities.get(
+					spotread, "measurement_modes." + instrument_id, []))
+				if measurement_modes:
+					self.measurement_modes[instrument_id] = measurement_modes
 			if not measurement_modes:
-				result = self.exec_cmd(get_argyll_util("spotread"), ["-?"],
+				result = self.exec_cmd(spotread, ["-?"],
 									   capture_output=True, skip_scripts=True,
 									   silent=True, log_output=False)
 				if isinstance(result, Exception):
@@ -7706,6 +7789,10 @@ usage: spotread [-options] [logfile]
 							desc = re.sub(r"\s*(?:File|\[[^\]]*\])", "", desc)
 							measurement_modes[measurement_mode] = desc
 				self.measurement_modes[instrument_id] = measurement_modes
+				if measurement_modes and skip_ccxx_modes and not test:
+					argyll_capabilities.set(spotread,
+											"measurement_modes." + instrument_id,
+											list(measurement_modes.items()))
 			return measurement_modes
 		return {}
 	
@@ -7763,7 +7850,12 @@ usage: spotread [-options] [logfile]
 								("r", "DPL Projector RGBW Filter Wheel"),
 								("s", "DLP Projector RGBCMY Filter Wheel"),
 								("u", "Unknown")])
-		result = self.exec_cmd(get_argyll_util("ccxxmake"), ["-??"],
+		ccxxmake = get_argyll_util("ccxxmake")
+		technology_strings = argyll_capabilities.get(ccxxmake,
+													 "technology_strings")
+		if technology_strings:
+			return OrderedDict(technology_strings)
+		result = self.exec_cmd(ccxxmake, ["-??"],
 							   capture_output=True, skip_scripts=True,
 							   silent=True, log_output=False)
 		if isinstance(result, Exception):
@@ -7784,6 +7876,9 @@ usage: spotread [-options] [logfile]
 					in_tech = False
 				if in_tech and parts:
 					technology_strings[arg] = parts[0]
+		if technology_strings:
+			argyll_capabilities.set(ccxxmake, "technology_strings",
+									list(technology_strings.items()))
 		return technology_strings
 	
 	def has_lut_access(self):
@@ -10016,19 +10111,16 @@ usage: spotread [-options] [logfile]
 		# Interpolate to higher cLUT resolution
 		quality = getcfg("profile.quality")
 		clutres = {"m": 17, "l": 9}.get(quality, clutres)
-		# XXX: Need to implement proper 3D interpolation
 
 		if clutres > iclutres:
+			from .clutinterp import grid_coords
 
-			# Lookup input RGB to interpolated XYZ
-			RGB_in = []
+			# Lookup input RGB to interpolated XYZ (in-process, through
+			# input curves and cLUT of the initial A2B0). Result is
+			# already adapted to D50, range 0..1
 			step = 100 / (clutres - 1.0)
-			for a in range(clutres):
-				for b in range(clutres):
-					for c in range(clutres):
-						RGB_in.append([a * step, b * step, c * step])
-			XYZ_out = self.xicclu(profile, RGB_in, "a", pcs="X", scale=100)
-			profile.fileName = None
+			XYZ_out = (profile.tags.A2B0.lookup(grid_coords(clutres)) *
+					   (65535 / 32768.0)).tolist()
 
 			# Create new cLUT
 			clut = []
@@ -10051,12 +10143,12 @@ usage: spotread [-options] [logfile]
 							# (already black scaled)
 							if a == b == c:
 								XYZ = get_XYZ_from_curves(a, clutres - 1)
-								# Range 0..1
-								clut[-1].append(XYZ)
-								continue
 							else:
 								XYZ = XYZ_out[i]
-							interpolated += 1
+								interpolated += 1
+							# Range 0..1
+							clut[-1].append(XYZ)
+							continue
 						else:
 							actual += 1
 						X, Y, Z = (v / 100.0 for v in XYZ)
@@ -10501,10 +10593,9 @@ usage: spotread [-options] [logfile]
 					else:
 						self.log("Warning - no scaling applied - no "
 								 "calibration data!")
-		# Calculate profile ID
-		profile.calculateID()
 		try:
-			profile.write()
+			# Calculate profile ID while writing
+			profile.write(update_ID=True)
 		except Exception as exception:
 			return exception
 		return True
@@ -10879,7 +10970,12 @@ usage: spotread [-options] [logfile]
 					return result
 			else:
 				args2 = args
+				if getcfg("measure.checkpoint"):
+					self.prepare_measurement_checkpoint(args[-1], args[:-1])
+				self.prepare_settle_time_recording(args[-1])
 			result = self.exec_cmd(cmd, args2)
+			if self.measurement_checkpoint:
+				result = self.finish_measurement_checkpoint(args[-1], result)
 			if not isinstance(result, Exception) and result:
 				self.update_display_name_manufacturer(args[-1] + ".ti3")
 				ti3 = args[-1] + ".ti3"
@@ -10909,6 +11005,8 @@ usage: spotread [-options] [logfile]
 					elif black_white and black_white != (0, 255):
 						ti3[1].add_keyword("OUTPUT_ENCODING",
 										   " ".join(str(v) for v in black_white))
+				if self.settle_time_recorder:
+					self.finish_settle_time_recording(args[-1], ti3)
 				ti3.write()
 				# Restore original TI1
 				ti1_orig = args[-1] + ".original.ti1"
@@ -10935,6 +11033,9 @@ usage: spotread [-options] [logfile]
 					ti1.write()
 		else:
 			result = cmd
+		self.settle_time_recorder = None
+		# Only reset after the TI3 (which records it) has been written
+		self.predicted_settle_time_mult = None
 		result2 = self.wrapup(not isinstance(result, UnloggedInfo) and result,
 							  isinstance(result, Exception) or not result)
 		if isinstance(result2, Exception):
@@ -10945,6 +11046,178 @@ usage: spotread [-options] [logfile]
 				result = result2
 		return result
 
+	def get_display_response_db(self):
+		return DisplayResponseDB(os.path.join(config.confighome,
+											  "display_response.json"))
+
+	def get_display_response_model(self):
+		"""
+		Return the display response model fitted to previous measurements of
+		the current display, or None
+		
+		"""
+		if getcfg("measure.adaptive_settle_time"):
+			return self.get_display_response_db().get(config.get_display_name())
+
+	def prepare_settle_time_recording(self, basename):
+		"""
+		Start recording patch timing for the TI1 file basename + ".ti1"
+		
+		Only done if adaptive settle time is enabled. If a display response
+		model was fitted to previous measurements of the current display, the
+		display settle time multiplier is derived from it (unless overridden).
+		
+		"""
+		if not getcfg("measure.adaptive_settle_time"):
+			return
+		try:
+			ti1 = CGATS.CGATS(basename + ".ti1")
+			data, valueslist = ti1[0].get_RGB_XYZ_values()
+		except Exception as exception:
+			self.log("Warning - could not read TI1 file %s.ti1:" %
+					 safe_unicode(basename), exception)
+			return
+		self.settle_time_recorder = SettleTimeRecorder(valueslist)
+		model = self.get_display_response_model()
+		if model and not getcfg("measure.override_display_settle_time_mult"):
+			# The reference rise and fall times stand for the display response
+			# Argyll's own settle time estimate assumes (multiplier 1.0).
+			# Settle times are proportional to the rise and fall time
+			# constants, but Argyll scales both with a single multiplier, so
+			# use the larger ratio to allow enough settle time for rising as
+			# well as falling transitions.
+			mult = max(model.rise / REFERENCE_RISE_TIME,
+					   model.fall / REFERENCE_FALL_TIME)
+			min_val, max_val = config.valid_ranges["measure.display_settle_time_mult"]
+			self.predicted_settle_time_mult = round(min(max(mult, min_val),
+														max_val), 4)
+			self.log("Adaptive settle time: rise %.3f s, fall %.3f s, "
+					 "display settle time multiplier %s, estimated total "
+					 "settle time %.1f s" %
+					 (model.rise, model.fall, self.predicted_settle_time_mult,
+					  model.sequence_time(valueslist) - model.latency *
+					  len(valueslist)))
+
+	def finish_settle_time_recording(self, basename, ti3):
+		"""
+		Fit the display response model to the recorded patch timing,
+		update the per-display database and add timing metadata to the TI3.
+		
+		"""
+		recorder = self.settle_time_recorder
+		self.settle_time_recorder = None
+		transitions = recorder.transitions()
+		model = DisplayResponseModel.fit(transitions)
+		if not model:
+			return
+		self.log("Measured %i patches in %.1f s, fitted display response: "
+				 "rise %.3f s, fall %.3f s, overhead %.3f s per patch" %
+				 (len(recorder.timestamps), recorder.total, model.rise,
+				  model.fall, model.latency))
+		ti3[0].add_keyword("DISPLAY_RISE_TIME", "%.4f" % model.rise)
+		ti3[0].add_keyword("DISPLAY_FALL_TIME", "%.4f" % model.fall)
+		ti3[0].add_keyword("PATCH_OVERHEAD_TIME", "%.4f" % model.latency)
+		ti3[0].add_keyword("PATCH_DURATIONS_MS",
+						   " ".join("%i:%i" % (number, seconds * 1000)
+									for number, seconds in
+									recorder.durations()))
+		if self.predicted_settle_time_mult:
+			ti3[0].add_keyword("DISPLAY_SETTLE_TIME_MULT",
+							   self.predicted_settle_time_mult)
+		# Time saved by patch ordering (fitted model, original vs measured
+		# patch sequence)
+		ti1_orig = basename + ".original.ti1"
+		if os.path.isfile(ti1_orig):
+			try:
+				orig = CGATS.CGATS(ti1_orig)[0].get_RGB_XYZ_values()[1]
+			except Exception as exception:
+				self.log("Warning - could not read TI1 file %s:" %
+						 safe_unicode(ti1_orig), exception)
+			else:
+				before = model.sequence_time(orig)
+				after = model.sequence_time(recorder.valueslist)
+				self.log("Estimated time saved by patch sequence: %.1f s "
+						 "(%.1f s -> %.1f s)" % (before - after, before, after))
+		db = self.get_display_response_db()
+		db.update(config.get_display_name(), model, len(transitions))
+		try:
+			db.save()
+		except EnvironmentError as exception:
+			self.log("Warning - could not save display response database:",
+					 exception)
+
+	def prepare_measurement_checkpoint(self, basename, args):
+		"""
+		Set up checkpointing of measurements for TI1 file basename + ".ti1"
+		
+		If readings from a previous (aborted) session with the same testchart
+		and measurement settings (display, instrument, measurement mode,
+		observer and dispread arguments args) exist, the TI1 is replaced with
+		a reduced TI1 containing only the remaining patches. The full TI1 is
+		restored by finish_measurement_checkpoint.
+		
+		"""
+		ti1 = basename + ".ti1"
+		# Session specific paths (temporary directory) are not part of the
+		# measurement settings
+		tempdir = os.path.dirname(basename)
+		settings = [config.get_display_name(None, True),
+					self.get_instrument_name(),
+					getcfg("measurement_mode"), getcfg("observer")]
+		settings.extend(arg.replace(tempdir, "") for arg in args)
+		try:
+			checkpoint = MeasurementCheckpoint(ti1, settings=settings,
+											   max_age=getcfg("measure.checkpoint.max_age_hours") * 3600)
+			checkpoint.load()
+			if checkpoint.readings:
+				shutil.copyfile(ti1, basename + ".full.ti1")
+				checkpoint.ti1_path = basename + ".full.ti1"
+				count = checkpoint.write_resume_ti1(ti1)
+				self.log("Resuming measurements from checkpoint %s: %i of %i "
+						 "patches already measured, %i remaining" %
+						 (checkpoint.path, len(checkpoint), len(checkpoint.RGB),
+						  count))
+		except Exception as exception:
+			self.log("Warning - measurement checkpoint unavailable:",
+					 exception)
+			self.measurement_checkpoint = None
+		else:
+			self.measurement_checkpoint = checkpoint
+
+	def finish_measurement_checkpoint(self, basename, result):
+		"""
+		Merge checkpointed readings into the TI3 of a resumed session,
+		restore the full TI1 and remove the checkpoint if measurements
+		completed. Otherwise keep the checkpoint for the next session.
+		
+		"""
+		checkpoint = self.measurement_checkpoint
+		self.measurement_checkpoint = None
+		checkpoint.close()
+		full_ti1 = basename + ".full.ti1"
+		resumed = os.path.isfile(full_ti1)
+		try:
+			if (not isinstance(result, Exception) and result and resumed and
+				not checkpoint.merge(basename + ".ti3")):
+				result = Error("Could not merge checkpointed measurements "
+							   "into %s.ti3" % basename)
+			if resumed:
+				os.remove(basename + ".ti1")
+				os.rename(full_ti1, basename + ".ti1")
+		except Exception as exception:
+			result = exception
+		if checkpoint.patches_reported and not checkpoint.readings_reported:
+			# The checkpoint can never fill, don't set it up again
+			self.log("Measurement tool output contains no readings, "
+					 "disabling measurement checkpoints")
+			setcfg("measure.checkpoint", 0)
+		if not isinstance(result, Exception) and result:
+			checkpoint.remove()
+		elif len(checkpoint):
+			self.log("Measurements checkpointed to %s (%i of %i patches)" %
+					 (checkpoint.path, len(checkpoint), len(checkpoint.RGB)))
+		return result
+
 	def ensure_patch_sequence(self, ti1, write=True):
 		"""
 		Ensure correct patch sequence of TI1 file
@@ -10973,6 +11246,11 @@ usage: spotread [-options] [logfile]
 			elif patch_sequence == "vary_RGB_difference":
 				result = ti1.checkerboard(CGATS.sort_by_RGB, None,
 										  split_grays=True, shift=True)
+			elif patch_sequence == "minimize_settle_time":
+				result = ti1.sort_by_settle_time(self.get_display_response_model())
+				if result:
+					self.log("Estimated total display settle time: "
+							 "%.1f s -> %.1f s" % result)
 			if not result:
 				self.log("Warning - patch sequence was not changed")
 			elif write:
@@ -11064,14 +11342,23 @@ usage: spotread [-options] [logfile]
 				logfile=logfile)
 		elif pgname == "Resolve":
 			# Resolve
-			if getcfg("patterngenerator.resolve") == "LS":
+			clients = getcfg("patterngenerator.resolve.clients")
+			kwargs = {}
+			if clients > 1:
+				# Broadcast patterns to several Resolve workstations
+				if getcfg("patterngenerator.resolve") == "LS":
+					patterngenerator = ResolveLSMultiClientPatternGeneratorServer
+				else:
+					patterngenerator = ResolveCMMultiClientPatternGeneratorServer
+				kwargs["min_clients"] = clients
+			elif getcfg("patterngenerator.resolve") == "LS":
 				patterngenerator = ResolveLSPatternGeneratorServer
 			else:
 				patterngenerator = ResolveCMPatternGeneratorServer
 			self.patterngenerator = patterngenerator(
 				port=getcfg("patterngenerator.resolve.port"),
 				use_video_levels=getcfg("patterngenerator.use_video_levels"),
-				logfile=logfile)
+				logfile=logfile, **kwargs)
 
 	@Property
 	def patterngenerator():
@@ -11127,6 +11414,11 @@ usage: spotread [-options] [logfile]
 		else:
 			try:
 				self.patterngenerator.send(rgb, bgrgb, x=x, y=y, w=w, h=h)
+				if (hasattr(self.patterngenerator, "flush") and
+					not self.patterngenerator.flush(getcfg("patterngenerator.resolve.clients.timeout"))):
+					# Multi-client server only queues patterns, wait until
+					# all clients got the pattern
+					raise socket.error(lang.getstr("patterngenerator.sync_lost"))
 			except Exception as exception:
 				if raise_exceptions:
 					raise
@@ -11139,6 +11431,15 @@ usage: spotread [-options] [logfile]
 			self.log("%s: Patterngenerator sent count: %i" %
 					 (appname, self.patterngenerator_sent_count))
 
+	def stop_patch_dispatcher(self):
+		""" Stop the patch dispatch thread and log send to ack timings """
+		if self.patch_dispatcher:
+			self.patch_dispatcher.stop(5)
+			if self.patch_dispatcher.timings:
+				self.log("%s: Patch dispatch: %s" % (appname,
+													   self.patch_dispatcher))
+			self.patch_dispatcher = None
+
 	@Property
 	def pauseable():
 		def fget(self):
@@ -13013,10 +13314,9 @@ usage: spotread [-options] [logfile]
 																	 ICCP.TextDescriptionType):
 								profile.setDescription(
 									getcfg("profile.name.expanded"))
-							# Calculate profile ID
-							profile.calculateID()
 							try:
-								profile.write()
+								# Calculate profile ID while writing
+								profile.write(update_ID=True)
 							except Exception as exception:
 								self.log(exception)
 		result2 = self.wrapup(not isinstance(result, UnloggedInfo) and result,
@@ -13257,8 +13557,7 @@ BEGIN_DATA
 			profile.setDescription(outname)
 			profile.tags.vcgt = cal_to_fake_profile(cal).tags.vcgt
 			profile.tags.wtpt.X, profile.tags.wtpt.Y, profile.tags.wtpt.Z = XYZw
-			profile.calculateID()
-			profile.write(outfilename)
+			profile.write(outfilename, update_ID=True)
 			self.wrapup(False)
 			return True
 		else:
@@ -14592,124 +14891,146 @@ BEGIN_DATA
 			self._write(line)
 			self.buffer = self.buffer[1:]
 
+	def _dispatch_patch(self, rgb):
+		""" Show a patch (called from the patch dispatch thread), then let
+		the measurement continue by creating the .ok file """
+		# Check if patch count is higher than patterngenerator sent count.
+		# This is done here (and not when the patch update is parsed) because
+		# the sent count is increased by this thread. All previous patches
+		# have been handled at this point.
+		if (self.patch_count > self.patterngenerator_sent_count and
+			self.exec_cmd_returnvalue is None):
+			# XXX: This can happen when pausing/unpausing?
+			# Need to investigate
+			self.log("Warning - did we loose sync with the pattern generator?")
+			##self.exec_cmd_returnvalue = Error(lang.getstr("patterngenerator.sync_lost"))
+			##self.abort_subprocess()
+		update_ffp_insertion_ts = False
+		if getcfg("patterngenerator.ffp_insertion") and self.patterngenerator_sent_count > 1:
+			# Frame insertion
+			frq = getcfg("patterngenerator.ffp_insertion.interval")
+			if time() - getattr(self, "_ffp_insertion_ts", 0) > frq:
+				dur = getcfg("patterngenerator.ffp_insertion.duration")
+				lvl = getcfg("patterngenerator.ffp_insertion.level")
+				self.log("%s: Frame insertion duration %is, level = %i%%" %
+						 (appname, dur, lvl * 100))
+				ts = time()
+				if self.use_madnet_tpg:
+					patternconfig = self.madtpg.get_pattern_config()
+					self.madtpg.set_pattern_config(patternconfig[0],
+												   int(lvl * 100), 0, 0)
+					self.madtpg.show_rgb(lvl, lvl, lvl)
+					self.madtpg.set_pattern_config(100, 0, 0, 0)
+				else:
+					self.patterngenerator_send((lvl, lvl, lvl),
+											   (lvl, lvl, lvl))
+				while time() - ts < dur and not (self.subprocess_abort or
+												 self.thread_abort):
+					sleep(.05)
+				if self.use_madnet_tpg:
+					self.madtpg.set_pattern_config(*patternconfig)
+				update_ffp_insertion_ts = True
+			if (not hasattr(self, "_ffp_insertion_ts") or
+				update_ffp_insertion_ts):
+				self._ffp_insertion_ts = time()
+		rgb = list(rgb)
+		if self.use_madnet_tpg:
+			if self.madtpg.show_rgb(*rgb):
+				self.patterngenerator_sent_count += 1
+				self.log("%s: MadTPG_Net sent count: %i" %
+						 (appname, self.patterngenerator_sent_count))
+			else:
+				self.exec_cmd_returnvalue = Error(lang.getstr("patterngenerator.sync_lost"))
+				self.abort_subprocess()
+		else:
+			self.patterngenerator_send(rgb)
+		if getcfg("patterngenerator.ffp_insertion") and update_ffp_insertion_ts:
+			# Delay to allow patch update and settle time after
+			# frame insertion. If display update delay is bigger,
+			# do not use extra delay. Otherwise, subtract display
+			# update delay from fixed delay.
+			if getcfg("measure.override_min_display_update_delay_ms"):
+				dur = getcfg("measure.min_display_update_delay_ms") / 1000.
+			else:
+				dur = 0
+			ts = time()
+			while time() - ts < max(0.8 - dur, 0) and not (self.subprocess_abort or
+														   self.thread_abort):
+				sleep(.05)
+		# Create .ok file which will be picked up by .wait script
+		okfilename = os.path.join(self.tempdir, ".ok")
+		open(okfilename, "w").close()
+
+	def _dispatch_measurement_event(self, event):
+		# Subscribed to PATCH and READING events of the output parser
+		if self.measurement_checkpoint:
+			self.measurement_checkpoint.on_event(event)
+		if self.settle_time_recorder:
+			self.settle_time_recorder.on_event(event)
+
 	def _write(self, txt):
 		wx.CallAfter(self.audio_visual_feedback, txt)
-		if getattr(self, "measure_cmd", None):
-			# i1 Pro, Spyders: Instrument Type
-			# i1D3: Product Name
-			# K10: Model
-			# specbos: Identification
-			instrument = re.search(r"(?:Instrument Type|Product Name|Model|"
-								   r"Identificaton):\s+([^\r\n]+)",
-								   txt, re.I)
-			if instrument:
-				self._detected_instrument = instrument.group(1)
-			serial = re.search(r"(?:Serial Number):\s+([^\r\n]+)",
-								   txt, re.I)
-			if serial:
-				self._detected_instrument_serial = serial.group(1)
-		if re.search("press 1|space when done|patch 1 of ", txt, re.I):
+		# Scan the output once, then act on the events
+		start = first_patch = update = removed = False
+		rgb = progress = None
+		for event in self.argyll_output_parser.feed(txt):
+			if event.type == argyll_events.INSTRUMENT:
+				# i1 Pro, Spyders: Instrument Type
+				# i1D3: Product Name
+				# K10: Model
+				# specbos: Identification
+				if getattr(self, "measure_cmd", None):
+					self._detected_instrument = event.value
+			elif event.type == argyll_events.SERIAL:
+				if getattr(self, "measure_cmd", None):
+					self._detected_instrument_serial = event.value
+			elif event.type == argyll_events.START:
+				start = True
+			elif event.type == argyll_events.PATCH:
+				if event.value[0] == 1:
+					first_patch = True
+				if progress is None:
+					progress = event.value
+			elif event.type == argyll_events.PATCH_COUNT:
+				if progress is None:
+					progress = (0, event.value)
+			elif event.type == argyll_events.UPDATE:
+				update = True
+			elif event.type == argyll_events.REMOVED:
+				update = removed = True
+			elif event.type == argyll_events.RGB:
+				if rgb is None:
+					rgb = event.value
+		if start:
 			# There are some intial measurements which we can't check for
 			# unless -D (debug) is used for Argyll tools
-			if not "patch 1 of " in txt.lower() or not self.patch_sequence:
-				if "patch 1 of " in txt.lower():
+			if not first_patch or not self.patch_sequence:
+				if first_patch:
 					self.patch_sequence = True
 				self.patch_count = 0
 				self.patterngenerator_sent_count = 0
-		update = re.search(r"[/\\] current|patch \d+ of |the instrument "
-						   "can be removed from the screen", txt, re.I)
 		# Send colors to pattern generator
 		use_patterngenerator = (self.use_patterngenerator and
 								self.patterngenerator and
 								hasattr(self.patterngenerator, "conn"))
 		if (use_patterngenerator or self.use_madnet_tpg or
 			self._use_patternwindow):
-			rgb = re.search(r"Current RGB(?:\s+\d+){3}((?:\s+\d+(?:\.\d+)){3})",
-							txt)
 			if rgb:
-				update_ffp_insertion_ts = False
-				if getcfg("patterngenerator.ffp_insertion") and self.patterngenerator_sent_count > 1:
-					# Frame insertion
-					frq = getcfg("patterngenerator.ffp_insertion.interval")
-					if time() - getattr(self, "_ffp_insertion_ts", 0) > frq:
-						dur = getcfg("patterngenerator.ffp_insertion.duration")
-						lvl = getcfg("patterngenerator.ffp_insertion.level")
-						self.log("%s: Frame insertion duration %is, level = %i%%" %
-								 (appname, dur, lvl * 100))
-						ts = time()
-						if self.use_madnet_tpg:
-							patternconfig = self.madtpg.get_pattern_config()
-							self.madtpg.set_pattern_config(patternconfig[0],
-														   int(lvl * 100), 0, 0)
-							self.madtpg.show_rgb(lvl, lvl, lvl)
-							self.madtpg.set_pattern_config(100, 0, 0, 0)
-						else:
-							self.patterngenerator_send((lvl, lvl, lvl),
-													   (lvl, lvl, lvl))
-						while time() - ts < dur and not (self.subprocess_abort or
-														 self.thread_abort):
-							sleep(.05)
-						if self.use_madnet_tpg:
-							self.madtpg.set_pattern_config(*patternconfig)
-						update_ffp_insertion_ts = True
-					if (not hasattr(self, "_ffp_insertion_ts") or
-						update_ffp_insertion_ts):
-						self._ffp_insertion_ts = time()
-				rgb = [float(v) for v in rgb.groups()[0].strip().split()]
-				if self.use_madnet_tpg:
-					if self.madtpg.show_rgb(*rgb):
-						self.patterngenerator_sent_count += 1
-						self.log("%s: MadTPG_Net sent count: %i" %
-								 (appname, self.patterngenerator_sent_count))
-					else:
-						self.exec_cmd_returnvalue = Error(lang.getstr("patterngenerator.sync_lost"))
-						self.abort_subprocess()
-				else:
-					self.patterngenerator_send(rgb)
-				if getcfg("patterngenerator.ffp_insertion") and update_ffp_insertion_ts:
-					# Delay to allow patch update and settle time after
-					# frame insertion. If display update delay is bigger,
-					# do not use extra delay. Otherwise, subtract display
-					# update delay from fixed delay.
-					if getcfg("measure.override_min_display_update_delay_ms"):
-						dur = getcfg("measure.min_display_update_delay_ms") / 1000.
-					else:
-						dur = 0
-					ts = time()
-					while time() - ts < max(0.8 - dur, 0) and not (self.subprocess_abort or
-																   self.thread_abort):
-						sleep(.05)
-				# Create .ok file which will be picked up by .wait script
-				okfilename = os.path.join(self.tempdir, ".ok")
-				open(okfilename, "w").close()
-			if update:
-				# Check if patch count is higher than patterngenerator sent count
-				if (self.patch_count > self.patterngenerator_sent_count and
-					self.exec_cmd_returnvalue is None):
-					# XXX: This can happen when pausing/unpausing?
-					# Need to investigate
-					self.log("Warning - did we loose sync with the pattern generator?")
-					##self.exec_cmd_returnvalue = Error(lang.getstr("patterngenerator.sync_lost"))
-					##self.abort_subprocess()
+				# Send from the dispatch thread so output processing is not
+				# blocked by pattern generator round trips
+				if not self.patch_dispatcher:
+					self.patch_dispatcher = PatchDispatcher(self._dispatch_patch)
+					self.patch_dispatcher.start()
+				self.patch_dispatcher.put(rgb)
 		if update and not (self.subprocess_abort or self.thread_abort or
-						   "the instrument can be removed from the screen"
-						   in txt.lower()):
+						   removed):
 			self.patch_count += 1
 			if use_patterngenerator or self.use_madnet_tpg:
 				self.log("%s: Patch update count: %i" %
 						 (appname, self.patch_count))
-		if self.use_madnet_tpg:
-			progress = re.search("(?:Patch (\\d+) of|Number of patches =) (\\d+)",
-								 txt, re.I)
-			if progress:
-				# Set madTPG progress bar
-				try:
-					start = int(progress.group(1) or 0)
-					end = int(progress.group(2))
-				except ValueError:
-					pass
-				else:
-					self.madtpg.set_progress_bar_pos(start, end)
+		if self.use_madnet_tpg and progress:
+			# Set madTPG progress bar
+			self.madtpg.set_progress_bar_pos(*progress)
 		# Parse
 		wx.CallAfter(self.parse, txt)
 
@@ -29,6 +29,7 @@ from . import localization as lang
 from .argyll_names import altnames as argyll_altnames
 from .argyll_names import names as argyll_names
 from .argyll_names import optional as argyll_optional
+from .argyllcache import argyll_capabilities
 from .colormath import (
     VidRGB_to_cLUT65,
     VidRGB_to_eeColor,
@@ -126,6 +127,16 @@ def _mp_xicclu(
     return xicclu.get(output_format=output_format, reverse=reverse)
 
 
+def _matrix_mul_array(matrix, XYZ):
+    """Multiply each row of an array of XYZ values (N x 3) with matrix"""
+    import numpy
+
+    out = numpy.empty(XYZ.shape)
+    for i, row in enumerate(matrix):
+        out[:, i] = XYZ[:, 0] * row[0] + XYZ[:, 1] * row[1] + XYZ[:, 2] * row[2]
+    return out
+
+
 def _mp_generate_B2A_clut(
     chunk,
     thread_abort_event,
@@ -160,7 +171,6 @@ def _mp_generate_B2A_clut(
         safe_print("x3dom?", "x3dom" in str(list(sys.modules.keys())))
     if not config.cfg.items(config.ConfigParser.DEFAULTSECT):
         config.initcfg()
-    idata = []
     abmaxval = 255 + (255 / 256.0)
     profile = ICCP.ICCProfile(profile_filename)
     xicclu1 = Xicclu(profile, intent, direction, "n", pcs, 100)
@@ -170,69 +180,79 @@ def _mp_generate_B2A_clut(
         xicclu2 = Xicclu(
             profile, intent, direction, "n", pcs, 100, use_cam_clipping=True
         )
+    import numpy
+
     prevperc = 0
-    count = 0
     chunksize = len(chunk)
-    for interp_tuple in (interp, Linterp):
-        if interp_tuple:
-            # Use numpy for speed
-            if interp_tuple is interp:
-                interp_list = list(interp_tuple)
-            else:
-                interp_list = [interp_tuple]
-            for i, ointerp in enumerate(interp_list):
-                interp_list[i] = colormath.Interp(
-                    ointerp.xp, ointerp.fp, use_numpy=True
-                )
-            if interp_tuple is interp:
-                interp = interp_list
-            else:
-                Linterp = interp_list[0]
+    slicesize = clutres**2
+    # Pre-size the list of input values, it is filled slice by slice
+    idata = [None] * (chunksize * slicesize)
+    # Grid indexes b, c of one slice, c changing fastest
+    b, c = [
+        index.ravel()
+        for index in numpy.meshgrid(
+            numpy.arange(clutres), numpy.arange(clutres), indexing="ij"
+        )
+    ]
+    e, f = b * step, c * step
     if profile.connectionColorSpace == "XYZ":
         m2i = m2.inverted()
-    for a in chunk:
+        if intent == "a":
+            madapt = colormath.wp_adaption_matrix(
+                XYZwp, list(profile.tags.wtpt.ir.values())
+            )
+        # Apply TRC to XYZ values to distribute them optimally across cLUT
+        # grid points. Y and Z only depend on b and c, so only need to be
+        # computed once.
+        XYZ = numpy.empty((slicesize, 3))
+        for i, v in ((1, e), (2, f)):
+            XYZ[:, i] = numpy.interp(v, interp[i].xp, interp[i].fp)
+    for j, a in enumerate(chunk):
         if thread_abort_event.is_set():
             if use_cam_clipping:
                 xicclu2.exit()
             xicclu1.exit()
             return Info(abortmessage)
-        for b in range(clutres):
-            for c in range(clutres):
-                d, e, f = [v * step for v in (a, b, c)]
-                if profile.connectionColorSpace == "XYZ":
-                    # Apply TRC to XYZ values to distribute them optimally
-                    # across cLUT grid points.
-                    XYZ = [interp[i](v) for i, v in enumerate((d, e, f))]
-                    ##print "%3.6f %3.6f %3.6f" % tuple(XYZ), '->',
-                    # Scale into PCS
-                    v = m2i * XYZ
-                    if bpc and XYZbp != [0, 0, 0]:
-                        v = colormath.blend_blackpoint(v[0], v[1], v[2], None, XYZbp)
-                    ##print "%3.6f %3.6f %3.6f" % tuple(v)
-                    ##raw_input()
-                    if intent == "a":
-                        v = colormath.adapt(
-                            *v + [XYZwp, list(profile.tags.wtpt.ir.values())]
-                        )
-                else:
-                    # Legacy CIELAB
-                    L = Linterp(d * 100)
-                    v = L, -128 + e * abmaxval, -128 + f * abmaxval
-                idata.append("%.6f %.6f %.6f" % tuple(v))
-                # Lookup CIE -> device values through profile using xicclu
-                if not use_cam_clipping or (
-                    pcs == "x" and a <= threshold and b <= threshold and c <= threshold
-                ):
-                    xicclu1(v)
-                if use_cam_clipping and (
-                    pcs == "l" or a > threshold2 or b > threshold2 or c > threshold2
-                ):
-                    xicclu2(v)
-                count += 1.0
-            perc = round(count / (chunksize * clutres**2) * 100)
-            if progress_queue and perc > prevperc:
-                progress_queue.put(perc - prevperc)
-                prevperc = perc
+        d = a * step
+        if profile.connectionColorSpace == "XYZ":
+            XYZ[:, 0] = numpy.interp(d, interp[0].xp, interp[0].fp)
+            # Scale into PCS
+            v = _matrix_mul_array(m2i, XYZ)
+            if bpc and XYZbp != [0, 0, 0]:
+                v = colormath.blend_blackpoint_array(v, None, XYZbp)
+            if intent == "a":
+                v = _matrix_mul_array(madapt, v)
+        else:
+            # Legacy CIELAB
+            L = numpy.interp(d * 100, Linterp.xp, Linterp.fp)
+            v = numpy.column_stack(
+                (numpy.full(slicesize, L), -128 + e * abmaxval, -128 + f * abmaxval)
+            )
+        v = v.tolist()
+        idata[j * slicesize : (j + 1) * slicesize] = [
+            "%.6f %.6f %.6f" % tuple(row) for row in v
+        ]
+        # Lookup CIE -> device values through profile using xicclu, one
+        # buffered write per slice. Note that an empty line would end xicclu
+        if not use_cam_clipping:
+            xicclu1(v)
+        else:
+            if pcs == "x" and a <= threshold:
+                mask = (b <= threshold) & (c <= threshold)
+                rows = [row for row, use in zip(v, mask) if use]
+                if rows:
+                    xicclu1(rows)
+            if pcs == "l" or a > threshold2:
+                xicclu2(v)
+            else:
+                mask = (b > threshold2) | (c > threshold2)
+                rows = [row for row, use in zip(v, mask) if use]
+                if rows:
+                    xicclu2(rows)
+        perc = round((j + 1.0) / chunksize * 100)
+        if progress_queue and perc > prevperc:
+            progress_queue.put(perc - prevperc)
+            prevperc = perc
     if use_cam_clipping:
         xicclu2.exit()
         data2 = xicclu2.get()
@@ -365,6 +385,9 @@ def get_argyll_version(name, paths=None):
 def get_argyll_version_string(name, paths=None):
     argyll_version_string = "0.0.0"
     cmd = get_argyll_util(name, paths)
+    cached = argyll_capabilities.get(cmd, "version")
+    if cached:
+        return cached
     if sys.platform == "win32":
         startupinfo = sp.STARTUPINFO()
         startupinfo.dwFlags |= sp.STARTF_USESHOWWINDOW
@@ -387,6 +410,7 @@ def get_argyll_version_string(name, paths=None):
             line = line.strip()
             if "version" in line.lower():
                 argyll_version_string = line[line.lower().find("version") + 8 :]
+                argyll_capabilities.set(cmd, "version", argyll_version_string)
                 break
     return argyll_version_string
 
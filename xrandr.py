@@ -83,6 +83,8 @@ try:
         POINTER(c_ulong),
         POINTER(POINTER(c_ubyte)),
     ]
+    libxrandr.XRRTimes.restype = c_ulong
+    libxrandr.XRRTimes.argtypes = [POINTER(Display), c_int, POINTER(c_ulong)]
 except AttributeError as exception:
     raise ImportError("libXrandr: %s" % exception)
 
@@ -120,6 +122,18 @@ class XDisplay(object):
 
         return window
 
+    def get_config_timestamps(self, screen_no=0):
+        """Return XRandR (timestamp, config_timestamp) of a screen
+
+        The config timestamp changes when the server detects a change in
+        the hardware configuration (e.g. a display was connected or
+        disconnected), the timestamp when the configuration was changed.
+
+        """
+        config_timestamp = c_ulong()
+        timestamp = libxrandr.XRRTimes(self.display, screen_no, config_timestamp)
+        return timestamp, config_timestamp.value
+
     def get_window_property(self, window, atom_id, atom_type=XA_CARDINAL):
 
         ret_type, ret_format, ret_len, ret_togo, atomv = (